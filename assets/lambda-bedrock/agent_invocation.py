@@ -1,64 +1,288 @@
-import boto3
 from botocore.exceptions import ClientError
-import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 import logging
 import json
+import os
+
+import clients
+import rag_pipeline
+from answer_cache import answer_cache, make_key
+from emf_metrics import MetricsLogger
+from model_router import ModelRouter, UnknownModelError
+from resilience import CircuitBreaker, CircuitOpenError, call_with_retry, deadline_from_context, is_retryable
+from session_store import get_session_store
+
+## Upper bound of concurrent RetrieveAndGenerate calls per batch, keeps us under the Bedrock TPS quota
+BATCH_MAX_CONCURRENCY = int(os.environ.get("BATCH_MAX_CONCURRENCY", "4"))
+
+## "retrieve_and_generate" (default) or "two_stage", can be overridden per request
+TWO_STAGE_PIPELINE = "two_stage"
+PIPELINE = os.environ.get("PIPELINE", "retrieve_and_generate")
+TWO_STAGE_NUMBER_OF_RESULTS = int(os.environ.get("TWO_STAGE_NUMBER_OF_RESULTS", "20"))
+TWO_STAGE_CONTEXT_TOKENS = int(os.environ.get("TWO_STAGE_CONTEXT_TOKENS", "2000"))
+
+## Shared by all requests of the container, opens when Bedrock keeps throttling
+bedrock_breaker = CircuitBreaker.from_environment()
+## Retry-After for throttling that outlasted the retries while the circuit is still closed
+THROTTLED_RETRY_AFTER_SECONDS = 5
+
+## Picks Haiku or Sonnet per question, MODEL_ID stays the large model
+model_router = ModelRouter.from_environment(default_large_model_id=clients.MODEL_ID)
+
+_cold_start = True
+
+
+class InvalidRequestError(ValueError):
+    """
+    Raised when the request body does not have the expected shape.
+    """
 
 
 def handler(event, context):
-    body = json.loads(event["body"])
-    query = body['userPrompt']
-    sessionId = body["sessionId"]
-    boto3_session = boto3.Session()
-    bedrock_agent_runtime_client = boto3_session.client('bedrock-agent-runtime', region_name=os.environ['AWS_REGION'])
-    region_name = boto3_session.region_name
-    model_id = "anthropic.claude-3-sonnet-20240229-v1:0" 
-    model_arn =  f'arn:aws:bedrock:{region_name}::foundation-model/{model_id}'
+    global _cold_start
+    cold_start, _cold_start = _cold_start, False
 
-    print(f"Session: {sessionId} as question {query}")
+    ## Warm-up pings only initialise the container state
+    if event.get("warmup"):
+        kb_id = clients.warm_up()
+        return {
+            "statusCode": 200,
+            "body": json.dumps({
+                "warmup": True,
+                "knowledgeBaseId": kb_id
+            })
+        }
+
+    ## Clears this container at once, ingestion moves every container on through the corpus generation
+    if event.get("invalidateCache"):
+        answer_cache.invalidate()
+        return {
+            "statusCode": 200,
+            "body": json.dumps({
+                "invalidated": True
+            })
+        }
+
+    body = json.loads(event["body"])
+    pipeline = body.get("pipeline") or PIPELINE
+    ## The local index only serves Retrieve, so answers are generated by the two stage pipeline
+    if clients.RETRIEVAL_BACKEND == clients.FAISS_BACKEND:
+        pipeline = TWO_STAGE_PIPELINE
+    deadline = deadline_from_context(context)
+    metrics = MetricsLogger(dimensions={
+        "ModelId": model_router.large_model_id,
+        "ColdStart": str(cold_start).lower(),
+    })
+    metrics.set_property("Pipeline", pipeline)
 
     try:
-        cfn_client = boto3.client('cloudformation')
-    
-        response = cfn_client.list_exports()
-        
-        for export in response['Exports']:
-            if export['Name'] == 'BedrockKbId':
-                kb_id = export['Value']
-                break
-
-
-
-        response = bedrock_agent_runtime_client.retrieve_and_generate(
-                input={
-                    'text': query
-                },
-                retrieveAndGenerateConfiguration={
-                    'type': 'KNOWLEDGE_BASE',
-                    'knowledgeBaseConfiguration': {
-                        'knowledgeBaseId': kb_id,
-                        'modelArn': model_arn
-                    }
-                },
-            )
-        generated_text = response['output']['text']
+        with metrics.timer("TotalLatency"):
+            with metrics.timer("ClientInitLatency"):
+                clients.get_client('bedrock-agent-runtime')
+                if pipeline == TWO_STAGE_PIPELINE:
+                    clients.get_client('bedrock-runtime')
+
+            with metrics.timer("KbLookupLatency"):
+                clients.get_kb_id()
+
+            with metrics.timer("GenerationLatency"):
+                if "prompts" in body:
+                    result = answer_batch(body["prompts"], body.get("maxConcurrency"), pipeline, deadline, body.get("model"))
+                    answers = result["results"]
+                else:
+                    query = body.get('userPrompt')
+                    if not isinstance(query, str) or not query.strip():
+                        raise InvalidRequestError("userPrompt must be a non-empty string")
+                    sessionId = body.get("sessionId")
+                    print(f"Session: {sessionId} as question {query}")
+                    result = answer_question(query, sessionId, pipeline, deadline, body.get("model"))
+                    answers = [result]
+
+            with metrics.timer("SerializationLatency"):
+                response_body = json.dumps(result)
+
+        ## Dimension by the model that actually served the request
+        served_by = {a["model"]["id"] for a in answers if "model" in a}
+        metrics.put_dimension("ModelId", served_by.pop() if len(served_by) == 1 else "mixed")
+        metrics.put_metric("ModelFallbacks", sum(1 for a in answers if a.get("model", {}).get("fallback")), "Count")
+        metrics.put_metric("ResponseSize", len(response_body.encode("utf-8")), "Bytes")
+        metrics.put_metric("CitationCount", sum(len(a.get("citations", [])) for a in answers), "Count")
+        metrics.put_metric("CacheHits", sum(1 for a in answers if a.get("cache", {}).get("hit")), "Count")
         return {
             "statusCode": 200,
+            "body": response_body
+        }
+
+    except (UnknownModelError, InvalidRequestError) as e:
+        logging.error(e)
+        metrics.put_metric("Errors", 1, "Count")
+        return {
+            "statusCode": 400,
             "body": json.dumps({
-                "response": generated_text
+                "error": str(e)
             })
         }
-    
+
+    except clients.ExportNotFoundError as e:
+        logging.error(e)
+        metrics.put_metric("Errors", 1, "Count")
+        return {
+            "statusCode": 500,
+            "body": json.dumps({
+                "error": f"Knowledge Base Id is not configured: {e}"
+            })
+        }
+
+    except CircuitOpenError as e:
+        logging.error(e)
+        metrics.put_metric("Throttled", 1, "Count")
+        return service_unavailable(str(e), e.retry_after)
 
     except ClientError as e:
         logging.error(e)
+        if is_retryable(e):
+            metrics.put_metric("Throttled", 1, "Count")
+            return service_unavailable(str(e), bedrock_breaker.retry_after() or THROTTLED_RETRY_AFTER_SECONDS)
+        metrics.put_metric("Errors", 1, "Count")
         return {
             "statusCode": 500,
             "body": json.dumps({
                 "error": str(e)
             })
         }
-      
-  
 
+    finally:
+        metrics.flush()
+
+
+def service_unavailable(message, retry_after):
+    return {
+        "statusCode": 503,
+        "headers": {
+            "Retry-After": str(retry_after)
+        },
+        "body": json.dumps({
+            "error": message
+        })
+    }
+
+
+def answer_question(query, session_id=None, pipeline=None, deadline=None, model=None):
+    """
+    Answer one question and return the response body.
+
+    The model is picked per question by the router unless `model` overrides it; an empty
+    or poorly cited answer of the small model is regenerated with the large one. Follow-up
+    turns of a Bedrock session go to the large model without a fallback, so the session
+    history holds each question once.
+
+    The default pipeline is RetrieveAndGenerate. Turns of a session continue the Bedrock
+    session and skip the answer cache: follow-ups depend on the conversation so far, and
+    a first turn must open the Bedrock session the follow-ups continue. The "two_stage"
+    pipeline retrieves, reranks and packs the context locally before invoking the model;
+    it is stateless.
+
+    Bedrock calls are retried with backoff until the deadline and go through the
+    container's circuit breaker.
+    """
+    pipeline = pipeline or PIPELINE
+    invoke = partial(call_with_retry, breaker=bedrock_breaker, deadline=deadline)
+    kb_id = clients.get_kb_id()
+    sessions = get_session_store()
+    bedrock_session_id = None
+    if session_id and pipeline != TWO_STAGE_PIPELINE:
+        bedrock_session_id = sessions.get(session_id)
+
+    if bedrock_session_id is not None and not model:
+        ## A fallback would put the question into the Bedrock session twice, follow-ups get the large model
+        model_id, reason = model_router.large_model_id, "session_follow_up"
+    else:
+        model_id, reason = model_router.choose(query, model)
+    cache_key = make_key(kb_id, f"{pipeline}/{model_id}", query, clients.get_corpus_generation(kb_id))
+    if not session_id or pipeline == TWO_STAGE_PIPELINE:
+        cached = answer_cache.get(cache_key)
+        if cached is not None:
+            return dict(cached, cache=dict(answer_cache.stats(), hit=True))
+
+    result, new_session_id = generate_answer(query, kb_id, model_id, pipeline, bedrock_session_id, invoke)
+    result["model"] = {"id": model_id, "reason": reason, "fallback": False}
+    if bedrock_session_id is None and model_router.needs_fallback(model_id, result):
+        print(f"Falling back to {model_router.large_model_id} after {len(result['citations'])} citations")
+        result, new_session_id = generate_answer(
+            query, kb_id, model_router.large_model_id, pipeline, bedrock_session_id, invoke
+        )
+        result["model"] = {"id": model_router.large_model_id, "reason": reason, "fallback": True}
+
+    if session_id and new_session_id:
+        sessions.put(session_id, new_session_id)
+    if bedrock_session_id is None:
+        answer_cache.put(cache_key, {k: result[k] for k in ("response", "citations", "model")})
+    return dict(result, cache=dict(answer_cache.stats(), hit=False))
+
+
+def generate_answer(query, kb_id, model_id, pipeline, bedrock_session_id, invoke):
+    """
+    Run one pipeline with one model. Returns the result and the Bedrock session id.
+    """
+    if pipeline == TWO_STAGE_PIPELINE:
+        result = rag_pipeline.answer(
+            clients.get_client('bedrock-agent-runtime'),
+            clients.get_client('bedrock-runtime'),
+            kb_id,
+            model_id,
+            query,
+            number_of_results=TWO_STAGE_NUMBER_OF_RESULTS,
+            token_budget=TWO_STAGE_CONTEXT_TOKENS,
+            invoke=invoke,
+        )
+        return {
+            "response": result["text"],
+            "citations": result["citations"],
+            "stats": result["stats"]
+        }, None
+
+    request = clients.retrieve_and_generate_request(query, kb_id, model_id, bedrock_session_id)
+    response = invoke(clients.get_client('bedrock-agent-runtime').retrieve_and_generate, **request)
+
+    citations = [
+        {"text": reference["content"]["text"], "location": reference.get("location")}
+        for citation in response.get("citations", [])
+        for reference in citation.get("retrievedReferences", [])
+    ]
+    return {
+        "response": response['output']['text'],
+        "citations": citations
+    }, response.get("sessionId")
+
+
+def answer_batch(prompts, max_concurrency=None, pipeline=None, deadline=None, model=None):
+    """
+    Answer independent questions concurrently and return the results in input order.
+    A failing question is reported in its own result and does not fail the batch.
+    """
+    if not isinstance(prompts, list) or not prompts or not all(isinstance(p, str) and p.strip() for p in prompts):
+        raise InvalidRequestError("prompts must be a non-empty list of non-empty strings")
+    if max_concurrency is not None and (
+        not isinstance(max_concurrency, int) or isinstance(max_concurrency, bool) or max_concurrency < 1
+    ):
+        raise InvalidRequestError("maxConcurrency must be a positive integer")
+    ## Configuration problems fail the whole batch instead of every item
+    clients.get_kb_id()
+
+    workers = min(BATCH_MAX_CONCURRENCY, max_concurrency or BATCH_MAX_CONCURRENCY)
+    workers = max(1, min(workers, len(prompts)))
+    print(f"Batch of {len(prompts)} questions with concurrency {workers}")
+
+    def answer(prompt):
+        try:
+            return answer_question(prompt, pipeline=pipeline, deadline=deadline, model=model)
+        except Exception as e:
+            logging.error(e)
+            return {"error": str(e)}
 
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(answer, prompts))
+    return {
+        "results": [dict(result, index=index) for index, result in enumerate(results)]
+    }
@@ -0,0 +1,84 @@
+"""
+Bounded in-memory answer cache for the chat Lambda.
+
+Answers are keyed on (kb_id, corpus generation, model_id, normalized prompt)
+and evicted by size (least recently used first) and by age. The corpus
+generation changes with every completed ingestion (see corpus_generation.py),
+so answers from the old corpus are no longer looked up once a container has
+read the new generation. Entries of old generations age out like any other.
+"""
+import os
+import re
+import string
+import threading
+import time
+from collections import OrderedDict
+
+_PUNCTUATION = str.maketrans({c: " " for c in string.punctuation})
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_prompt(prompt):
+    """
+    Fold case, drop punctuation and collapse whitespace, so trivially different
+    spellings of the same question share one cache entry.
+    """
+    return _WHITESPACE.sub(" ", prompt.lower().translate(_PUNCTUATION)).strip()
+
+
+def make_key(kb_id, model_id, prompt, generation=None):
+    return (kb_id, generation, model_id, normalize_prompt(prompt))
+
+
+class AnswerCache:
+
+    def __init__(self, max_entries=256, ttl_seconds=600, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """
+        Return the cached value for key, or None when it is missing or expired.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self._clock() - entry[0] >= self.ttl_seconds:
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, value):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (self._clock(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self):
+        """
+        Drop every entry of this container at once.
+        """
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._entries)}
+
+
+## Container wide cache used by the handler
+answer_cache = AnswerCache(
+    max_entries=int(os.environ.get("ANSWER_CACHE_MAX_ENTRIES", "256")),
+    ttl_seconds=float(os.environ.get("ANSWER_CACHE_TTL_SECONDS", "600")),
+)
@@ -0,0 +1,193 @@
+"""
+Per-container AWS clients and configuration for the chat Lambda.
+
+Everything in this module is created on first use and kept in module globals,
+so warm invocations of the same container reuse the session, the clients (and
+their connection pools) and the resolved Knowledge Base Id.
+"""
+import os
+import threading
+import time
+
+import boto3
+
+from corpus_generation import CorpusGenerationReader
+from resilience import WRAPPED_CLIENT_MAX_ATTEMPTS, retry_config
+
+MODEL_ID = os.environ.get("MODEL_ID", "anthropic.claude-3-sonnet-20240229-v1:0")
+## How long a resolved Knowledge Base Id is trusted before it is looked up again
+KB_ID_TTL_SECONDS = float(os.environ.get("KB_ID_TTL_SECONDS", "300"))
+KB_ID_EXPORT_NAME = "BedrockKbId"
+## Set by LambdaStack from the BedrockKbId export, skips the CloudFormation lookup
+KB_ID_ENV_VAR = "KB_ID"
+## "bedrock" (default) or "faiss", which answers Retrieve from the offline index in LOCAL_INDEX_DIR
+FAISS_BACKEND = "faiss"
+RETRIEVAL_BACKEND = os.environ.get("RETRIEVAL_BACKEND", "bedrock")
+LOCAL_INDEX_DIR = os.environ.get("LOCAL_INDEX_DIR", "/opt/faiss-index")
+## Knowledge Base Id reported when the local index serves retrieval and KB_ID is not set
+LOCAL_KB_ID = "local-faiss-index"
+## SSM prefix of the corpus generations published after each ingestion, unset disables the lookup
+CORPUS_GENERATION_PREFIX = os.environ.get("CORPUS_GENERATION_PREFIX")
+CORPUS_GENERATION_TTL_SECONDS = float(os.environ.get("CORPUS_GENERATION_TTL_SECONDS", "30"))
+
+_lock = threading.RLock()
+_session = None
+_clients = {}
+_kb_id = None
+_kb_id_resolved_at = 0.0
+_corpus_generations = None
+
+
+class ExportNotFoundError(LookupError):
+    """
+    Raised when no CloudFormation export with the requested name exists.
+    """
+
+    def __init__(self, export_name):
+        super().__init__(f"CloudFormation export '{export_name}' was not found")
+        self.export_name = export_name
+
+
+def get_session():
+    """
+    Return the container wide boto3 session, creating it on first use.
+    """
+    global _session
+    if _session is None:
+        with _lock:
+            if _session is None:
+                _session = boto3.Session()
+    return _session
+
+
+def get_region_name():
+    return os.environ.get("AWS_REGION") or get_session().region_name
+
+
+def _load_local_index():
+    ## faiss is only imported by containers that serve retrieval from the local index
+    import faiss_index
+
+    return faiss_index.FaissRetrieveClient.load(LOCAL_INDEX_DIR, get_runtime_client=lambda: get_client("bedrock-runtime"))
+
+
+def get_client(service_name):
+    """
+    Return the cached client for a service, creating it on first use. With the faiss retrieval
+    backend, the bedrock-agent-runtime client is the local index.
+    """
+    client = _clients.get(service_name)
+    if client is None:
+        with _lock:
+            client = _clients.get(service_name)
+            if client is None:
+                if service_name == "bedrock-agent-runtime" and RETRIEVAL_BACKEND == FAISS_BACKEND:
+                    client = _load_local_index()
+                else:
+                    ## Bedrock calls are retried by call_with_retry, botocore keeps adaptive rate limiting only
+                    config = None
+                    if service_name.startswith("bedrock"):
+                        config = retry_config(max_attempts=WRAPPED_CLIENT_MAX_ATTEMPTS)
+                    client = get_session().client(service_name, region_name=get_region_name(), config=config)
+                _clients[service_name] = client
+    return client
+
+
+def get_model_arn(model_id):
+    return f"arn:aws:bedrock:{get_region_name()}::foundation-model/{model_id}"
+
+
+def retrieve_and_generate_request(query, kb_id, model_id, bedrock_session_id=None):
+    """
+    Keyword arguments of RetrieveAndGenerate and RetrieveAndGenerateStream, shared by the
+    buffered and the streaming handler. A Bedrock session id continues that session.
+    """
+    request = dict(
+        input={
+            'text': query
+        },
+        retrieveAndGenerateConfiguration={
+            'type': 'KNOWLEDGE_BASE',
+            'knowledgeBaseConfiguration': {
+                'knowledgeBaseId': kb_id,
+                'modelArn': get_model_arn(model_id)
+            }
+        },
+    )
+    if bedrock_session_id:
+        request["sessionId"] = bedrock_session_id
+    return request
+
+
+def resolve_export(export_name):
+    """
+    Walk every page of ListExports and return the value of the named export.
+    Stops at the first page that contains it.
+    """
+    paginator = get_client("cloudformation").get_paginator("list_exports")
+    for page in paginator.paginate():
+        for export in page.get("Exports", []):
+            if export["Name"] == export_name:
+                return export["Value"]
+    raise ExportNotFoundError(export_name)
+
+
+def get_kb_id(force_refresh=False):
+    """
+    Return the Knowledge Base Id.
+
+    The KB_ID environment variable wins when it is set. Otherwise the id is resolved
+    from the CloudFormation exports once per container and looked up again only after
+    KB_ID_TTL_SECONDS. The local index needs no lookup.
+    """
+    global _kb_id, _kb_id_resolved_at
+    kb_id = os.environ.get(KB_ID_ENV_VAR)
+    if kb_id:
+        return kb_id
+    if RETRIEVAL_BACKEND == FAISS_BACKEND:
+        return LOCAL_KB_ID
+    with _lock:
+        expired = time.monotonic() - _kb_id_resolved_at >= KB_ID_TTL_SECONDS
+        if force_refresh or _kb_id is None or expired:
+            _kb_id = resolve_export(KB_ID_EXPORT_NAME)
+            _kb_id_resolved_at = time.monotonic()
+        return _kb_id
+
+
+def get_corpus_generation(kb_id):
+    """
+    Return the corpus generation of the knowledge base, re-read from SSM at most every
+    CORPUS_GENERATION_TTL_SECONDS. None without CORPUS_GENERATION_PREFIX, with the local
+    index (which is loaded once per container) or before the first completed ingestion.
+    """
+    global _corpus_generations
+    if not CORPUS_GENERATION_PREFIX or RETRIEVAL_BACKEND == FAISS_BACKEND:
+        return None
+    if _corpus_generations is None:
+        with _lock:
+            if _corpus_generations is None:
+                _corpus_generations = CorpusGenerationReader(
+                    lambda: get_client("ssm"), CORPUS_GENERATION_PREFIX, CORPUS_GENERATION_TTL_SECONDS
+                )
+    return _corpus_generations.get(kb_id)
+
+
+def warm_up():
+    """
+    Initialise the session, the clients and the Knowledge Base Id without serving a request.
+    """
+    get_client("bedrock-agent-runtime")
+    return get_kb_id()
+
+
+def reset():
+    """
+    Drop all cached state, so the next call builds everything again.
+    """
+    global _session, _kb_id, _kb_id_resolved_at, _corpus_generations
+    with _lock:
+        _session = None
+        _clients.clear()
+        _kb_id = None
+        _kb_id_resolved_at = 0.0
+        _corpus_generations = None
@@ -0,0 +1,85 @@
+"""
+Per-request model routing between a fast and a large Claude model.
+
+Short factual lookups go to the small model (Haiku), long or analytical
+questions to the large one (Sonnet). A request can pin the model with an
+explicit override, and an answer from the small model that comes back empty
+or with too few citations is regenerated with the large model.
+"""
+import os
+import re
+
+HAIKU_MODEL_ID = "anthropic.claude-3-haiku-20240307-v1:0"
+SONNET_MODEL_ID = "anthropic.claude-3-sonnet-20240229-v1:0"
+
+## Short names accepted in the request's "model" field
+MODEL_ALIASES = {
+    "haiku": HAIKU_MODEL_ID,
+    "sonnet": SONNET_MODEL_ID,
+}
+
+COMPLEX_QUESTION = re.compile(
+    r"\b(why|explain|compare|comparison|difference|differences|versus|vs|summari[sz]e|summary|"
+    r"analy[sz]e|analysis|pros and cons|trade-?offs?|step by step|how does|how do|how would|"
+    r"recommend|evaluate|implications?)\b",
+    re.IGNORECASE,
+)
+
+
+class UnknownModelError(ValueError):
+    """
+    Raised when a request asks for a model the router may not use.
+    """
+
+
+class ModelRouter:
+
+    def __init__(
+        self,
+        small_model_id=HAIKU_MODEL_ID,
+        large_model_id=SONNET_MODEL_ID,
+        max_small_prompt_chars=200,
+        min_citations=1,
+    ):
+        self.small_model_id = small_model_id
+        self.large_model_id = large_model_id
+        self.max_small_prompt_chars = max_small_prompt_chars
+        self.min_citations = min_citations
+
+    @classmethod
+    def from_environment(cls, default_large_model_id=SONNET_MODEL_ID):
+        return cls(
+            small_model_id=os.environ.get("ROUTER_SMALL_MODEL_ID", HAIKU_MODEL_ID),
+            large_model_id=os.environ.get("ROUTER_LARGE_MODEL_ID", default_large_model_id),
+            max_small_prompt_chars=int(os.environ.get("ROUTER_MAX_SMALL_PROMPT_CHARS", "200")),
+            min_citations=int(os.environ.get("ROUTER_MIN_CITATIONS", "1")),
+        )
+
+    @property
+    def allowed_model_ids(self):
+        return {self.small_model_id, self.large_model_id}
+
+    def choose(self, query, override=None):
+        """
+        Return (model_id, reason) for a question.
+        """
+        if override is not None and not isinstance(override, str):
+            raise UnknownModelError(f"Model must be a model id or alias, not {type(override).__name__}")
+        if override:
+            model_id = MODEL_ALIASES.get(override.lower(), override)
+            if model_id not in self.allowed_model_ids:
+                raise UnknownModelError(f"Model '{override}' is not one of {sorted(self.allowed_model_ids)}")
+            return model_id, "override"
+        if len(query) > self.max_small_prompt_chars:
+            return self.large_model_id, "long_prompt"
+        if COMPLEX_QUESTION.search(query) or query.count("?") > 1:
+            return self.large_model_id, "complex_question"
+        return self.small_model_id, "short_lookup"
+
+    def needs_fallback(self, model_id, result):
+        """
+        True when an answer of the small model is empty or has too few citations.
+        """
+        if model_id != self.small_model_id or model_id == self.large_model_id:
+            return False
+        return not result["response"].strip() or len(result.get("citations", [])) < self.min_citations
@@ -0,0 +1,5 @@
+#!/bin/bash
+
+# Layers are only on sys.path of the managed runtime, not of this process
+export PYTHONPATH="/opt/python:${LAMBDA_TASK_ROOT}:${PYTHONPATH}"
+exec python3 stream_server.py
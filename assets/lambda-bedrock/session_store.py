@@ -0,0 +1,106 @@
+"""
+Mapping from our client sessionId to the Bedrock RetrieveAndGenerate sessionId.
+
+Follow-up turns pass the stored Bedrock session back to RetrieveAndGenerate, so
+the conversation state stays server side instead of being resent. The store is
+in memory by default and DynamoDB backed when SESSION_TABLE_NAME is set.
+"""
+import os
+import threading
+import time
+
+import clients
+
+## Bedrock keeps session state for a limited time, so expire the mapping before it does
+SESSION_TTL_SECONDS = int(os.environ.get("SESSION_TTL_SECONDS", "3600"))
+
+
+class InMemorySessionStore:
+
+    def __init__(self, ttl_seconds=SESSION_TTL_SECONDS, clock=time.time):
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def get(self, session_id):
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                return None
+            if entry[1] <= self._clock():
+                del self._sessions[session_id]
+                return None
+            return entry[0]
+
+    def put(self, session_id, bedrock_session_id):
+        with self._lock:
+            self._sessions[session_id] = (bedrock_session_id, self._clock() + self.ttl_seconds)
+
+    def delete(self, session_id):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+
+class DynamoDBSessionStore:
+    """
+    Items look like {"sessionId": ..., "bedrockSessionId": ..., "expiresAt": <epoch seconds>}.
+    expiresAt is the table's TTL attribute. DynamoDB deletes expired items lazily, so
+    reads check it as well.
+    """
+
+    def __init__(self, table_name, ttl_seconds=SESSION_TTL_SECONDS, client=None, clock=time.time):
+        self.table_name = table_name
+        self.ttl_seconds = ttl_seconds
+        self._client = client
+        self._clock = clock
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = clients.get_client("dynamodb")
+        return self._client
+
+    def get(self, session_id):
+        item = self.client.get_item(
+            TableName=self.table_name,
+            Key={"sessionId": {"S": session_id}},
+        ).get("Item")
+        if item is None or int(item["expiresAt"]["N"]) <= self._clock():
+            return None
+        return item["bedrockSessionId"]["S"]
+
+    def put(self, session_id, bedrock_session_id):
+        self.client.put_item(
+            TableName=self.table_name,
+            Item={
+                "sessionId": {"S": session_id},
+                "bedrockSessionId": {"S": bedrock_session_id},
+                "expiresAt": {"N": str(int(self._clock() + self.ttl_seconds))},
+            },
+        )
+
+    def delete(self, session_id):
+        self.client.delete_item(
+            TableName=self.table_name,
+            Key={"sessionId": {"S": session_id}},
+        )
+
+
+_store = None
+
+
+def get_session_store():
+    """
+    Return the container wide store, DynamoDB backed when SESSION_TABLE_NAME is set.
+    """
+    global _store
+    if _store is None:
+        table_name = os.environ.get("SESSION_TABLE_NAME")
+        _store = DynamoDBSessionStore(table_name) if table_name else InMemorySessionStore()
+    return _store
+
+
+def reset():
+    global _store
+    _store = None
@@ -0,0 +1,97 @@
+"""
+HTTP entry point for the streaming chat function.
+
+Python Lambda runtimes cannot stream a response from a plain handler, so the
+streaming function runs this server behind the Lambda Web Adapter with
+AWS_LWA_INVOKE_MODE=response_stream. Every event from stream_answer() is
+written as one newline-delimited JSON chunk as soon as Bedrock produces it.
+"""
+import json
+import logging
+import os
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from botocore.exceptions import ClientError
+
+import clients
+from model_router import ModelRouter, UnknownModelError
+from resilience import CircuitBreaker, CircuitOpenError
+from streaming import stream_answer
+
+bedrock_breaker = CircuitBreaker.from_environment()
+## Streamed answers cannot fall back to the large model, routing only picks the first model
+model_router = ModelRouter.from_environment(default_large_model_id=clients.MODEL_ID)
+
+
+class StreamHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        ## Readiness check of the Lambda Web Adapter
+        self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_POST(self):
+        try:
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            query = body.get('userPrompt') if isinstance(body, dict) else None
+            if not isinstance(query, str) or not query.strip():
+                raise ValueError("userPrompt must be a non-empty string")
+        except ValueError as e:
+            self._send_error(400, f"Invalid request body: {e}")
+            return
+        print(f"Session: {body.get('sessionId')} as question {query}")
+
+        try:
+            model_id, _ = model_router.choose(query, body.get('model'))
+            events = stream_answer(query, model_id, body.get('sessionId'), breaker=bedrock_breaker)
+            first_event = next(events)
+        except UnknownModelError as e:
+            self._send_error(400, str(e))
+            return
+        except CircuitOpenError as e:
+            logging.error(e)
+            self._send_error(503, str(e), {"Retry-After": str(e.retry_after)})
+            return
+        except (ClientError, clients.ExportNotFoundError) as e:
+            logging.error(e)
+            first_event = {"type": "error", "error": str(e)}
+            events = iter(())
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        self._write_chunk(json.dumps(first_event) + "\n")
+        try:
+            for event in events:
+                self._write_chunk(json.dumps(event) + "\n")
+        except (ClientError, clients.ExportNotFoundError) as e:
+            logging.error(e)
+            self._write_chunk(json.dumps({"type": "error", "error": str(e)}) + "\n")
+        self._write_chunk("")
+
+    def _send_error(self, status, message, headers=None):
+        error = json.dumps({"error": message}).encode("utf-8")
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(error)))
+        self.end_headers()
+        self.wfile.write(error)
+
+    def _write_chunk(self, text):
+        data = text.encode("utf-8")
+        self.wfile.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+
+def main():
+    server = ThreadingHTTPServer(("127.0.0.1", int(os.environ.get("PORT", "8080"))), StreamHandler)
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
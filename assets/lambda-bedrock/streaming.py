@@ -0,0 +1,78 @@
+"""
+Streaming variant of the chat handler built on RetrieveAndGenerateStream.
+
+stream_answer() turns the Bedrock event stream into small JSON-serialisable
+events (text chunks, citations and a final summary), which stream_server.py
+forwards to the caller as newline-delimited JSON while they arrive.
+"""
+import time
+
+import clients
+from answer_cache import answer_cache, make_key
+from resilience import call_with_retry
+from session_store import get_session_store
+
+
+def _reference(reference):
+    return {
+        "text": reference.get("content", {}).get("text"),
+        "location": reference.get("location"),
+    }
+
+
+def stream_answer(query, model_id=None, session_id=None, clock=time.monotonic, breaker=None):
+    """
+    Yield {"type": "text"}, {"type": "citation"} and a final {"type": "done"} event.
+    Follow-up turns of a known session continue the Bedrock session like the buffered handler.
+
+    The done event carries timeToFirstTokenMs and totalMs, measured from the call
+    until the first text chunk and until the end of the stream.
+    """
+    model_id = model_id or clients.MODEL_ID
+    started = clock()
+    first_token_at = None
+    kb_id = clients.get_kb_id()
+    ## Shares cache entries with the buffered RetrieveAndGenerate handler
+    cache_key = make_key(kb_id, f"retrieve_and_generate/{model_id}", query, clients.get_corpus_generation(kb_id))
+    sessions = get_session_store()
+    bedrock_session_id = sessions.get(session_id) if session_id else None
+
+    ## A session needs a Bedrock session from its first turn on, only stateless questions use the cache
+    cached = answer_cache.get(cache_key) if not session_id else None
+    if cached is not None:
+        first_token_at = clock()
+        yield {"type": "text", "text": cached["response"]}
+        if cached["citations"]:
+            yield {"type": "citation", "references": cached["citations"]}
+    else:
+        request = clients.retrieve_and_generate_request(query, kb_id, model_id, bedrock_session_id)
+        ## Only opening the stream is retried, chunks already sent cannot be taken back
+        response = call_with_retry(
+            clients.get_client("bedrock-agent-runtime").retrieve_and_generate_stream, breaker=breaker, **request
+        )
+        bedrock_session_id = response.get("sessionId")
+        parts, citations = [], []
+        for event in response["stream"]:
+            if "output" in event:
+                if first_token_at is None:
+                    first_token_at = clock()
+                parts.append(event["output"]["text"])
+                yield {"type": "text", "text": event["output"]["text"]}
+            elif "citation" in event:
+                references = [_reference(r) for r in event["citation"].get("retrievedReferences", [])]
+                citations.extend(references)
+                yield {"type": "citation", "references": references}
+        if session_id and bedrock_session_id:
+            sessions.put(session_id, bedrock_session_id)
+        if "sessionId" not in request:
+            answer_cache.put(cache_key, {"response": "".join(parts), "citations": citations})
+
+    finished = clock()
+    yield {
+        "type": "done",
+        "sessionId": bedrock_session_id,
+        "modelId": model_id,
+        "cacheHit": cached is not None,
+        "timeToFirstTokenMs": None if first_token_at is None else round((first_token_at - started) * 1000, 1),
+        "totalMs": round((finished - started) * 1000, 1),
+    }
@@ -0,0 +1,77 @@
+"""
+Corpus generation of a knowledge base, kept in SSM Parameter Store.
+
+knowledge_base/operations.py writes the id of the last completed ingestion job
+of a knowledge base to /chat-with-pdf/<kb_id>/corpus-generation. The chat
+Lambdas put the generation into their answer cache keys, so once an ingestion
+has finished every warm container stops serving answers from the old corpus
+within CORPUS_GENERATION_TTL_SECONDS, instead of after the answer cache TTL.
+
+Readers cache the parameter per knowledge base for that short TTL, so a warm
+container makes at most one GetParameter call per knowledge base and TTL.
+
+Shipped in the common Lambda layer, so the chat Lambdas and
+knowledge_base/operations.py share the parameter name.
+"""
+import logging
+import threading
+import time
+
+from botocore.exceptions import ClientError
+
+PARAMETER_PREFIX = "/chat-with-pdf"
+DEFAULT_TTL_SECONDS = 30
+
+logger = logging.getLogger(__name__)
+
+
+def parameter_name(kb_id, prefix=PARAMETER_PREFIX):
+    return f"{prefix.rstrip('/')}/{kb_id}/corpus-generation"
+
+
+def publish(ssm_client, kb_id, generation, prefix=PARAMETER_PREFIX):
+    """
+    Record a new corpus generation of the knowledge base, e.g. a completed ingestion job id.
+    """
+    ssm_client.put_parameter(
+        Name=parameter_name(kb_id, prefix),
+        Value=generation,
+        Type="String",
+        Overwrite=True,
+    )
+
+
+class CorpusGenerationReader:
+    """
+    Reads the corpus generation of a knowledge base and trusts it for ttl_seconds.
+    get_client() returns the SSM client and is only called on the first read.
+    """
+
+    def __init__(self, get_client, prefix=PARAMETER_PREFIX, ttl_seconds=DEFAULT_TTL_SECONDS, clock=time.monotonic):
+        self._get_client = get_client
+        self.prefix = prefix
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._generations = {}
+        self._lock = threading.Lock()
+
+    def get(self, kb_id):
+        """
+        Return the generation of the knowledge base, None when none was published yet.
+        """
+        with self._lock:
+            entry = self._generations.get(kb_id)
+            if entry is not None and self._clock() - entry[1] < self.ttl_seconds:
+                return entry[0]
+        try:
+            response = self._get_client().get_parameter(Name=parameter_name(kb_id, self.prefix))
+            generation = response["Parameter"]["Value"]
+        except ClientError as e:
+            generation = None
+            if e.response["Error"]["Code"] != "ParameterNotFound":
+                ## Answers must not fail on SSM, the last known generation is used until the next read
+                logger.warning(f"Reading the corpus generation of {kb_id} failed: {e}")
+                generation = entry[0] if entry is not None else None
+        with self._lock:
+            self._generations[kb_id] = (generation, self._clock())
+        return generation
@@ -0,0 +1,75 @@
+"""
+Metrics in CloudWatch Embedded Metric Format (EMF).
+
+A MetricsLogger collects metrics, dimensions and properties for one unit of
+work (a Lambda invocation, a CLI operation) and flush() writes them as a single
+JSON log line. CloudWatch Logs turns such lines into metrics without any API
+call, so emitting them costs no latency on the request path.
+
+https://docs.aws.amazon.com/AmazonCloudWatch/latest/monitoring/CloudWatch_Embedded_Metric_Format_Specification.html
+"""
+import json
+import time
+from contextlib import contextmanager
+
+DEFAULT_NAMESPACE = "ChatWithPdf"
+
+
+class MetricsLogger:
+
+    def __init__(self, namespace=DEFAULT_NAMESPACE, dimensions=None, emit=print, clock=time.perf_counter):
+        self.namespace = namespace
+        self.dimensions = dict(dimensions or {})
+        self.metrics = {}
+        self.properties = {}
+        self._emit = emit
+        self._clock = clock
+
+    def put_dimension(self, name, value):
+        self.dimensions[name] = str(value)
+
+    def put_metric(self, name, value, unit="None"):
+        self.metrics[name] = (value, unit)
+
+    def set_property(self, name, value):
+        self.properties[name] = value
+
+    @contextmanager
+    def timer(self, name):
+        """
+        Record the wall time of the block in milliseconds, also when it raises.
+        """
+        started = self._clock()
+        try:
+            yield
+        finally:
+            self.put_metric(name, round((self._clock() - started) * 1000, 3), "Milliseconds")
+
+    def to_dict(self):
+        record = {
+            "_aws": {
+                "Timestamp": int(time.time() * 1000),
+                "CloudWatchMetrics": [
+                    {
+                        "Namespace": self.namespace,
+                        "Dimensions": [sorted(self.dimensions)],
+                        "Metrics": [
+                            {"Name": name, "Unit": unit} for name, (_, unit) in self.metrics.items()
+                        ],
+                    }
+                ],
+            }
+        }
+        record.update(self.properties)
+        record.update(self.dimensions)
+        record.update({name: value for name, (value, _) in self.metrics.items()})
+        return record
+
+    def flush(self):
+        """
+        Emit the collected metrics as one EMF line and start over with the same dimensions.
+        """
+        if self.metrics:
+            self._emit(json.dumps(self.to_dict()))
+        self.metrics = {}
+        self.properties = {}
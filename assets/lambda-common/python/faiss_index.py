@@ -0,0 +1,275 @@
+"""
+Offline vector index with the layout of the knowledge base's AOSS index.
+
+FaissVectorIndex mirrors the mapping create_oss_index.py puts on the
+collection: 1536-dim vectors in a faiss HNSW graph (m=48, ef_construction=256)
+searched by inner product, each stored with a "text" and a "text-metadata"
+field. The metadata is the JSON the knowledge base writes, with the source URI
+under x-amz-bedrock-kb-source-uri.
+
+FaissRetrieveClient answers retrieve() like the bedrock-agent-runtime client:
+the query is embedded with the model the index was built with, and the top-k
+results come back with content text, score, S3 location and metadata. Scores
+are translated the way OpenSearch scores faiss inner product hits. It can
+stand in for the runtime client wherever only Retrieve is used (Retrieve API,
+batch retrieve, the two-stage pipeline, the retrieval benchmark).
+
+An index is saved as a folder with index.faiss, documents.jsonl and
+config.json.
+"""
+import json
+import os
+import re
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+import faiss
+import numpy as np
+
+import rag_pipeline
+
+## Parameters of the knn_vector field in assets/lambda-index/create_oss_index.py
+DIMENSION = 1536
+HNSW_M = 48
+HNSW_EF_CONSTRUCTION = 256
+## OpenSearch's default ef_search for the faiss engine
+DEFAULT_EF_SEARCH = 100
+
+TITAN_EMBEDDING_MODEL_ID = "amazon.titan-embed-text-v1"
+## Default output dimension of the Titan text models the stacks grant, v2 also returns 512 or 256 on request
+TITAN_DIMENSIONS = {"amazon.titan-embed-text-v1": 1536, "amazon.titan-embed-text-v2:0": 1024}
+## Deterministic embedding without a model, for tests and air-gapped demos
+HASHING_EMBEDDING_MODEL_ID = "local-hashing"
+
+SOURCE_URI_KEY = "x-amz-bedrock-kb-source-uri"
+PAGE_NUMBER_KEY = "x-amz-bedrock-kb-document-page-number"
+
+INDEX_FILE = "index.faiss"
+DOCUMENTS_FILE = "documents.jsonl"
+CONFIG_FILE = "config.json"
+
+_WORD = re.compile(r"\w+")
+
+
+def _direct(fn, **kwargs):
+    return fn(**kwargs)
+
+
+class HashingEmbedder:
+    """
+    Feature hashing of the words of a text into a unit vector. Texts that share words get a
+    positive inner product, which is enough to exercise retrieval without Bedrock.
+    """
+
+    model_id = HASHING_EMBEDDING_MODEL_ID
+
+    def __init__(self, dimension=DIMENSION):
+        self.dimension = dimension
+
+    def embed(self, texts):
+        vectors = np.zeros((len(texts), self.dimension), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for word in _WORD.findall(text.lower()):
+                bucket = zlib.crc32(word.encode("utf-8"))
+                vectors[row, bucket % self.dimension] += 1.0 if bucket & 0x80000000 else -1.0
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.where(norms == 0, 1.0, norms)
+
+
+class TitanEmbedder:
+    """
+    Embeddings of a Titan text model through InvokeModel, one call per text, a few in parallel.
+    invoke(fn, **kwargs) performs the API call, e.g. resilience.call_with_retry.
+    """
+
+    def __init__(self, runtime_client, model_id=TITAN_EMBEDDING_MODEL_ID, dimension=DIMENSION,
+                 max_workers=8, invoke=_direct):
+        self.runtime_client = runtime_client
+        self.model_id = model_id
+        self.dimension = dimension
+        self.max_workers = max_workers
+        self._invoke = invoke
+
+    def _embed_one(self, text):
+        body = dict(inputText=text)
+        ## Only v1 has a fixed output dimension, later Titan models take it as a parameter
+        if self.model_id != TITAN_EMBEDDING_MODEL_ID:
+            body["dimensions"] = self.dimension
+        response = self._invoke(
+            self.runtime_client.invoke_model,
+            modelId=self.model_id,
+            contentType="application/json",
+            accept="application/json",
+            body=json.dumps(body),
+        )
+        return json.loads(response["body"].read())["embedding"]
+
+    def embed(self, texts):
+        if len(texts) <= 1:
+            embeddings = [self._embed_one(text) for text in texts]
+        else:
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(texts))) as executor:
+                embeddings = list(executor.map(self._embed_one, texts))
+        return np.asarray(embeddings, dtype=np.float32).reshape(len(texts), self.dimension)
+
+
+def model_dimension(model_id):
+    return TITAN_DIMENSIONS.get(model_id, DIMENSION)
+
+
+def embedder_for(model_id, runtime_client=None, dimension=None, invoke=_direct):
+    dimension = dimension or model_dimension(model_id)
+    if model_id == HASHING_EMBEDDING_MODEL_ID:
+        return HashingEmbedder(dimension)
+    if runtime_client is None:
+        raise ValueError(f"Embedding model {model_id} needs a bedrock-runtime client")
+    return TitanEmbedder(runtime_client, model_id, dimension, invoke=invoke)
+
+
+def make_document(text, source_uri, page_number=None):
+    """
+    The fields the knowledge base stores per chunk in the vector index.
+    """
+    metadata = {SOURCE_URI_KEY: source_uri}
+    if page_number is not None:
+        metadata[PAGE_NUMBER_KEY] = page_number
+    return {"text": text, "text-metadata": json.dumps(metadata)}
+
+
+def opensearch_score(inner_product):
+    ## How OpenSearch turns a faiss inner product into a non-negative score
+    if inner_product < 0:
+        return 1 / (1 - inner_product)
+    return inner_product + 1
+
+
+class FaissVectorIndex:
+
+    def __init__(self, dimension=DIMENSION, m=HNSW_M, ef_construction=HNSW_EF_CONSTRUCTION,
+                 ef_search=DEFAULT_EF_SEARCH, embedding_model=TITAN_EMBEDDING_MODEL_ID, index=None, documents=None):
+        if index is None:
+            index = faiss.IndexHNSWFlat(dimension, m, faiss.METRIC_INNER_PRODUCT)
+            index.hnsw.efConstruction = ef_construction
+        self.index = index
+        self.dimension = dimension
+        self.m = m
+        self.ef_construction = ef_construction
+        self.ef_search = ef_search
+        self.embedding_model = embedding_model
+        self.documents = documents if documents is not None else []
+
+    def __len__(self):
+        return len(self.documents)
+
+    def add(self, vectors, documents):
+        """
+        Add vectors with their {"text", "text-metadata"} documents, in the same order.
+        """
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        if vectors.shape != (len(documents), self.dimension):
+            raise ValueError(f"Expected {len(documents)} vectors of dimension {self.dimension}, got {vectors.shape}")
+        self.index.add(vectors)
+        self.documents.extend(documents)
+
+    def search(self, vector, k):
+        """
+        Return the k nearest documents of a query vector as (inner product, document), best first.
+        """
+        if not self.documents or k < 1:
+            return []
+        query = np.ascontiguousarray(np.reshape(vector, (1, self.dimension)), dtype=np.float32)
+        ## Per call parameters keep concurrent searches with different k independent
+        params = faiss.SearchParametersHNSW(efSearch=max(self.ef_search, k))
+        distances, ids = self.index.search(query, k, params=params)
+        return [
+            (float(distance), self.documents[i])
+            for distance, i in zip(distances[0], ids[0])
+            if i >= 0
+        ]
+
+    def config(self):
+        return dict(
+            dimension=self.dimension,
+            method=dict(name="hnsw", space_type="innerproduct", engine="faiss",
+                        parameters=dict(m=self.m, ef_construction=self.ef_construction)),
+            ef_search=self.ef_search,
+            embedding_model=self.embedding_model,
+            documents=len(self.documents),
+        )
+
+    def save(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        faiss.write_index(self.index, os.path.join(directory, INDEX_FILE))
+        with open(os.path.join(directory, DOCUMENTS_FILE), "w") as f:
+            for document in self.documents:
+                f.write(json.dumps(document) + "\n")
+        with open(os.path.join(directory, CONFIG_FILE), "w") as f:
+            json.dump(self.config(), f, indent=2)
+
+    @classmethod
+    def load(cls, directory):
+        with open(os.path.join(directory, CONFIG_FILE)) as f:
+            config = json.load(f)
+        with open(os.path.join(directory, DOCUMENTS_FILE)) as f:
+            documents = [json.loads(line) for line in f if line.strip()]
+        index = faiss.read_index(os.path.join(directory, INDEX_FILE))
+        if index.ntotal != len(documents):
+            raise ValueError(f"{directory} holds {index.ntotal} vectors but {len(documents)} documents")
+        parameters = config["method"]["parameters"]
+        return cls(
+            dimension=config["dimension"],
+            m=parameters["m"],
+            ef_construction=parameters["ef_construction"],
+            ef_search=config.get("ef_search", DEFAULT_EF_SEARCH),
+            embedding_model=config["embedding_model"],
+            index=index,
+            documents=documents,
+        )
+
+
+class FaissRetrieveClient:
+    """
+    Serves retrieve() from a FaissVectorIndex with the request and response shape of Bedrock.
+    """
+
+    def __init__(self, index, embedder):
+        self.index = index
+        self.embedder = embedder
+
+    @classmethod
+    def load(cls, directory, get_runtime_client=None, invoke=_direct):
+        """
+        Load a saved index. get_runtime_client() is only called when the index was built with a
+        Bedrock embedding model, so a hashing index needs no AWS at all.
+        """
+        index = FaissVectorIndex.load(directory)
+        runtime_client = None
+        if index.embedding_model != HASHING_EMBEDDING_MODEL_ID and get_runtime_client is not None:
+            runtime_client = get_runtime_client()
+        return cls(index, embedder_for(index.embedding_model, runtime_client, index.dimension, invoke=invoke))
+
+    def retrieve(self, retrievalQuery, knowledgeBaseId=None, retrievalConfiguration=None):
+        configuration = (retrievalConfiguration or {}).get("vectorSearchConfiguration", {})
+        number_of_results = configuration.get("numberOfResults", 5)
+        search_type = configuration.get("overrideSearchType", "SEMANTIC")
+        query = retrievalQuery["text"]
+
+        ## Hybrid search reranks a larger semantic candidate set lexically, like rag_pipeline.rerank
+        k = max(number_of_results * 4, 20) if search_type == "HYBRID" else number_of_results
+        chunks = []
+        for inner_product, document in self.index.search(self.embedder.embed([query])[0], k):
+            metadata = json.loads(document.get("text-metadata") or "{}")
+            chunks.append(dict(
+                text=document["text"],
+                score=opensearch_score(inner_product),
+                location=dict(type="S3", s3Location=dict(uri=metadata.get(SOURCE_URI_KEY))),
+                metadata=metadata,
+            ))
+        if search_type == "HYBRID":
+            chunks = [dict(chunk, score=chunk.pop("rerank_score")) for chunk in rag_pipeline.rerank(query, chunks)]
+
+        return dict(retrievalResults=[
+            dict(content=dict(text=chunk["text"]), score=chunk["score"], location=chunk["location"],
+                 metadata=chunk["metadata"])
+            for chunk in chunks[:number_of_results]
+        ])
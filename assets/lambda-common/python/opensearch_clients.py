@@ -0,0 +1,132 @@
+"""
+Shared OpenSearch Serverless clients.
+
+get_client() returns one client per endpoint and configuration (session,
+timeout, pool size) for the whole process, so index
+creation, cleanup and any later call reuse the same pooled keep-alive
+connections instead of opening a new pool (and TLS handshakes) every time.
+
+Requests are signed with credentials looked up from the boto3 session for
+every request, so clients that outlive temporary credentials (long CLI
+sessions, assumed roles, warm Lambda containers) keep working after the
+credentials are refreshed.
+
+get_async_client() is the asyncio variant. It needs aiohttp, which is not a
+dependency of the Lambdas and is only imported when it is used.
+
+Shipped in the common Lambda layer, so the index Lambda and
+knowledge_base/operations.py share it.
+"""
+import threading
+
+import boto3
+from opensearchpy import AWSV4SignerAuth, OpenSearch, RequestsHttpConnection
+
+SERVICE_NAME = "aoss"
+DEFAULT_TIMEOUT = 300
+DEFAULT_POOL_MAXSIZE = 20
+
+_lock = threading.Lock()
+_clients = {}
+_async_clients = {}
+
+
+class SessionCredentials:
+    """
+    Credentials provider for the SigV4 signer that resolves the session's current
+    credentials on every request instead of keeping the ones seen at startup.
+    """
+
+    def __init__(self, session):
+        self.session = session
+
+    def get_frozen_credentials(self):
+        credentials = self.session.get_credentials()
+        if credentials is None:
+            raise RuntimeError("No AWS credentials found for the OpenSearch client")
+        return credentials.get_frozen_credentials()
+
+
+def collection_host(collection_id, region_name):
+    return f"{collection_id}.{region_name}.aoss.amazonaws.com"
+
+
+def normalize_host(endpoint):
+    """
+    Accept a collection endpoint with or without scheme and trailing slash.
+    """
+    return endpoint.split("://", 1)[-1].rstrip("/")
+
+
+def _resolve(endpoint, session, region_name, service, port, timeout, pool_maxsize):
+    """
+    Return the host, session, region and the cache key of a client. Callers that pass no
+    session share the default one, others get a client signed with their own session.
+    """
+    ## The cached client's signer holds the session, so its id is not reused while the entry lives
+    session_key = None if session is None else id(session)
+    session = session or boto3.Session()
+    region_name = region_name or session.region_name
+    host = normalize_host(endpoint)
+    return host, session, region_name, (host, port, region_name, service, session_key, timeout, pool_maxsize)
+
+
+def get_client(endpoint, session=None, region_name=None, service=SERVICE_NAME, port=443,
+               timeout=DEFAULT_TIMEOUT, pool_maxsize=DEFAULT_POOL_MAXSIZE):
+    """
+    Return the cached OpenSearch client for the endpoint and configuration, creating it on first use.
+    """
+    host, session, region_name, key = _resolve(endpoint, session, region_name, service, port, timeout, pool_maxsize)
+    with _lock:
+        client = _clients.get(key)
+        if client is None:
+            client = OpenSearch(
+                hosts=[{"host": host, "port": port}],
+                http_auth=AWSV4SignerAuth(SessionCredentials(session), region_name, service),
+                use_ssl=True,
+                verify_certs=True,
+                connection_class=RequestsHttpConnection,
+                timeout=timeout,
+                pool_maxsize=pool_maxsize,
+            )
+            _clients[key] = client
+        return client
+
+
+def get_async_client(endpoint, session=None, region_name=None, service=SERVICE_NAME, port=443,
+                     timeout=DEFAULT_TIMEOUT, pool_maxsize=DEFAULT_POOL_MAXSIZE):
+    """
+    Return the cached AsyncOpenSearch client for the endpoint and configuration. Requires aiohttp.
+    """
+    try:
+        from opensearchpy import AIOHttpConnection, AsyncOpenSearch, AWSV4SignerAsyncAuth
+    except ImportError as e:
+        raise ImportError("The async OpenSearch client needs aiohttp: pip install 'opensearch-py[async]'") from e
+
+    host, session, region_name, key = _resolve(endpoint, session, region_name, service, port, timeout, pool_maxsize)
+    with _lock:
+        client = _async_clients.get(key)
+        if client is None:
+            client = AsyncOpenSearch(
+                hosts=[{"host": host, "port": port}],
+                http_auth=AWSV4SignerAsyncAuth(SessionCredentials(session), region_name, service),
+                use_ssl=True,
+                verify_certs=True,
+                connection_class=AIOHttpConnection,
+                timeout=timeout,
+                pool_maxsize=pool_maxsize,
+            )
+            _async_clients[key] = client
+        return client
+
+
+def reset():
+    """
+    Close and forget the cached synchronous clients. Async clients must be closed
+    by their event loop (await client.close()), so they are only forgotten.
+    """
+    with _lock:
+        for client in _clients.values():
+            client.close()
+        _clients.clear()
+        _async_clients.clear()
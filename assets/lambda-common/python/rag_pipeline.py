@@ -0,0 +1,228 @@
+"""
+Two-stage retrieve-then-generate pipeline.
+
+Instead of handing retrieval and prompt construction to RetrieveAndGenerate,
+this pipeline
+1. calls Retrieve with a larger numberOfResults,
+2. drops near duplicate chunks and trims the text that overlaps between
+   neighbouring chunks of the same document (FIXED_SIZE chunking overlaps 20%),
+3. reranks the candidates locally with BM25 blended with the retrieval score,
+4. packs the best chunks into a token budget and
+5. invokes the model directly with that context.
+
+Shipped in the common Lambda layer, so the chat Lambda and
+knowledge_base/operations.py share it.
+"""
+import json
+import math
+import re
+from collections import Counter
+
+ANTHROPIC_VERSION = "bedrock-2023-05-31"
+
+DEFAULT_NUMBER_OF_RESULTS = 20
+DEFAULT_CONTEXT_TOKEN_BUDGET = 2000
+DEFAULT_MAX_ANSWER_TOKENS = 512
+
+## Roughly 4 characters per token for English text with Claude and Titan tokenizers
+CHARS_PER_TOKEN = 4
+
+SYSTEM_PROMPT = (
+    "You are a question answering assistant. Answer the question using only the "
+    "numbered search results provided. If the search results do not contain the "
+    "answer, say that you could not find it."
+)
+
+_WORD = re.compile(r"\w+")
+
+
+def _direct(fn, **kwargs):
+    return fn(**kwargs)
+
+
+def estimate_tokens(text):
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def _terms(text):
+    return _WORD.findall(text.lower())
+
+
+def _source(chunk):
+    return json.dumps(chunk.get("location"), sort_keys=True)
+
+
+def retrieve_chunks(agent_runtime_client, kb_id, query, number_of_results=DEFAULT_NUMBER_OF_RESULTS,
+                    search_type=None, invoke=_direct):
+    """
+    Call the Retrieve API and return the results as {"text", "score", "location", "metadata"} dicts.
+    invoke(fn, **kwargs) performs the API call, e.g. resilience.call_with_retry.
+    """
+    vector_search_configuration = dict(numberOfResults=number_of_results)
+    if search_type:
+        vector_search_configuration["overrideSearchType"] = search_type
+    response = invoke(
+        agent_runtime_client.retrieve,
+        retrievalQuery=dict(text=query),
+        knowledgeBaseId=kb_id,
+        retrievalConfiguration=dict(vectorSearchConfiguration=vector_search_configuration),
+    )
+    return [
+        dict(
+            text=result["content"]["text"],
+            score=result.get("score", 0.0),
+            location=result.get("location"),
+            metadata=result.get("metadata", {}),
+        )
+        for result in response["retrievalResults"]
+    ]
+
+
+def _shingles(words, size=8):
+    if len(words) <= size:
+        return {tuple(words)}
+    return {tuple(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+def _overlap_length(previous_words, words, min_words):
+    """
+    Length of the longest suffix of previous_words that is also a prefix of words.
+    """
+    longest = min(len(previous_words), len(words))
+    first_word = words[0] if words else None
+    for start in range(len(previous_words) - longest, len(previous_words) - min_words + 1):
+        if previous_words[start] != first_word:
+            continue
+        length = len(previous_words) - start
+        if previous_words[start:] == words[:length]:
+            return length
+    return 0
+
+
+def dedupe_chunks(chunks, containment_threshold=0.8, min_overlap_words=8):
+    """
+    Drop chunks that are mostly contained in a higher scoring chunk, then cut the leading
+    words a chunk shares with the tail of another kept chunk from the same document.
+    """
+    kept = []
+    for chunk in sorted(chunks, key=lambda c: c["score"], reverse=True):
+        words = chunk["text"].split()
+        shingles = _shingles(words)
+        duplicate = any(
+            len(shingles & other["_shingles"]) >= containment_threshold * len(shingles)
+            for other in kept
+        )
+        if not duplicate:
+            kept.append(dict(chunk, _words=words, _shingles=shingles))
+
+    for chunk in kept:
+        for other in kept:
+            if other is chunk or _source(other) != _source(chunk):
+                continue
+            overlap = _overlap_length(other["_words"], chunk["_words"], min_overlap_words)
+            if overlap and overlap < len(chunk["_words"]):
+                chunk["_words"] = chunk["_words"][overlap:]
+                chunk["text"] = " ".join(chunk["_words"])
+                break
+
+    return [{k: v for k, v in chunk.items() if not k.startswith("_")} for chunk in kept]
+
+
+def rerank(query, chunks, k1=1.2, b=0.75, lexical_weight=0.5):
+    """
+    Score the candidates with BM25 over the candidate set itself, scaled to [0, 1], and
+    blend it with the retrieval score. Returns new chunk dicts sorted best first.
+    """
+    if not chunks:
+        return []
+    query_terms = set(_terms(query))
+    documents = [Counter(_terms(chunk["text"])) for chunk in chunks]
+    lengths = [sum(doc.values()) for doc in documents]
+    average_length = sum(lengths) / len(lengths) or 1
+    document_frequency = Counter(term for doc in documents for term in query_terms if term in doc)
+
+    lexical = []
+    for doc, length in zip(documents, lengths):
+        score = 0.0
+        for term in query_terms:
+            frequency = doc.get(term, 0)
+            if not frequency:
+                continue
+            idf = math.log(1 + (len(documents) - document_frequency[term] + 0.5) / (document_frequency[term] + 0.5))
+            score += idf * frequency * (k1 + 1) / (frequency + k1 * (1 - b + b * length / average_length))
+        lexical.append(score)
+
+    top = max(lexical) or 1.0
+    blended = [
+        lexical_weight * lex / top + (1 - lexical_weight) * chunk["score"]
+        for lex, chunk in zip(lexical, chunks)
+    ]
+    ranked = sorted(zip(blended, chunks), key=lambda pair: pair[0], reverse=True)
+    return [dict(chunk, rerank_score=round(score, 4)) for score, chunk in ranked]
+
+
+def pack_context(chunks, token_budget=DEFAULT_CONTEXT_TOKEN_BUDGET):
+    """
+    Take chunks in rank order while they fit into the token budget.
+    """
+    packed, used = [], 0
+    for chunk in chunks:
+        tokens = estimate_tokens(chunk["text"])
+        if used + tokens > token_budget:
+            continue
+        packed.append(chunk)
+        used += tokens
+    return packed, used
+
+
+def build_prompt(query, chunks):
+    results = "\n\n".join(
+        f"<search_result index=\"{i}\">\n{chunk['text']}\n</search_result>"
+        for i, chunk in enumerate(chunks, start=1)
+    )
+    return f"<search_results>\n{results}\n</search_results>\n\nQuestion: {query}"
+
+
+def generate(runtime_client, model_id, query, chunks, max_tokens=DEFAULT_MAX_ANSWER_TOKENS, invoke=_direct):
+    """
+    Invoke an Anthropic model on Bedrock with the packed context and return (text, usage).
+    """
+    response = invoke(
+        runtime_client.invoke_model,
+        modelId=model_id,
+        contentType="application/json",
+        accept="application/json",
+        body=json.dumps(dict(
+            anthropic_version=ANTHROPIC_VERSION,
+            max_tokens=max_tokens,
+            system=SYSTEM_PROMPT,
+            messages=[dict(role="user", content=build_prompt(query, chunks))],
+        )),
+    )
+    payload = json.loads(response["body"].read())
+    text = "".join(part["text"] for part in payload["content"] if part["type"] == "text")
+    return text, payload.get("usage", {})
+
+
+def answer(agent_runtime_client, runtime_client, kb_id, model_id, query,
+           number_of_results=DEFAULT_NUMBER_OF_RESULTS, token_budget=DEFAULT_CONTEXT_TOKEN_BUDGET,
+           max_tokens=DEFAULT_MAX_ANSWER_TOKENS, invoke=_direct):
+    """
+    Run the whole pipeline and return the answer with the chunks used as citations.
+    """
+    candidates = retrieve_chunks(agent_runtime_client, kb_id, query, number_of_results, invoke=invoke)
+    ranked = rerank(query, dedupe_chunks(candidates))
+    context, context_tokens = pack_context(ranked, token_budget)
+    text, usage = generate(runtime_client, model_id, query, context, max_tokens, invoke=invoke)
+    return dict(
+        text=text,
+        citations=[dict(text=c["text"], location=c["location"], score=c["score"]) for c in context],
+        stats=dict(
+            retrieved=len(candidates),
+            after_dedupe=len(ranked),
+            packed=len(context),
+            context_tokens=context_tokens,
+            input_tokens=usage.get("input_tokens"),
+            output_tokens=usage.get("output_tokens"),
+        ),
+    )
@@ -0,0 +1,184 @@
+"""
+Retry, backoff and circuit breaking around Bedrock runtime calls.
+
+Three layers work together:
+1. retry_config() gives botocore clients adaptive retry mode, which rate limits
+   the client itself once the service starts throttling. Clients whose calls
+   all go through call_with_retry() use a single botocore attempt, so the
+   attempts do not multiply and no botocore sleep runs past the deadline.
+2. call_with_retry() retries throttling and transient errors with jittered
+   exponential backoff, but never sleeps past a deadline (in the Lambda: the
+   remaining invocation time minus a safety margin).
+3. CircuitBreaker fails fast once Bedrock is saturated, so callers can answer
+   503 with Retry-After instead of queueing more work behind the throttling.
+"""
+import os
+import random
+import threading
+import time
+
+from botocore.config import Config
+from botocore.exceptions import ClientError
+
+RETRYABLE_ERROR_CODES = {
+    "ThrottlingException",
+    "TooManyRequestsException",
+    "ServiceQuotaExceededException",
+    "ServiceUnavailableException",
+    "ModelNotReadyException",
+    "InternalServerException",
+    "DependencyFailedException",
+    "BadGatewayException",
+}
+
+
+## botocore attempts of clients whose calls are retried by call_with_retry
+WRAPPED_CLIENT_MAX_ATTEMPTS = 1
+
+
+def retry_config(max_attempts=3, read_timeout=60):
+    """
+    botocore config with adaptive retries for Bedrock clients.
+    """
+    return Config(retries=dict(max_attempts=max_attempts, mode="adaptive"), read_timeout=read_timeout)
+
+
+def is_retryable(error):
+    return isinstance(error, ClientError) and error.response.get("Error", {}).get("Code") in RETRYABLE_ERROR_CODES
+
+
+class CircuitOpenError(Exception):
+    """
+    Raised instead of calling the service while the circuit is open.
+    """
+
+    def __init__(self, retry_after):
+        super().__init__(f"Bedrock is saturated, retry after {retry_after} seconds")
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """
+    Opens after failure_threshold consecutive calls that still failed with a retryable error
+    once their retries were used up, and rejects calls for reset_timeout seconds. Then a single trial call is let through (half open): success
+    closes the circuit, another failure opens it again.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._trial_running = False
+
+    @classmethod
+    def from_environment(cls):
+        """
+        Breaker configured by BREAKER_FAILURE_THRESHOLD and BREAKER_RESET_SECONDS, like every chat entry point.
+        """
+        return cls(
+            failure_threshold=int(os.environ.get("BREAKER_FAILURE_THRESHOLD", "5")),
+            reset_timeout=float(os.environ.get("BREAKER_RESET_SECONDS", "30")),
+        )
+
+    @property
+    def state(self):
+        if self._opened_at is None:
+            return "closed"
+        if self._clock() - self._opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def retry_after(self):
+        if self._opened_at is None:
+            return 0
+        return max(1, int(round(self.reset_timeout - (self._clock() - self._opened_at))))
+
+    def before_call(self):
+        with self._lock:
+            state = self.state
+            if state == "open" or (state == "half_open" and self._trial_running):
+                raise CircuitOpenError(self.retry_after())
+            if state == "half_open":
+                self._trial_running = True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._trial_running or self._failures >= self.failure_threshold:
+                self._opened_at = self._clock()
+            self._trial_running = False
+
+    def record_neutral(self):
+        """
+        End a call that says nothing about saturation, e.g. one rejected as invalid. The failure
+        count stays, and a half open circuit lets the next call be the trial.
+        """
+        with self._lock:
+            self._trial_running = False
+
+    def reset(self):
+        self.record_success()
+
+
+def backoff_delays(base=0.2, cap=5.0, rng=random.random):
+    """
+    Endless "full jitter" exponential backoff delays.
+    """
+    attempt = 0
+    while True:
+        yield rng() * min(cap, base * 2 ** attempt)
+        attempt += 1
+
+
+def deadline_from_context(context, safety_margin=2.0, clock=time.monotonic):
+    """
+    Latest monotonic time a retry may still start, given the Lambda context.
+    """
+    if context is None or not hasattr(context, "get_remaining_time_in_millis"):
+        return None
+    return clock() + context.get_remaining_time_in_millis() / 1000 - safety_margin
+
+
+def call_with_retry(fn, *args, breaker=None, deadline=None, max_attempts=5, base_delay=0.2, max_delay=5.0,
+                    clock=None, sleep=None, rng=None, **kwargs):
+    """
+    Call fn(*args, **kwargs), retrying retryable errors with jittered backoff until
+    max_attempts or the deadline is reached. Non retryable errors are raised at once.
+    The breaker is asked once per call and learns one outcome per call: a failure only
+    when the retries are used up, nothing for a non retryable error.
+    """
+    clock = clock or time.monotonic
+    sleep = sleep or time.sleep
+    delays = backoff_delays(base_delay, max_delay, rng or random.random)
+    if breaker is not None:
+        breaker.before_call()
+    attempt = 0
+    while True:
+        attempt += 1
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as e:
+            if not is_retryable(e):
+                if breaker is not None:
+                    breaker.record_neutral()
+                raise
+            delay = next(delays)
+            out_of_time = deadline is not None and clock() + delay >= deadline
+            if attempt >= max_attempts or out_of_time:
+                if breaker is not None:
+                    breaker.record_failure()
+                raise
+            sleep(delay)
+        else:
+            if breaker is not None:
+                breaker.record_success()
+            return result
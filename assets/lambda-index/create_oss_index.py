@@ -6,16 +6,16 @@ from botocore.auth import SigV4Auth
 from botocore.awsrequest import AWSRequest
 from time import sleep
 from retrying import retry
-from opensearchpy import OpenSearch, RequestsHttpConnection, AWSV4SignerAuth
+
+# Shared pooled client factory from the common layer
+import opensearch_clients
 
 boto3_session = boto3.Session()
 region_name = boto3_session.region_name
 sts_client = boto3.client('sts')
 account_id = sts_client.get_caller_identity()["Account"]
-credentials = boto3_session.get_credentials()
 # opensearch service
 service = 'aoss'
-awsauth = auth = AWSV4SignerAuth(credentials, region_name, service)
 
 
 def handler(event, context):
@@ -60,13 +60,8 @@ def handler(event, context):
 
     try:        
         
-            oss_client = OpenSearch(
-                        hosts=[{'host': host, 'port': 443}],
-                        http_auth=awsauth,
-                        use_ssl=True,
-                        verify_certs=True,
-                        connection_class=RequestsHttpConnection,
-                        timeout=30
+            oss_client = opensearch_clients.get_client(
+                        host, session=boto3_session, region_name=region_name, service=service, timeout=30
                     )
        
             response = oss_client.indices.create(index=index_name, body=json.dumps(body_json))
@@ -0,0 +1,135 @@
+"""
+Batch evaluation of the Retrieve API.
+
+Queries are read lazily from a file (plain text, one query per line, or JSON
+lines with "query" and an optional "id"), run concurrently under a rate limit,
+and every result is written as one JSON line as soon as it completes. At most
+max_in_flight queries are pending at any time, so memory stays flat no matter
+how large the query file is.
+"""
+import json
+import logging
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import rag_pipeline
+from resilience import call_with_retry
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_NUMBER_OF_RESULTS = 5
+
+
+def iter_queries(path):
+    """
+    Yield {"id", "query"} dicts from a text or JSON lines file, skipping blank lines.
+    """
+    with open(path) as f:
+        for line_number, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith("{"):
+                record = json.loads(line)
+                yield dict(id=record.get("id", line_number), query=record["query"])
+            else:
+                yield dict(id=line_number, query=line)
+
+
+class RateLimiter:
+    """
+    Spaces calls from all worker threads at least 1 / rate seconds apart. Each caller
+    reserves the next free slot under the lock and sleeps outside of it.
+    """
+
+    def __init__(self, rate, clock=time.monotonic, sleep=time.sleep):
+        self.interval = 1.0 / rate
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._next_slot = None
+
+    def acquire(self):
+        with self._lock:
+            now = self._clock()
+            slot = now if self._next_slot is None else max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+        if slot > now:
+            self._sleep(slot - now)
+
+
+def source_uri(location):
+    if not location:
+        return None
+    for value in location.values():
+        if isinstance(value, dict) and "uri" in value:
+            return value["uri"]
+        if isinstance(value, dict) and "url" in value:
+            return value["url"]
+    return None
+
+
+def retrieve_one(agent_runtime_client, kb_id, item, number_of_results=DEFAULT_NUMBER_OF_RESULTS,
+                 search_type=None, include_text=False, invoke=call_with_retry, clock=time.perf_counter):
+    """
+    Run one query and return its JSON line record, with the error instead of results if it failed.
+    """
+    record = dict(id=item["id"], query=item["query"])
+    started = clock()
+    try:
+        chunks = rag_pipeline.retrieve_chunks(
+            agent_runtime_client, kb_id, item["query"], number_of_results, search_type=search_type, invoke=invoke
+        )
+    except Exception as ex:
+        record["error"] = str(ex)
+        chunks = None
+    record["latencyMs"] = round((clock() - started) * 1000, 1)
+    if chunks is not None:
+        record["results"] = []
+        for chunk in chunks:
+            result = dict(score=chunk["score"], uri=source_uri(chunk["location"]))
+            if include_text:
+                result["text"] = chunk["text"]
+            record["results"].append(result)
+    return record
+
+
+def run_batch(agent_runtime_client, kb_id, queries, output, max_workers=8, rate=10.0, max_in_flight=None,
+              number_of_results=DEFAULT_NUMBER_OF_RESULTS, search_type=None, include_text=False,
+              rate_limiter=None):
+    """
+    Run the queries and write one JSON line per query to the output file object in
+    completion order. Returns a summary with the query, error and latency counts.
+    """
+    rate_limiter = rate_limiter or RateLimiter(rate)
+    max_in_flight = max_in_flight or max_workers * 2
+    summary = dict(queries=0, errors=0, totalLatencyMs=0.0)
+
+    def run(item):
+        rate_limiter.acquire()
+        return retrieve_one(agent_runtime_client, kb_id, item, number_of_results, search_type, include_text)
+
+    def write(future):
+        record = future.result()
+        output.write(json.dumps(record) + "\n")
+        summary["queries"] += 1
+        summary["errors"] += int("error" in record)
+        summary["totalLatencyMs"] += record["latencyMs"]
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = set()
+        for item in queries:
+            if len(pending) >= max_in_flight:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    write(future)
+            pending.add(executor.submit(run, item))
+        for future in wait(pending).done:
+            write(future)
+
+    output.flush()
+    summary["totalLatencyMs"] = round(summary["totalLatencyMs"], 1)
+    summary["averageLatencyMs"] = round(summary["totalLatencyMs"] / summary["queries"], 1) if summary["queries"] else 0
+    logger.info(f"Batch Retrieve Summary: {summary}")
+    return summary
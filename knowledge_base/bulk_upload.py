@@ -0,0 +1,192 @@
+"""
+Parallel, resumable and dedup-aware upload of the document corpus to S3.
+
+- Files are uploaded concurrently from a thread pool, large files additionally
+  in parallel multipart chunks (TransferConfig).
+- The S3 key is the path relative to the data directory, so files with the
+  same name in different folders do not overwrite each other.
+- Every object carries the SHA-256 of its content as metadata. A file whose
+  hash matches the remote object is skipped.
+- Finished uploads are recorded in a manifest next to the data, so a rerun
+  after an interruption does not hash them again. The remote hash is still
+  checked with one HEAD request, so an object that was deleted or overwritten
+  in the bucket is uploaded again.
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from botocore.exceptions import ClientError
+
+logger = logging.getLogger(__name__)
+
+MB = 1024 * 1024
+HASH_METADATA_KEY = "sha256"
+## Multipart parts of one file in flight at once
+TRANSFER_MAX_CONCURRENCY = 8
+
+
+def pool_connections(max_workers):
+    """
+    Connections the S3 client needs so that max_workers files with default_transfer_config() never wait for one.
+    """
+    return max_workers * TRANSFER_MAX_CONCURRENCY
+
+
+def default_transfer_config():
+    """
+    Multipart settings for large PDFs: 8 parts of 16 MB in flight per file.
+    """
+    from boto3.s3.transfer import TransferConfig
+
+    return TransferConfig(
+        multipart_threshold=64 * MB,
+        multipart_chunksize=16 * MB,
+        max_concurrency=TRANSFER_MAX_CONCURRENCY,
+        use_threads=True,
+    )
+
+
+def file_sha256(path, block_size=MB):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class UploadManifest:
+    """
+    Append-only JSON lines record of uploaded files, one {"key", "sha256", "size", "mtime"}
+    per finished upload. Appending keeps the cost per upload constant and a crash loses
+    at most the line being written.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self.entries = {}
+        if path and os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue
+                    self.entries[entry.pop("key")] = entry
+
+    def recorded_sha256(self, key, stat):
+        """
+        The hash recorded for key, or None when the file changed size or mtime since.
+        """
+        entry = self.entries.get(key)
+        if entry and entry["size"] == stat.st_size and entry["mtime"] == stat.st_mtime:
+            return entry["sha256"]
+        return None
+
+    def record(self, key, sha256, stat):
+        entry = dict(sha256=sha256, size=stat.st_size, mtime=stat.st_mtime)
+        with self._lock:
+            self.entries[key] = entry
+            if self.path:
+                with open(self.path, "a") as f:
+                    f.write(json.dumps(dict(key=key, **entry)) + "\n")
+
+
+class BulkUploader:
+
+    def __init__(
+        self,
+        s3_client,
+        bucket_name,
+        data_dir,
+        prefix="",
+        max_workers=8,
+        transfer_config=None,
+        manifest_path=None,
+        exclude=(),
+    ):
+        self.s3_client = s3_client
+        self.bucket_name = bucket_name
+        self.data_dir = data_dir
+        self.prefix = prefix.strip("/")
+        self.max_workers = max_workers
+        self.transfer_config = transfer_config or default_transfer_config()
+        if manifest_path is None:
+            manifest_path = os.path.join(data_dir, f".upload-manifest-{bucket_name}.jsonl")
+        self.manifest = UploadManifest(manifest_path)
+        self.exclude = {os.path.abspath(path) for path in exclude}
+
+    def key_for(self, path):
+        relative = os.path.relpath(path, self.data_dir).replace(os.sep, "/")
+        return f"{self.prefix}/{relative}" if self.prefix else relative
+
+    def iter_files(self):
+        manifest_name = os.path.basename(self.manifest.path or "")
+        for root, dirs, files in os.walk(self.data_dir):
+            dirs.sort()
+            for file in sorted(files):
+                if file.startswith(".upload-manifest-") or file == manifest_name:
+                    continue
+                path = os.path.join(root, file)
+                if os.path.abspath(path) in self.exclude:
+                    logger.info(f"Skipping {path}, it failed validation")
+                    continue
+                yield path
+
+    def remote_sha256(self, key):
+        try:
+            response = self.s3_client.head_object(Bucket=self.bucket_name, Key=key)
+        except ClientError as e:
+            if e.response["Error"]["Code"] in ("404", "NoSuchKey", "NotFound"):
+                return None
+            raise
+        return response.get("Metadata", {}).get(HASH_METADATA_KEY)
+
+    def upload_one(self, path):
+        """
+        Upload a single file unless it is already in S3. Returns "uploaded" or "skipped".
+        """
+        key = self.key_for(path)
+        stat = os.stat(path)
+        recorded = self.manifest.recorded_sha256(key, stat)
+        sha256 = recorded or file_sha256(path)
+        if self.remote_sha256(key) == sha256:
+            if not recorded:
+                self.manifest.record(key, sha256, stat)
+            return "skipped"
+
+        self.s3_client.upload_file(
+            path,
+            self.bucket_name,
+            key,
+            ExtraArgs=dict(Metadata={HASH_METADATA_KEY: sha256}),
+            Config=self.transfer_config,
+        )
+        self.manifest.record(key, sha256, stat)
+        logger.info(f"Data gets uploaded for the file: {path} -> s3://{self.bucket_name}/{key}")
+        return "uploaded"
+
+    def upload(self):
+        """
+        Upload the whole data directory and return a summary of the run.
+        """
+        summary = dict(uploaded=0, skipped=0, failed=0, bytes=0, errors={})
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {executor.submit(self.upload_one, path): path for path in self.iter_files()}
+            for future in as_completed(futures):
+                path = futures[future]
+                try:
+                    outcome = future.result()
+                except Exception as ex:
+                    logger.error(f"Upload failed for {path}: {ex}")
+                    summary["failed"] += 1
+                    summary["errors"][path] = str(ex)
+                    continue
+                summary[outcome] += 1
+                if outcome == "uploaded":
+                    summary["bytes"] += os.path.getsize(path)
+        return summary
@@ -0,0 +1,168 @@
+"""
+Local FIXED_SIZE chunking, mirroring the knowledge base's chunking settings.
+
+The text of a document (all its pages, joined by newlines) is cut into chunks
+of max_tokens tokens. Consecutive chunks share overlap_percentage percent of
+their tokens, like Bedrock's FIXED_SIZE strategy. Tokens are approximated by a
+single regex: a run of up to six word characters or one punctuation character
+counts as one token, which stays close to subword tokenizers on English text
+without loading one.
+
+chunk_pages() works in one streaming pass over the pages. Token positions are
+kept as offsets into a text buffer that is trimmed once per page, so every
+chunk is one slice of the buffer and the work stays linear in the text length.
+
+    python chunking.py ../data --max-tokens 300 --overlap-percentage 20
+"""
+import argparse
+import json
+import logging
+import os
+import re
+import sys
+from collections import deque
+
+import pdf_extraction
+
+logger = logging.getLogger(__name__)
+
+TOKEN = re.compile(r"\w{1,6}|[^\w\s]")
+
+## Chunking of the data source in stacks/kb_stack.py
+KB_STACK_CHUNKING = dict(max_tokens=300, overlap_percentage=20)
+## Chunking of KnowledgeBaseOperations.create_kb_datasource
+CLI_CHUNKING = dict(max_tokens=512, overlap_percentage=20)
+
+
+def count_tokens(text):
+    return sum(1 for _ in TOKEN.finditer(text))
+
+
+def chunk_pages(pages, max_tokens=300, overlap_percentage=20):
+    """
+    Yield {"index", "text", "tokens", "startToken", "pages"} chunks of the pages of one document,
+    where startToken is the position of the chunk's first token in the document and pages the
+    [first, last] page number the chunk spans.
+    """
+    if max_tokens < 1 or not 0 <= overlap_percentage < 100:
+        raise ValueError("max_tokens must be positive and overlap_percentage in [0, 100)")
+    overlap = max_tokens * overlap_percentage // 100
+    step = max_tokens - overlap
+
+    buffer, base = "", 0
+    spans = deque()
+    index = 0
+    unemitted = 0
+
+    def emit(count):
+        first, last = spans[0], spans[count - 1]
+        return dict(
+            index=index,
+            text=buffer[first[0] - base:last[1] - base],
+            tokens=count,
+            startToken=index * step,
+            pages=[first[2], last[2]],
+        )
+
+    for page in pages:
+        if spans:
+            ## Only the text from the first buffered token on is still needed
+            cut = spans[0][0] - base
+            buffer, base = buffer[cut:], base + cut
+        elif buffer:
+            buffer, base = "", base + len(buffer)
+        separator = "\n" if buffer else ""
+        offset = base + len(buffer) + len(separator)
+        buffer = buffer + separator + page["text"]
+
+        for match in TOKEN.finditer(page["text"]):
+            spans.append((offset + match.start(), offset + match.end(), page["page"]))
+            unemitted += 1
+            if len(spans) == max_tokens:
+                yield emit(max_tokens)
+                index += 1
+                unemitted = 0
+                for _ in range(step):
+                    spans.popleft()
+
+    if spans and (unemitted or index == 0):
+        yield emit(len(spans))
+
+
+class ChunkReport:
+
+    def __init__(self, file):
+        self.file = file
+        self.chunks = 0
+        self.chunk_tokens = 0
+        self.document_tokens = 0
+
+    def add(self, chunk):
+        self.chunks += 1
+        self.chunk_tokens += chunk["tokens"]
+        self.document_tokens = chunk["startToken"] + chunk["tokens"]
+
+    def to_dict(self):
+        return dict(
+            file=self.file,
+            chunks=self.chunks,
+            documentTokens=self.document_tokens,
+            chunkTokens=self.chunk_tokens,
+        )
+
+
+def chunk_corpus(data_dir, max_tokens=300, overlap_percentage=20, cache=None, on_chunk=None, workers=None):
+    """
+    Chunk every PDF under data_dir and return one report per document with its chunk count, its
+    tokens and the tokens of all chunks (overlap included, i.e. what gets embedded). on_chunk(path, chunk) receives
+    every chunk as it is produced. Pages come through the ExtractionCache when one is given.
+    """
+    reports = []
+    for path in pdf_extraction.iter_pdf_files(data_dir):
+        report = ChunkReport(os.path.relpath(path, data_dir))
+        try:
+            pages, _ = pdf_extraction.document_pages(path, workers=workers, cache=cache)
+            for chunk in chunk_pages(pages, max_tokens, overlap_percentage):
+                report.add(chunk)
+                if on_chunk is not None:
+                    on_chunk(path, chunk)
+        except pdf_extraction.PdfExtractionError as ex:
+            logger.error(ex)
+        logger.info(f"Chunking Report: {report.to_dict()}")
+        reports.append(report.to_dict())
+    return reports
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Chunk the PDFs under a folder like the knowledge base does")
+    parser.add_argument("data_dir")
+    parser.add_argument("--max-tokens", type=int, default=KB_STACK_CHUNKING["max_tokens"])
+    parser.add_argument("--overlap-percentage", type=int, default=KB_STACK_CHUNKING["overlap_percentage"])
+    parser.add_argument("--output", help="write the chunks as JSON lines to this file")
+    parser.add_argument("--no-cache", action="store_true", help="parse every PDF, ignoring the extraction cache")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    from extraction_cache import ExtractionCache
+
+    cache = None if args.no_cache else ExtractionCache()
+    output = open(args.output, "w") if args.output else None
+    try:
+        def write(path, chunk):
+            output.write(json.dumps(dict(source=os.path.relpath(path, args.data_dir), **chunk)) + "\n")
+
+        reports = chunk_corpus(
+            args.data_dir, args.max_tokens, args.overlap_percentage, cache, on_chunk=write if output else None
+        )
+    finally:
+        if output:
+            output.close()
+    logger.info(
+        f"Documents: {len(reports)}, Chunks: {sum(r['chunks'] for r in reports)}, "
+        f"Tokens to embed: {sum(r['chunkTokens'] for r in reports)}"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,200 @@
+"""
+On-disk cache of chunk embeddings.
+
+Vectors are keyed by (model id, dimension, hash of the chunk text), so a
+rebuild only embeds chunks whose text changed. Each (model id, dimension) pair
+has its own store of two files:
+
+- <model>-<dimension>.<generation>.f32: the vectors as a float32 matrix, one
+  row per chunk, memory-mapped for reading and appended to for new chunks
+- <model>-<dimension>.keys: the generation of the matrix followed by the
+  16-byte text hash of every row, i.e. a compact hash -> row index
+
+Single lookups return views into the memory map. A run of consecutive rows (a
+document embedded in one go) comes back as one zero-copy slice; any other set
+of rows is gathered into a new array, i.e. copied. compact() rewrites the matrix without the rows of deleted content into the next
+generation, and the rewritten keys file switches over to it in one os.replace.
+A store is written by one process at a time.
+"""
+import hashlib
+import os
+import re
+import struct
+import threading
+
+import numpy as np
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".embedding-cache")
+KEY_BYTES = 16
+_HEADER = struct.Struct("<Q")
+
+
+def model_key(model_id):
+    """
+    File name safe model id; model ARNs as in kb_stack.py map to the same store as the bare id.
+    """
+    model_id = model_id.rsplit("foundation-model/", 1)[-1]
+    return re.sub(r"[^A-Za-z0-9.-]", "_", model_id)
+
+
+def text_key(text):
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=KEY_BYTES).digest()
+
+
+class EmbeddingStore:
+
+    def __init__(self, model_id, dimension, directory=DEFAULT_CACHE_DIR):
+        self.model_id = model_id
+        self.dimension = dimension
+        self.directory = directory
+        self._base = os.path.join(directory, f"{model_key(model_id)}-{dimension}")
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._load()
+
+    @property
+    def keys_path(self):
+        return f"{self._base}.keys"
+
+    def matrix_path(self, generation=None):
+        return f"{self._base}.{self.generation if generation is None else generation}.f32"
+
+    def _load(self):
+        self.generation = 0
+        keys = b""
+        if os.path.exists(self.keys_path):
+            with open(self.keys_path, "rb") as f:
+                (self.generation,) = _HEADER.unpack(f.read(_HEADER.size))
+                keys = f.read()
+        matrix_path = self.matrix_path()
+        matrix_rows = os.path.getsize(matrix_path) // (4 * self.dimension) if os.path.exists(matrix_path) else 0
+        ## An append interrupted between the two files leaves rows without a key or keys without a row
+        rows = min(len(keys) // KEY_BYTES, matrix_rows)
+        self._rows = {keys[i * KEY_BYTES:(i + 1) * KEY_BYTES]: i for i in range(rows)}
+        self._truncate(rows)
+        self._map(rows)
+
+    def _truncate(self, rows):
+        if os.path.exists(self.matrix_path()):
+            os.truncate(self.matrix_path(), rows * 4 * self.dimension)
+        with open(self.keys_path, "ab") as f:
+            if f.tell() == 0:
+                f.write(_HEADER.pack(self.generation))
+            f.truncate(_HEADER.size + rows * KEY_BYTES)
+
+    def _map(self, rows):
+        self._matrix = (
+            np.memmap(self.matrix_path(), dtype=np.float32, mode="r", shape=(rows, self.dimension))
+            if rows else np.empty((0, self.dimension), dtype=np.float32)
+        )
+
+    def __len__(self):
+        return len(self._rows)
+
+    def lookup(self, texts):
+        """
+        Return (rows, missing): the row of every text, -1 for a miss, and the positions of the misses.
+        """
+        with self._lock:
+            rows = np.fromiter((self._rows.get(text_key(text), -1) for text in texts), dtype=np.int64, count=len(texts))
+        return rows, np.flatnonzero(rows < 0)
+
+    def vectors(self, rows):
+        """
+        The vectors of rows. Consecutive rows come back as a zero-copy view of the memory map,
+        any other rows (gaps, reordering) are copied into a new array.
+        """
+        matrix = self._matrix
+        if len(rows) and rows[0] >= 0 and np.array_equal(rows, np.arange(rows[0], rows[0] + len(rows))):
+            return matrix[rows[0]:rows[0] + len(rows)]
+        return matrix[rows]
+
+    def get(self, text):
+        """
+        The vector of a text as a view of the memory map, or None on a miss.
+        """
+        row = self._rows.get(text_key(text))
+        return None if row is None else self._matrix[row]
+
+    def append(self, texts, vectors):
+        """
+        Store the vectors of texts that are not cached yet and return the row of every text.
+        """
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        if vectors.shape != (len(texts), self.dimension):
+            raise ValueError(f"Expected {len(texts)} vectors of dimension {self.dimension}, got {vectors.shape}")
+        with self._lock:
+            new_keys, new_rows, rows = [], [], []
+            for i, text in enumerate(texts):
+                key = text_key(text)
+                if key not in self._rows:
+                    self._rows[key] = len(self._rows)
+                    new_keys.append(key)
+                    new_rows.append(i)
+                rows.append(self._rows[key])
+            if new_rows:
+                ## Vectors first, so a key never points past the end of the matrix
+                with open(self.matrix_path(), "ab") as f:
+                    f.write(vectors[new_rows].tobytes())
+                with open(self.keys_path, "ab") as f:
+                    f.write(b"".join(new_keys))
+                self._map(len(self._rows))
+        return np.asarray(rows, dtype=np.int64)
+
+    def compact(self, keep_texts):
+        """
+        Drop the rows of every text not in keep_texts and return how many were dropped.
+        """
+        keep = {text_key(text) for text in keep_texts}
+        with self._lock:
+            kept = sorted((row, key) for key, row in self._rows.items() if key in keep)
+            dropped = len(self._rows) - len(kept)
+            if not dropped:
+                return 0
+            generation = self.generation + 1
+            with open(self.matrix_path(generation), "wb") as f:
+                for start in range(0, len(kept), 4096):
+                    f.write(self._matrix[[row for row, _ in kept[start:start + 4096]]].tobytes())
+            temporary_path = f"{self.keys_path}.tmp"
+            with open(temporary_path, "wb") as f:
+                f.write(_HEADER.pack(generation))
+                f.write(b"".join(key for _, key in kept))
+            old_matrix_path = self.matrix_path()
+            os.replace(temporary_path, self.keys_path)
+            self.generation = generation
+            self._rows = {key: row for row, (_, key) in enumerate(kept)}
+            self._map(len(kept))
+            if os.path.exists(old_matrix_path):
+                os.remove(old_matrix_path)
+        return dropped
+
+
+class CachedEmbedder:
+    """
+    Wraps an embedder with embed(texts) -> float32 matrix, embedding only the texts not in the store.
+    """
+
+    def __init__(self, embedder, store):
+        if store.dimension != embedder.dimension:
+            raise ValueError(f"Store of dimension {store.dimension} does not fit embedder of {embedder.dimension}")
+        self.embedder = embedder
+        self.store = store
+        self.model_id = embedder.model_id
+        self.dimension = embedder.dimension
+        self.hits = 0
+        self.misses = 0
+
+    def embed(self, texts):
+        rows, missing = self.store.lookup(texts)
+        if len(missing):
+            ## A text that repeats within the batch is embedded once
+            missing_texts = list(dict.fromkeys(texts[i] for i in missing))
+            stored = self.store.append(missing_texts, self.embedder.embed(missing_texts))
+            row_of = dict(zip(missing_texts, stored))
+            rows[missing] = [row_of[texts[i]] for i in missing]
+        self.hits += len(texts) - len(missing)
+        self.misses += len(missing)
+        return self.store.vectors(rows)
+
+    def stats(self):
+        return dict(hits=self.hits, misses=self.misses, rows=len(self.store))
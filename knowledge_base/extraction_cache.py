@@ -0,0 +1,123 @@
+"""
+On-disk cache of extracted PDF text.
+
+An entry holds the pages of one document as gzip compressed JSON lines, keyed
+by the SHA-256 of the file content and the extractor version. A renamed or
+copied file is still a hit, and a pypdf upgrade invalidates everything.
+Entries are written while the pages stream through, to a temporary file that
+only replaces the entry once the document is complete.
+
+The cache is bounded by size: after each write the least recently used entries
+are deleted until it fits into max_bytes. A hit refreshes the entry's mtime,
+which is what "recently used" is measured by.
+"""
+import gzip
+import hashlib
+import json
+import os
+import threading
+
+from bulk_upload import file_sha256
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".extraction-cache")
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+ENTRY_SUFFIX = ".jsonl.gz"
+
+
+class ExtractionCache:
+
+    def __init__(self, directory=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES, extractor_version=None):
+        if extractor_version is None:
+            from pdf_extraction import EXTRACTOR_VERSION as extractor_version
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.extractor_version = extractor_version
+        self._version_tag = hashlib.sha256(extractor_version.encode()).hexdigest()[:12]
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def entry_path(self, sha256):
+        return os.path.join(self.directory, f"{sha256}.{self._version_tag}{ENTRY_SUFFIX}")
+
+    def get(self, sha256):
+        """
+        Return a generator over the cached pages, or None on a miss.
+        """
+        path = self.entry_path(sha256)
+        try:
+            ## Opened right away, so a concurrent eviction cannot pull the file from under the reader
+            f = gzip.open(path, "rt", encoding="utf-8")
+        except FileNotFoundError:
+            return None
+        os.utime(path)
+        return self._read(f)
+
+    @staticmethod
+    def _read(f):
+        with f:
+            for line in f:
+                yield json.loads(line)
+
+    def pages(self, path, extract, sha256=None):
+        """
+        Pages of the PDF at path from the cache, or from extract(path) while filling the cache.
+        Returns (pages, hit).
+        """
+        sha256 = sha256 or file_sha256(path)
+        pages = self.get(sha256)
+        if pages is not None:
+            return pages, True
+        return self.store(sha256, extract(path)), False
+
+    def store(self, sha256, pages):
+        """
+        Pass the pages through and cache them once all of them went by. A document that
+        raises or is not consumed to the end is not cached.
+        """
+        path = self.entry_path(sha256)
+        temporary_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        complete = False
+        try:
+            with gzip.open(temporary_path, "wt", encoding="utf-8") as f:
+                for page in pages:
+                    f.write(json.dumps(page, separators=(",", ":")) + "\n")
+                    yield page
+            complete = True
+        finally:
+            if complete:
+                os.replace(temporary_path, path)
+                self.evict()
+            elif os.path.exists(temporary_path):
+                os.remove(temporary_path)
+
+    def entries(self):
+        """
+        Cache entries as (mtime, size, path), least recently used first.
+        """
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(ENTRY_SUFFIX):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        return sorted(entries)
+
+    def size(self):
+        return sum(size for _, size, _ in self.entries())
+
+    def evict(self):
+        with self._lock:
+            entries = self.entries()
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in entries:
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
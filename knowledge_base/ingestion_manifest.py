@@ -0,0 +1,111 @@
+"""
+Change detection for knowledge base ingestion.
+
+After every completed ingestion job the bucket snapshot the job saw (key ->
+ETag and size) is stored per knowledge base and data source. Before the next
+job the bucket is listed again and diffed against that snapshot:
+
+- no delta: the ingestion job is skipped, no embedding spend and no waiting
+- otherwise the added, modified and deleted documents are reported first
+
+The snapshot only moves forward when a job completes, so several upload
+rounds in a row are all picked up by the next ingestion.
+"""
+import json
+import os
+import threading
+
+DEFAULT_MANIFEST_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".ingestion-manifest.json")
+
+
+def snapshot_bucket(s3_client, bucket_name, prefixes=None):
+    """
+    List the objects a data source ingests and return {key: {"etag", "size"}}.
+    """
+    snapshot = {}
+    paginator = s3_client.get_paginator("list_objects_v2")
+    for prefix in prefixes or [""]:
+        for page in paginator.paginate(Bucket=bucket_name, Prefix=prefix):
+            for obj in page.get("Contents", []):
+                if obj["Key"].endswith("/"):
+                    continue
+                snapshot[obj["Key"]] = dict(etag=obj["ETag"].strip('"'), size=obj["Size"])
+    return snapshot
+
+
+class ChangeSet:
+
+    def __init__(self, added=(), modified=(), deleted=()):
+        self.added = sorted(added)
+        self.modified = sorted(modified)
+        self.deleted = sorted(deleted)
+
+    @property
+    def has_changes(self):
+        return bool(self.added or self.modified or self.deleted)
+
+    def summary(self):
+        return dict(added=len(self.added), modified=len(self.modified), deleted=len(self.deleted))
+
+    def __repr__(self):
+        return f"ChangeSet(added={self.added}, modified={self.modified}, deleted={self.deleted})"
+
+
+def diff_snapshots(previous, current):
+    added = current.keys() - previous.keys()
+    deleted = previous.keys() - current.keys()
+    modified = [key for key in current.keys() & previous.keys() if current[key] != previous[key]]
+    return ChangeSet(added, modified, deleted)
+
+
+class IngestionManifest:
+    """
+    JSON file holding the last ingested bucket snapshot per "kb_id/data_source_id".
+    Saves go through a temporary file and os.replace, so a crash never leaves a
+    half written manifest behind.
+    """
+
+    def __init__(self, path=DEFAULT_MANIFEST_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self.data_sources = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                self.data_sources = json.load(f)
+
+    @staticmethod
+    def _key(kb_id, data_source_id):
+        return f"{kb_id}/{data_source_id}"
+
+    def get(self, kb_id, data_source_id):
+        return self.data_sources.get(self._key(kb_id, data_source_id), {}).get("objects", {})
+
+    def changes(self, kb_id, data_source_id, snapshot):
+        return diff_snapshots(self.get(kb_id, data_source_id), snapshot)
+
+    def commit(self, kb_id, data_source_id, snapshot, ingestion_job_id=None):
+        """
+        Record the snapshot an ingestion job has completed on.
+        """
+        with self._lock:
+            self.data_sources[self._key(kb_id, data_source_id)] = dict(
+                ingestionJobId=ingestion_job_id, objects=snapshot
+            )
+            temporary_path = f"{self.path}.tmp"
+            with open(temporary_path, "w") as f:
+                json.dump(self.data_sources, f, indent=1, sort_keys=True)
+            os.replace(temporary_path, self.path)
+
+    def forget(self, kb_id, data_source_id):
+        with self._lock:
+            self.data_sources.pop(self._key(kb_id, data_source_id), None)
+
+
+def data_source_location(bedrock_agent_client, kb_id, data_source_id):
+    """
+    Return (bucket_name, inclusion_prefixes) of an S3 data source.
+    """
+    data_source = bedrock_agent_client.get_data_source(knowledgeBaseId=kb_id, dataSourceId=data_source_id)
+    s3_configuration = data_source["dataSource"]["dataSourceConfiguration"]["s3Configuration"]
+    bucket_name = s3_configuration["bucketArn"].split(":::", 1)[1]
+    return bucket_name, s3_configuration.get("inclusionPrefixes")
@@ -0,0 +1,125 @@
+"""
+Watch Bedrock knowledge base ingestion jobs until they finish.
+
+The poll interval starts short, so small jobs are noticed within seconds, and
+grows geometrically up to max_interval for long ones. COMPLETE, FAILED and
+STOPPED end the watch; a job still running after the timeout raises
+IngestionTimeoutError. get_ingestion_job calls go through call_with_retry, so
+a throttled poll is retried instead of ending the watch.
+"""
+import logging
+import time
+
+from resilience import call_with_retry
+
+logger = logging.getLogger(__name__)
+
+TERMINAL_STATUSES = {"COMPLETE", "FAILED", "STOPPED"}
+
+STATISTICS_FIELDS = (
+    "numberOfDocumentsScanned",
+    "numberOfMetadataDocumentsScanned",
+    "numberOfNewDocumentsIndexed",
+    "numberOfModifiedDocumentsIndexed",
+    "numberOfMetadataDocumentsModified",
+    "numberOfDocumentsDeleted",
+    "numberOfDocumentsFailed",
+)
+
+
+class IngestionTimeoutError(TimeoutError):
+    """
+    Raised when an ingestion job is still running after the watcher's timeout.
+    """
+
+    def __init__(self, job):
+        super().__init__(f"Ingestion job {job['ingestionJobId']} is still {job['status']}")
+        self.job = job
+
+
+def poll_intervals(initial=2.0, maximum=30.0, multiplier=1.5):
+    """
+    Endless poll intervals: initial, initial * multiplier, ... capped at maximum.
+    """
+    interval = initial
+    while True:
+        yield interval
+        interval = min(maximum, interval * multiplier)
+
+
+def summarize(job):
+    """
+    Flatten the job status, statistics and failure reasons into one dict for reporting.
+    """
+    statistics = job.get("statistics", {})
+    summary = dict(
+        ingestionJobId=job["ingestionJobId"],
+        knowledgeBaseId=job.get("knowledgeBaseId"),
+        dataSourceId=job.get("dataSourceId"),
+        status=job["status"],
+    )
+    summary.update({field: statistics.get(field, 0) for field in STATISTICS_FIELDS})
+    if job.get("failureReasons"):
+        summary["failureReasons"] = job["failureReasons"]
+    if job.get("startedAt") and job.get("updatedAt"):
+        summary["durationSeconds"] = round((job["updatedAt"] - job["startedAt"]).total_seconds(), 1)
+    return summary
+
+
+class IngestionJobWatcher:
+
+    def __init__(
+        self,
+        bedrock_agent_client,
+        initial_interval=2.0,
+        max_interval=30.0,
+        multiplier=1.5,
+        timeout=3600,
+        clock=time.monotonic,
+        sleep=time.sleep,
+    ):
+        self.bedrock_agent_client = bedrock_agent_client
+        self.initial_interval = initial_interval
+        self.max_interval = max_interval
+        self.multiplier = multiplier
+        self.timeout = timeout
+        self._clock = clock
+        self._sleep = sleep
+
+    def watch(self, job):
+        """
+        Poll the job until it reaches a terminal status and return its last description.
+        """
+        deadline = self._clock() + self.timeout
+        intervals = poll_intervals(self.initial_interval, self.max_interval, self.multiplier)
+        last_status = None
+        while job["status"] not in TERMINAL_STATUSES:
+            if job["status"] != last_status:
+                logger.info(f"Ingestion job {job['ingestionJobId']}: {job['status']}")
+                last_status = job["status"]
+            remaining = deadline - self._clock()
+            if remaining <= 0:
+                raise IngestionTimeoutError(job)
+            self._sleep(min(next(intervals), remaining))
+            job = call_with_retry(
+                self.bedrock_agent_client.get_ingestion_job,
+                knowledgeBaseId=job["knowledgeBaseId"],
+                dataSourceId=job["dataSourceId"],
+                ingestionJobId=job["ingestionJobId"],
+            )["ingestionJob"]
+
+        log = logger.info if job["status"] == "COMPLETE" else logger.error
+        log(f"Ingestion job {job['ingestionJobId']} finished: {summarize(job)}")
+        return job
+
+    def start_and_watch(self, kb_id, data_source_id):
+        """
+        Start an ingestion job for the data source and watch it to the end.
+        """
+        response = call_with_retry(
+            self.bedrock_agent_client.start_ingestion_job,
+            knowledgeBaseId=kb_id,
+            dataSourceId=data_source_id,
+        )
+        logger.info(f"Job Invocation Response: {response}")
+        return self.watch(response["ingestionJob"])
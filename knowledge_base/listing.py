@@ -0,0 +1,125 @@
+"""
+Paginated, cached listing of knowledge bases and their data sources.
+
+The iter_* generators walk every page of the list APIs, so accounts with more
+knowledge bases than one page holds are no longer cut off. describe() expands
+each knowledge base with its data sources and the status of their latest
+ingestion job, fetching the knowledge bases concurrently. Results are kept for
+a few seconds in a TTLCache so repeated menu actions do not query again.
+"""
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_CACHE_TTL_SECONDS = 30
+
+
+class TTLCache:
+
+    def __init__(self, ttl_seconds=DEFAULT_CACHE_TTL_SECONDS, clock=time.monotonic):
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries = {}
+
+    def get_or_load(self, key, loader):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > self._clock():
+                return entry[1]
+        value = loader()
+        with self._lock:
+            self._entries[key] = (self._clock() + self.ttl_seconds, value)
+        return value
+
+    def invalidate(self):
+        with self._lock:
+            self._entries.clear()
+
+
+def iter_knowledge_bases(bedrock_agent_client):
+    paginator = bedrock_agent_client.get_paginator("list_knowledge_bases")
+    for page in paginator.paginate():
+        yield from page["knowledgeBaseSummaries"]
+
+
+def iter_data_sources(bedrock_agent_client, kb_id):
+    paginator = bedrock_agent_client.get_paginator("list_data_sources")
+    for page in paginator.paginate(knowledgeBaseId=kb_id):
+        yield from page["dataSourceSummaries"]
+
+
+def latest_ingestion_job(bedrock_agent_client, kb_id, data_source_id):
+    response = bedrock_agent_client.list_ingestion_jobs(
+        knowledgeBaseId=kb_id,
+        dataSourceId=data_source_id,
+        sortBy=dict(attribute="STARTED_AT", order="DESCENDING"),
+        maxResults=1,
+    )
+    jobs = response["ingestionJobSummaries"]
+    return jobs[0] if jobs else None
+
+
+def expand_knowledge_base(bedrock_agent_client, kb):
+    """
+    Return the knowledge base summary with its data sources and their latest ingestion job.
+    """
+    data_sources = []
+    for data_source in iter_data_sources(bedrock_agent_client, kb["knowledgeBaseId"]):
+        job = latest_ingestion_job(bedrock_agent_client, kb["knowledgeBaseId"], data_source["dataSourceId"])
+        data_sources.append(dict(
+            data_source,
+            latestIngestionJob=dict(
+                ingestionJobId=job["ingestionJobId"], status=job["status"], startedAt=job.get("startedAt"),
+            ) if job else None,
+        ))
+    return dict(kb, dataSources=data_sources)
+
+
+def describe(bedrock_agent_client, max_workers=8):
+    """
+    All knowledge bases, each expanded concurrently with its data sources and ingestion status.
+    """
+    knowledge_bases = list(iter_knowledge_bases(bedrock_agent_client))
+    if not knowledge_bases:
+        return []
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(knowledge_bases))) as executor:
+        return list(executor.map(lambda kb: expand_knowledge_base(bedrock_agent_client, kb), knowledge_bases))
+
+
+def _format_time(value):
+    return value.strftime("%Y-%m-%d %H:%M") if hasattr(value, "strftime") else str(value or "-")
+
+
+def to_json(rows):
+    return json.dumps(rows, indent=2, default=str)
+
+
+def format_table(knowledge_bases):
+    """
+    One line per knowledge base, followed by an indented line per data source when expanded.
+    """
+    lines = [f"{'ID':<12} {'NAME':<32} {'STATUS':<10} UPDATED"]
+    for kb in knowledge_bases:
+        lines.append(
+            f"{kb['knowledgeBaseId']:<12} {kb['name'][:32]:<32} {kb['status']:<10} {_format_time(kb.get('updatedAt'))}"
+        )
+        for data_source in kb.get("dataSources", []):
+            job = data_source.get("latestIngestionJob")
+            ingestion = f"last ingestion {job['status']} {_format_time(job['startedAt'])}" if job else "never ingested"
+            lines.append(
+                f"  {data_source['dataSourceId']:<10} {data_source['name'][:32]:<32} "
+                f"{data_source['status']:<10} {ingestion}"
+            )
+    return "\n".join(lines)
+
+
+def format_data_sources(data_sources):
+    lines = [f"{'ID':<12} {'NAME':<32} {'STATUS':<10} UPDATED"]
+    for data_source in data_sources:
+        lines.append(
+            f"{data_source['dataSourceId']:<12} {data_source['name'][:32]:<32} {data_source['status']:<10} "
+            f"{_format_time(data_source.get('updatedAt'))}"
+        )
+    return "\n".join(lines)
@@ -1,6 +1,7 @@
 import logging
+import os
 
-from operations import KnowledgeBaseOperations
+from operations import DEFAULT_PROFILE_NAME, KnowledgeBaseOperations
 
 BUCKET_NAME = "arjstack-kb-data-source"
 
@@ -16,7 +17,41 @@ MODEL_ID = "anthropic.claude-instant-v1"
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO, format="%(message)s")
 
-operation = KnowledgeBaseOperations()
+## RETRIEVAL_BACKEND=faiss answers Retrieve from the offline index built with option 15
+operation = KnowledgeBaseOperations(
+    profile_name=os.environ.get("AWS_PROFILE", DEFAULT_PROFILE_NAME),
+    retrieval_backend=os.environ.get("RETRIEVAL_BACKEND", "bedrock"),
+)
+
+
+def extract_documents():
+    data_dir = input("Please input data folder [../data]:").strip() or "../data"
+    operation.extract_documents(data_dir)
+
+
+def chunk_documents():
+    data_dir = input("Please input data folder [../data]:").strip() or "../data"
+    max_tokens = int(input("Please enter max tokens per chunk [512]: ").strip() or 512)
+    overlap_percentage = int(input("Please enter overlap percentage [20]: ").strip() or 20)
+    operation.chunk_documents(data_dir, max_tokens=max_tokens, overlap_percentage=overlap_percentage)
+
+
+def build_local_index():
+    bucket_name = (
+        input(f"Please input S3 Bucket Name the data is uploaded to [{BUCKET_NAME}]:").strip() or BUCKET_NAME
+    )
+    data_dir = input("Please input data folder [../data]:").strip() or "../data"
+    embedding_model_name = (
+        input(f"Please enter Embedding Model Name, or local-hashing offline [{EMBEDDING_MODEL_NAME}]:").strip()
+        or EMBEDDING_MODEL_NAME
+    )
+    compact_embedding_cache = input(
+        "Drop cached embeddings of chunks that are not in this build (other folders and chunk sizes too)? [y/N]: "
+    ).strip().lower() == "y"
+    operation.build_local_index(
+        bucket_name, data_dir, embedding_model_name=embedding_model_name,
+        compact_embedding_cache=compact_embedding_cache,
+    )
 
 
 def create_vector_index():
@@ -32,7 +67,8 @@ def upload_data():
     bucket_name = (
         input(f"Please input S3 Bucket Name [{BUCKET_NAME}]:").strip() or BUCKET_NAME
     )
-    operation.upload_document(bucket_name)
+    validate = input("Extract and validate PDFs before uploading? [y/N]: ").strip().lower() == "y"
+    operation.upload_document(bucket_name, validate=validate)
 
 
 def create_knowledge_base():
@@ -70,9 +106,12 @@ def create_kb_datasource():
 
 def execute_ingestion_job():
     kb_id = input("Please enter Knowlegde Base Id: ").strip()
-    kb_ds_id = input("Please enter KB Datasource Id: ").strip()
+    kb_ds_ids = input("Please enter KB Datasource Id(s), comma separated: ").strip()
     
-    operation.execute_ingestion_job(kb_id, kb_ds_id)
+    force = input("Ingest even if nothing changed since the last ingestion? [y/N]: ").strip().lower() == "y"
+
+    targets = [(kb_id, kb_ds_id.strip()) for kb_ds_id in kb_ds_ids.split(",") if kb_ds_id.strip()]
+    operation.execute_ingestion_jobs(targets, force=force)
 
 def test_kb_with_retrieve_and_generate():
     model_id = (
@@ -84,16 +123,47 @@ def test_kb_with_retrieve_and_generate():
     operation.search_using_kb_with_retrieve_and_generate(model_id, kb_id, search_text)
 
 
+def test_kb_with_two_stage():
+    model_id = (
+        input(f"Please input Model ID [{MODEL_ID}]:").strip()
+        or MODEL_ID
+    )
+    kb_id = input("Please enter Knowlegde Base Id: ").strip()
+    search_text = input(f"Please enter search text [{SERACH_TEXT}]: ").strip() or SERACH_TEXT
+    operation.search_using_kb_with_two_stage(model_id, kb_id, search_text)
+
+
 def test_kb_with_retrieve():
     kb_id = input("Please enter Knowlegde Base Id: ").strip() 
     search_text = input(f"Please enter search text [{SERACH_TEXT}]: ").strip() or SERACH_TEXT
     operation.search_using_kb_with_retrieve(kb_id, search_text)
 
 
+def batch_retrieve():
+    kb_id = input("Please enter Knowlegde Base Id: ").strip()
+    queries_path = input("Please enter queries file (one query per line or JSON lines): ").strip()
+    output_path = input("Please enter output file [retrieve-results.jsonl]: ").strip() or "retrieve-results.jsonl"
+    number_of_results = int(input("Please enter number of results [5]: ").strip() or 5)
+    search_type = input("Please enter search type, SEMANTIC or HYBRID [KB default]: ").strip().upper() or None
+    rate = float(input("Please enter max queries per second [10]: ").strip() or 10)
+    operation.batch_retrieve(
+        kb_id, queries_path, output_path, number_of_results=number_of_results, search_type=search_type, rate=rate
+    )
+
+
+def list_output_format():
+    return input("Please enter output format, table or json [table]: ").strip().lower() or "table"
+
+
+def list_knowledge_bases():
+    expand = input("Include datasources and latest ingestion status? [y/N]: ").strip().lower() == "y"
+    operation.list_knowledge_bases(expand=expand, output=list_output_format())
+
+
 def list_kb_datasources():
     kb_id = input("Please enter Knowlegde Base Id: ").strip()
     
-    operation.list_kb_datasources(kb_id)
+    operation.list_kb_datasources(kb_id, output=list_output_format())
     
 def cleanup():
     collection_name = input(f"Please enter OSS Collection Name:").strip()
@@ -122,6 +192,11 @@ def menu():
     print("8. Test Knowledge Base (With RetrieveAndGenerate API)")
     print("9. Test Knowledge Base (With Retrieve API)")
     print("10. Cleanup Resources")
+    print("11. Test Knowledge Base (Retrieve, local rerank, then generate)")
+    print("12. Batch Retrieve queries from a file (JSONL results)")
+    print("13. Extract and validate PDF text locally")
+    print("14. Chunk PDFs locally (FIXED_SIZE preview)")
+    print("15. Build offline FAISS index (RETRIEVAL_BACKEND=faiss)")
 
     print("99. Exit")
     valid = False
@@ -152,7 +227,7 @@ def main():
         elif choice == 5:
             execute_ingestion_job()
         elif choice == 6:
-            operation.list_knowledge_bases()
+            list_knowledge_bases()
         elif choice == 7:
             list_kb_datasources()
         elif choice == 8:
@@ -161,6 +236,16 @@ def main():
             test_kb_with_retrieve()
         elif choice == 10:
             cleanup()
+        elif choice == 11:
+            test_kb_with_two_stage()
+        elif choice == 12:
+            batch_retrieve()
+        elif choice == 13:
+            extract_documents()
+        elif choice == 14:
+            chunk_documents()
+        elif choice == 15:
+            build_local_index()
         else:
             print(
                 "Looks like you have not choosen available options. Please try again."
@@ -1,48 +1,141 @@
-import boto3
 import json
 import logging
 import os
+import sys
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 
-from opensearchpy import OpenSearch, AWSV4SignerAuth, RequestsHttpConnection
+from botocore.config import Config
+
+from bulk_upload import BulkUploader, pool_connections
+from ingestion_manifest import IngestionManifest, DEFAULT_MANIFEST_PATH, data_source_location, snapshot_bucket
+
+## Modules shared with the Lambdas live in the common layer
+sys.path.append(
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "assets", "lambda-common", "python")
+)
+import corpus_generation
+import rag_pipeline
+from emf_metrics import MetricsLogger
+from resilience import WRAPPED_CLIENT_MAX_ATTEMPTS, call_with_retry, retry_config
+
+import batch_retrieve
+import listing
+from ingestion_watcher import IngestionJobWatcher, poll_intervals, summarize
 
 ## Instantiate Logger
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO, format="%(message)s")
 
-## Creating session with AWS profile
-session = boto3.Session(profile_name="bedrock-profile")
-credentials = session.get_credentials()
-
-## Bedrock Agent Client
-bedrock_agent_client = session.client("bedrock-agent")
-## Bedrock Agent Runtime Client
-bedrock_agent_runtime_client = session.client("bedrock-agent-runtime")
+## AWS profile the CLI uses unless another session or profile is given
+DEFAULT_PROFILE_NAME = "bedrock-profile"
 
 SERVICE_NAME = "aoss"
 DATA_DIR = "../data"
-bucket_name = 'test'
+
+## Retrieval runs against the knowledge base, or against the offline FAISS index in local_index_dir
+BEDROCK_BACKEND = "bedrock"
+FAISS_BACKEND = "faiss"
+DEFAULT_LOCAL_INDEX_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".faiss-index")
 
 
 class KnowledgeBaseOperations:
+
+    def __init__(self, session=None, profile_name=DEFAULT_PROFILE_NAME, region_name=None, client_config=None,
+                 retrieval_backend=BEDROCK_BACKEND, local_index_dir=DEFAULT_LOCAL_INDEX_DIR):
+        """
+        Method to configure the operations. No session or client is created here: they are built
+        on first use from the given boto3 session, or else from profile_name and region_name.
+        With the "faiss" retrieval backend, Retrieve calls are answered from the index in local_index_dir.
+        """
+        if retrieval_backend not in (BEDROCK_BACKEND, FAISS_BACKEND):
+            raise ValueError(f"Unknown retrieval backend '{retrieval_backend}'")
+        self._session = session
+        self.profile_name = profile_name
+        self.region_name = region_name
+        self.client_config = client_config
+        self.retrieval_backend = retrieval_backend
+        self.local_index_dir = local_index_dir
+        self._clients = {}
+        self._lock = threading.RLock()
+        self._listing_cache = listing.TTLCache()
+
+    @property
+    def session(self):
+        with self._lock:
+            if self._session is None:
+                ## boto3 is only imported once AWS is actually needed
+                import boto3
+
+                self._session = boto3.Session(profile_name=self.profile_name, region_name=self.region_name)
+            return self._session
+
+    def client(self, service_name):
+        """
+        Method to get the client of a service, created once on first use.
+        """
+        with self._lock:
+            if service_name not in self._clients:
+                ## Every call of the runtime clients goes through call_with_retry, which does the retrying
+                if service_name in ("bedrock-agent-runtime", "bedrock-runtime"):
+                    default_config = retry_config(max_attempts=WRAPPED_CLIENT_MAX_ATTEMPTS)
+                else:
+                    default_config = retry_config()
+                self._clients[service_name] = self.session.client(
+                    service_name, config=self.client_config or default_config
+                )
+            return self._clients[service_name]
+
+    @property
+    def bedrock_agent_client(self):
+        return self.client("bedrock-agent")
+
+    @property
+    def bedrock_agent_runtime_client(self):
+        if self.retrieval_backend == FAISS_BACKEND:
+            return self.local_retrieve_client()
+        return self.client("bedrock-agent-runtime")
+
+    def local_retrieve_client(self):
+        """
+        Method to get the client that serves Retrieve from the offline FAISS index, loaded once on first use.
+        """
+        with self._lock:
+            if FAISS_BACKEND not in self._clients:
+                ## faiss is only imported when the local backend is used
+                import faiss_index
+
+                self._clients[FAISS_BACKEND] = faiss_index.FaissRetrieveClient.load(
+                    self.local_index_dir, get_runtime_client=lambda: self.bedrock_runtime_client, invoke=call_with_retry
+                )
+            return self._clients[FAISS_BACKEND]
+
+    @property
+    def bedrock_runtime_client(self):
+        return self.client("bedrock-runtime")
+
+    def get_oss_client(self, collection_name):
+        """
+        Method to get the pooled OpenSearch client of a collection, shared by all operations.
+        """
+        import opensearch_clients
+
+        return opensearch_clients.get_client(
+            opensearch_clients.collection_host(collection_name, self.session.region_name),
+            session=self.session,
+            service=SERVICE_NAME,
+        )
     
     def create_vector_index(self, collection_name, vector_index_name):
-        auth = AWSV4SignerAuth(credentials, session.region_name, SERVICE_NAME)
-        ## Creating OpenSearch Client
-        oss_client = OpenSearch(
-            hosts=[
-                {
-                    "host": f"{collection_name}.{session.region_name}.aoss.amazonaws.com",
-                    "port": 443,
-                }
-            ],
-            http_auth=auth,
-            use_ssl=True,
-            verify_certs=True,
-            connection_class=RequestsHttpConnection,
-            timeout=300,
-            pool_maxsize=20,
-        )
+        """
+        Method to create the vector index in the OSS collection, unless it already exists.
+        """
+        ## Shared OpenSearch Client of the collection
+        oss_client = self.get_oss_client(collection_name)
+        if oss_client.indices.exists(index=vector_index_name):
+            logger.info(f"Vector Index {vector_index_name} already exists.")
+            return None
           ## Prepare Index Body
         index_body = dict(
             settings=dict(index=dict(knn=True)),
@@ -60,9 +153,18 @@ class KnowledgeBaseOperations:
         )
 
         logger.info(f"Index Creation Response: {response}")
+        return response
 
-
-
+    def delete_vector_index(self, collection_name, vector_index_name):
+        """
+        Method to delete the vector index, if it exists.
+        """
+        oss_client = self.get_oss_client(collection_name)
+        if not oss_client.indices.exists(index=vector_index_name):
+            logger.info(f"Vector Index {vector_index_name} does not exist.")
+            return
+        oss_client.indices.delete(index=vector_index_name)
+        logger.info(f"Vector Index {vector_index_name} is deleted.")
 
     def create_knowledge_base(
         self,
@@ -77,23 +179,23 @@ class KnowledgeBaseOperations:
         """
         ## Create Bedrock Agent Client
 
-        sts_client = session.client("sts")
+        sts_client = self.client("sts")
         aws_account = sts_client.get_caller_identity().get("Account")
 
-        kb = bedrock_agent_client.create_knowledge_base(
+        kb = self.bedrock_agent_client.create_knowledge_base(
             name=name,
             description=f"Knowledge Base: {name}",
             roleArn=f"arn:aws:iam::{aws_account}:role/{bedrock_execution_role}",
             knowledgeBaseConfiguration=dict(
                 type="VECTOR",
                 vectorKnowledgeBaseConfiguration=dict(
-                    embeddingModelArn=f"arn:aws:bedrock:{session.region_name}::foundation-model/{embedding_model_name}"
+                    embeddingModelArn=f"arn:aws:bedrock:{self.session.region_name}::foundation-model/{embedding_model_name}"
                 ),
             ),
             storageConfiguration=dict(
                 type="OPENSEARCH_SERVERLESS",
                 opensearchServerlessConfiguration=dict(
-                    collectionArn=f"arn:aws:aoss:{session.region_name}:{aws_account}:collection/{oss_collection_name}",
+                    collectionArn=f"arn:aws:aoss:{self.session.region_name}:{aws_account}:collection/{oss_collection_name}",
                     vectorIndexName=vector_index_name,
                     fieldMapping=dict(
                         vectorField="vector",
@@ -104,13 +206,45 @@ class KnowledgeBaseOperations:
             ),
         )
         logger.info(f"Knowledge Base Creation Response: {kb}")
+        self._listing_cache.invalidate()
+        return kb["knowledgeBase"]["knowledgeBaseId"]
+
+    def find_knowledge_base(self, name):
+        """
+        Method to look up the id of the Knowledge Base with the given name, None if there is none.
+        """
+        for kb in listing.iter_knowledge_bases(self.bedrock_agent_client):
+            if kb["name"] == name:
+                return kb["knowledgeBaseId"]
+        return None
+
+    def wait_for_knowledge_base(self, kb_id, timeout=300):
+        """
+        Method to wait until a new Knowledge Base is ACTIVE, so data sources can be added.
+        """
+        deadline = time.monotonic() + timeout
+        for interval in poll_intervals(initial=1.0, maximum=10.0):
+            status = self.bedrock_agent_client.get_knowledge_base(knowledgeBaseId=kb_id)["knowledgeBase"]["status"]
+            if status == "ACTIVE":
+                return
+            if status == "FAILED" or time.monotonic() + interval > deadline:
+                raise RuntimeError(f"Knowledge Base {kb_id} is {status}")
+            time.sleep(interval)
+
+    def delete_knowledge_base(self, kb_id):
+        """
+        Method to delete a Knowledge Base
+        """
+        self.bedrock_agent_client.delete_knowledge_base(knowledgeBaseId=kb_id)
+        self._listing_cache.invalidate()
+        logger.info(f"Knowledge base {kb_id} is deleted.")
 
     def create_kb_datasource(self, name, kb_Id, bucket_name):
         """
         Method to create Datasource in Knowledge Base
         """
         # Create a DataSource in KnowledgeBase
-        kb_datasource = bedrock_agent_client.create_data_source(
+        kb_datasource = self.bedrock_agent_client.create_data_source(
             name=name,
             description=f"KB Datasource: {name}",
             knowledgeBaseId=kb_Id,
@@ -130,9 +264,42 @@ class KnowledgeBaseOperations:
             ),
         )
         logger.info(f"KB Datasource Creation Response: {kb_datasource}")
+        self._listing_cache.invalidate()
+        return kb_datasource["dataSource"]["dataSourceId"]
 
+    def find_kb_datasource(self, kb_id, name):
+        """
+        Method to look up the id of the KB Datasource with the given name, None if there is none.
+        """
+        for data_source in listing.iter_data_sources(self.bedrock_agent_client, kb_id):
+            if data_source["name"] == name:
+                return data_source["dataSourceId"]
+        return None
 
-    def execute_ingestion_job(self, kb_id, kb_ds_id):
+    def delete_kb_datasource(self, kb_id, kb_ds_id):
+        """
+        Method to delete a KB Datasource
+        """
+        self.bedrock_agent_client.delete_data_source(dataSourceId=kb_ds_id, knowledgeBaseId=kb_id)
+        self._listing_cache.invalidate()
+        logger.info(f"Datasource {kb_ds_id} is deleted.")
+
+
+    def plan_ingestion(self, kb_id, kb_ds_id, manifest):
+        """
+        Method to diff the data source bucket against the snapshot of the last completed ingestion.
+        Returns the change set and the current snapshot.
+        """
+        bucket_name, prefixes = data_source_location(self.bedrock_agent_client, kb_id, kb_ds_id)
+        snapshot = snapshot_bucket(self.client("s3"), bucket_name, prefixes)
+        changes = manifest.changes(kb_id, kb_ds_id, snapshot)
+        logger.info(f"Changes since the last ingestion of s3://{bucket_name}: {changes.summary()}")
+        for label, keys in (("Added", changes.added), ("Modified", changes.modified), ("Deleted", changes.deleted)):
+            for key in keys:
+                logger.info(f"  {label}: {key}")
+        return changes, snapshot
+
+    def execute_ingestion_job(self, kb_id, kb_ds_id, force=False, manifest_path=DEFAULT_MANIFEST_PATH, timeout=3600):
         """
         Method to fetch the documents from S3 and ingest them in data source.
         It does the following during ingestion:
@@ -140,23 +307,97 @@ class KnowledgeBaseOperations:
         2. Chunk the extracted text based on the configured chunking size
         3. Create embeddings of each chunk
         4. Write the embedding vectors to the vector database.
+        The job is skipped when the bucket has not changed since the last completed ingestion,
+        unless force is set. Returns the final ingestion job, or None when it was skipped.
         """
-        response = bedrock_agent_client.start_ingestion_job(
-            knowledgeBaseId=kb_id, dataSourceId=kb_ds_id
-        )
+        outcome = self.execute_ingestion_jobs([(kb_id, kb_ds_id)], force, manifest_path, timeout)[0]
+        if outcome["error"] is not None:
+            raise outcome["error"]
+        return outcome["job"]
 
-        logger.info(f"Job Invocation Response: {response}")
+    def execute_ingestion_jobs(self, targets, force=False, manifest_path=DEFAULT_MANIFEST_PATH, timeout=3600):
+        """
+        Method to start and watch the ingestion of several (kb_id, kb_ds_id) data sources.
+        Bedrock runs one ingestion job per knowledge base at a time, so the data sources of a
+        knowledge base are ingested one after another and different knowledge bases in parallel.
+        Returns one outcome per target, in order: a dict with kb_id, kb_ds_id, the final ingestion
+        job (None for a skipped one) and the error that stopped it (None when it finished).
+        A failing target does not stop the others. Every knowledge base with a completed job gets
+        a new corpus generation, which moves the chat Lambdas' answer caches on to the new corpus.
+        """
+        manifest = IngestionManifest(manifest_path)
+        watcher = IngestionJobWatcher(self.bedrock_agent_client, timeout=timeout)
+
+        def ingest(kb_id, kb_ds_id):
+            changes, snapshot = self.plan_ingestion(kb_id, kb_ds_id, manifest)
+            if not changes.has_changes and not force:
+                logger.info(f"Nothing changed for datasource {kb_ds_id} since the last ingestion, skipping it.")
+                return None
+            job = watcher.start_and_watch(kb_id, kb_ds_id)
+            ## Only a completed job moves the snapshot forward
+            if job["status"] == "COMPLETE":
+                manifest.commit(kb_id, kb_ds_id, snapshot, job["ingestionJobId"])
+            return job
+
+        def ingest_knowledge_base(kb_targets):
+            kb_outcomes = []
+            for kb_id, kb_ds_id in kb_targets:
+                outcome = dict(kb_id=kb_id, kb_ds_id=kb_ds_id, job=None, error=None)
+                try:
+                    outcome["job"] = ingest(kb_id, kb_ds_id)
+                except Exception as ex:
+                    logger.error(f"Ingestion failed for datasource {kb_ds_id}: {ex}")
+                    outcome["error"] = ex
+                kb_outcomes.append(outcome)
+            return kb_outcomes
+
+        by_kb = {}
+        for kb_id, kb_ds_id in targets:
+            by_kb.setdefault(kb_id, []).append((kb_id, kb_ds_id))
+        with ThreadPoolExecutor(max_workers=max(1, len(by_kb))) as executor:
+            outcomes_by_target = {
+                (outcome["kb_id"], outcome["kb_ds_id"]): outcome
+                for kb_outcomes in executor.map(ingest_knowledge_base, by_kb.values())
+                for outcome in kb_outcomes
+            }
+        outcomes = [outcomes_by_target[(kb_id, kb_ds_id)] for kb_id, kb_ds_id in targets]
+        self._listing_cache.invalidate()
+
+        completed = {}
+        for outcome in outcomes:
+            if outcome["job"] is not None:
+                logger.info(f"Ingestion Summary: {summarize(outcome['job'])}")
+                if outcome["job"]["status"] == "COMPLETE":
+                    completed[outcome["kb_id"]] = outcome["job"]["ingestionJobId"]
+        for kb_id, ingestion_job_id in completed.items():
+            self.publish_corpus_generation(kb_id, ingestion_job_id)
+        return outcomes
+
+    def publish_corpus_generation(self, kb_id, generation):
+        """
+        Method to record a new corpus generation of the knowledge base in SSM. The chat Lambdas read it
+        at most CORPUS_GENERATION_TTL_SECONDS later and stop answering from the cached old corpus.
+        A failure is logged only, the ingestion itself has succeeded.
+        """
+        try:
+            corpus_generation.publish(self.client("ssm"), kb_id, generation)
+        except Exception as ex:
+            logger.error(f"Publishing corpus generation {generation} of {kb_id} failed: {ex}")
+            return
+        logger.info(f"Corpus generation of {kb_id} is now {generation}.")
 
-        job = response["ingestionJob"]
-        job_id = job["ingestionJobId"]
-        # Get job
-        while job["status"] != "COMPLETE":
-            job_response = bedrock_agent_client.get_ingestion_job(
-                knowledgeBaseId=kb_id, dataSourceId=kb_ds_id, ingestionJobId=job_id
-            )
-            job = job_response["ingestionJob"]
-            logger.info(job)
-            time.sleep(40)
+    def invalidate_answer_cache(self, function_name):
+        """
+        Method to ask the chat Lambda to drop its cached answers at once. Only the container that
+        serves this call is cleared; after an ingestion every container moves on by itself through
+        the corpus generation.
+        """
+        lambda_client = self.client("lambda")
+        response = lambda_client.invoke(
+            FunctionName=function_name,
+            Payload=json.dumps({"invalidateCache": True}),
+        )
+        logger.info(f"Answer Cache Invalidation Response: {response['StatusCode']}")
 
 
     def search_using_kb_with_retrieve_and_generate(self, model_id, kb_id, search_text):
@@ -165,16 +406,21 @@ class KnowledgeBaseOperations:
         and augments the foundation model prompt with the search results as context information
         and then returns the final FM-generated response.
         """
-        response = bedrock_agent_runtime_client.retrieve_and_generate(
-            input=dict(text=search_text),
-            retrieveAndGenerateConfiguration=dict(
-                type="KNOWLEDGE_BASE",
-                knowledgeBaseConfiguration=dict(
-                    knowledgeBaseId=kb_id,
-                    modelArn=f"arn:aws:bedrock:{session.region_name}::foundation-model/{model_id}",
-                ),
-            ),
+        metrics = MetricsLogger(
+            dimensions=dict(Operation="RetrieveAndGenerate", ModelId=model_id), emit=logger.info
         )
+        with metrics.timer("GenerationLatency"):
+            response = call_with_retry(
+                self.bedrock_agent_runtime_client.retrieve_and_generate,
+                input=dict(text=search_text),
+                retrieveAndGenerateConfiguration=dict(
+                    type="KNOWLEDGE_BASE",
+                    knowledgeBaseConfiguration=dict(
+                        knowledgeBaseId=kb_id,
+                        modelArn=f"arn:aws:bedrock:{self.session.region_name}::foundation-model/{model_id}",
+                    ),
+                ),
+            )
         ## Log Response
         logger.info(f"Complete Response: {response}")
 
@@ -192,19 +438,57 @@ class KnowledgeBaseOperations:
         search_response = response["output"]["text"]
         logger.info(f"Search Text Response: {search_response}")
 
-    def search_using_kb_with_retrieve(self, kb_id, search_text):
+        metrics.put_metric("CitationCount", len(contexts), "Count")
+        metrics.put_metric("ResponseSize", len(search_response.encode("utf-8")), "Bytes")
+        metrics.flush()
+
+    def search_using_kb_with_two_stage(
+        self,
+        model_id,
+        kb_id,
+        search_text,
+        number_of_results=rag_pipeline.DEFAULT_NUMBER_OF_RESULTS,
+        token_budget=rag_pipeline.DEFAULT_CONTEXT_TOKEN_BUDGET,
+    ):
+        """
+        Method to retrieve a larger candidate set with the Retrieve API, dedupe and rerank it locally,
+        pack the best chunks into a token budget and invoke the model directly with that context.
+        """
+        result = rag_pipeline.answer(
+            self.bedrock_agent_runtime_client,
+            self.bedrock_runtime_client,
+            kb_id,
+            model_id,
+            search_text,
+            number_of_results=number_of_results,
+            token_budget=token_budget,
+            invoke=call_with_retry,
+        )
+
+        logger.info(f"Context: {[citation['text'] for citation in result['citations']]}")
+        logger.info(f"Pipeline Stats: {result['stats']}")
+        logger.info(f"Search Text Response: {result['text']}")
+        return result
+
+    def search_using_kb_with_retrieve(self, kb_id, search_text, number_of_results=3, search_type=None):
         """
         Method to use Retrieve API to convert user queries into embeddings, searches the knowledge base,
         and returns the relevant results.
         """
-
-        response = bedrock_agent_runtime_client.retrieve(
-            retrievalQuery=dict(text=search_text),
-            knowledgeBaseId=kb_id,
-            retrievalConfiguration=dict(
-                vectorSearchConfiguration=dict(numberOfResults=3)
-            ),
-        )
+        vector_search_configuration = dict(numberOfResults=number_of_results)
+        if search_type:
+            vector_search_configuration["overrideSearchType"] = search_type
+
+        metrics = MetricsLogger(dimensions=dict(Operation="Retrieve"), emit=logger.info)
+        with metrics.timer("RetrievalLatency"):
+            response = call_with_retry(
+                self.bedrock_agent_runtime_client.retrieve,
+                retrievalQuery=dict(text=search_text),
+                knowledgeBaseId=kb_id,
+                retrievalConfiguration=dict(
+                    vectorSearchConfiguration=vector_search_configuration
+                ),
+            )
 
         ## Log Response
         logger.info(f"Complete Response: {response}")
@@ -213,72 +497,207 @@ class KnowledgeBaseOperations:
         search_response = response["retrievalResults"]
         logger.info(f"Search Text Response: {search_response}")
 
-    def list_knowledge_bases(self):
+        metrics.put_metric("ResultCount", len(search_response), "Count")
+        metrics.flush()
+
+    def batch_retrieve(
+        self,
+        kb_id,
+        queries_path,
+        output_path,
+        number_of_results=batch_retrieve.DEFAULT_NUMBER_OF_RESULTS,
+        search_type=None,
+        max_workers=8,
+        rate=10.0,
+    ):
         """
-        Method to fetch the list of knowledge Base
+        Method to run every query of queries_path against the Retrieve API concurrently under a rate limit
+        and stream one JSON line per query (scores, source URIs, latency) to output_path.
         """
+        with open(output_path, "w") as output:
+            return batch_retrieve.run_batch(
+                self.bedrock_agent_runtime_client,
+                kb_id,
+                batch_retrieve.iter_queries(queries_path),
+                output,
+                max_workers=max_workers,
+                rate=rate,
+                number_of_results=number_of_results,
+                search_type=search_type,
+            )
 
-        get_kb_response = bedrock_agent_client.list_knowledge_bases()
-        print(get_kb_response)
+    def list_knowledge_bases(self, expand=False, output="table"):
+        """
+        Method to fetch the list of knowledge Base, across all pages.
+        With expand, every Knowledge Base comes with its datasources and their latest ingestion job,
+        fetched concurrently. Repeated calls are served from a cache for listing.DEFAULT_CACHE_TTL_SECONDS.
+        """
+        if expand:
+            knowledge_bases = self._listing_cache.get_or_load(
+                ("knowledge_bases", True), lambda: listing.describe(self.bedrock_agent_client)
+            )
+        else:
+            knowledge_bases = self._listing_cache.get_or_load(
+                ("knowledge_bases", False), lambda: list(listing.iter_knowledge_bases(self.bedrock_agent_client))
+            )
+        print(listing.to_json(knowledge_bases) if output == "json" else listing.format_table(knowledge_bases))
+        return knowledge_bases
 
-    def list_kb_datasources(self, kb_id):
+    def list_kb_datasources(self, kb_id, output="table"):
         """
-        Method to fetch the datasources created with Knowledge base
+        Method to fetch the datasources created with Knowledge base, across all pages.
         """
-        get_kb_response = bedrock_agent_client.list_data_sources(knowledgeBaseId=kb_id)
-        print(get_kb_response)
+        data_sources = self._listing_cache.get_or_load(
+            ("data_sources", kb_id), lambda: list(listing.iter_data_sources(self.bedrock_agent_client, kb_id))
+        )
+        print(listing.to_json(data_sources) if output == "json" else listing.format_data_sources(data_sources))
+        return data_sources
 
     def cleanup(self, collection_name, kb_id, kb_ds_id, vector_index_name):
         """
         Method to cleanup KB datasource, Knowledge base and Vector Index
         """
-        auth = AWSV4SignerAuth(credentials, session.region_name, SERVICE_NAME)
-
-        ## Creating OpenSearch Client
-        oss_client = OpenSearch(
-            hosts=[
-                {
-                    "host": f"{collection_name}.{session.region_name}.aoss.amazonaws.com",
-                    "port": 443,
-                }
-            ],
-            http_auth=auth,
-            use_ssl=True,
-            verify_certs=True,
-            connection_class=RequestsHttpConnection,
-            timeout=300,
-            pool_maxsize=20,
-        )
-
         try:
-            bedrock_agent_client.delete_data_source(
-                dataSourceId=kb_ds_id, knowledgeBaseId=kb_id
-            )
-            logger.info(f"Datasource {kb_ds_id} is deleted.")
+            self.delete_kb_datasource(kb_id, kb_ds_id)
         except Exception as ex:
             logger.error(ex)
 
         try:
-            bedrock_agent_client.delete_knowledge_base(knowledgeBaseId=kb_id)
+            self.delete_knowledge_base(kb_id)
         except Exception as ex:
-            logger.info(f"Knowledge base {kb_id} is deleted.")
             logger.error(ex)
 
         try:
-            oss_client.indices.delete(index=vector_index_name)
-            logger.info(f"Vector Index {vector_index_name} is deleted.")
+            self.delete_vector_index(collection_name, vector_index_name)
         except Exception as ex:
             logger.error(ex)
             
             
-    def upload_document(self):
-        s3_client = session.client("s3")
-        for root, dirs, files in os.walk(DATA_DIR):
-            for file in files:
-                s3_client.upload_file(os.path.join(root, file), bucket_name, file)
-                logger.info(
-                    f"Data gets uploaded for the file: {os.path.join(root, file)}"
-                )
-        logger.info("Data Upload operation is done.")
-    
-    
\ No newline at end of file
+    def extract_documents(self, data_dir=DATA_DIR, workers=None, password=None, use_cache=True):
+        """
+        Method to extract the text of every PDF under data_dir locally, to validate the corpus before it
+        is uploaded. Unchanged PDFs are served from the extraction cache instead of parsed again.
+        Returns one report per file with its pages, failed pages and pages/sec.
+        """
+        ## pypdf is only imported when documents are extracted
+        import pdf_extraction
+        from extraction_cache import ExtractionCache
+
+        cache = ExtractionCache() if use_cache else None
+        reports = pdf_extraction.extract_corpus(data_dir, password=password, workers=workers, cache=cache)
+        unreadable = [report["file"] for report in reports if "error" in report]
+        with_failed_pages = [report["file"] for report in reports if report["failedPages"]]
+        logger.info(
+            f"Extraction is done. Files: {len(reports)}, From cache: {sum(r['cached'] for r in reports)}, "
+            f"Unreadable: {unreadable}, With failed pages: {with_failed_pages}"
+        )
+        return reports
+
+    def chunk_documents(self, data_dir=DATA_DIR, max_tokens=512, overlap_percentage=20, use_cache=True):
+        """
+        Method to chunk the PDFs under data_dir locally the way the FIXED_SIZE chunking of a data source does,
+        to size the chunking settings before ingestion. Pages come through the extraction cache.
+        Returns one report per file with its chunks, its tokens and the tokens to embed.
+        """
+        ## pypdf is only imported when documents are chunked
+        import chunking
+        from extraction_cache import ExtractionCache
+
+        cache = ExtractionCache() if use_cache else None
+        reports = chunking.chunk_corpus(data_dir, max_tokens, overlap_percentage, cache=cache)
+        logger.info(
+            f"Chunking is done. Files: {len(reports)}, Chunks: {sum(r['chunks'] for r in reports)}, "
+            f"Tokens to embed: {sum(r['chunkTokens'] for r in reports)}"
+        )
+        return reports
+
+    def build_local_index(
+        self,
+        bucket_name,
+        data_dir=DATA_DIR,
+        prefix="",
+        embedding_model_name="amazon.titan-embed-text-v1",
+        max_tokens=512,
+        overlap_percentage=20,
+        batch_size=64,
+        use_cache=True,
+        compact_embedding_cache=False,
+    ):
+        """
+        Method to build the offline FAISS index in local_index_dir from the PDFs under data_dir. The PDFs are
+        chunked like the data source, embedded and stored with the S3 URIs they get when uploaded to bucket_name,
+        so the local backend returns the same sources as the knowledge base. With use_cache, pages come from the
+        extraction cache and only chunks whose text is not in the embedding cache are embedded. The embedding
+        cache is shared by every data_dir and chunking setting built with the model, so its rows are only
+        dropped on request: compact_embedding_cache keeps just the chunks of this build.
+        """
+        import chunking
+        import faiss_index
+        from embedding_cache import CachedEmbedder, EmbeddingStore
+        from extraction_cache import ExtractionCache
+
+        dimension = faiss_index.model_dimension(embedding_model_name)
+        index = faiss_index.FaissVectorIndex(dimension=dimension, embedding_model=embedding_model_name)
+        embedder = faiss_index.embedder_for(
+            embedding_model_name,
+            None if embedding_model_name == faiss_index.HASHING_EMBEDDING_MODEL_ID else self.bedrock_runtime_client,
+            dimension,
+            invoke=call_with_retry,
+        )
+        if use_cache:
+            embedder = CachedEmbedder(embedder, EmbeddingStore(embedding_model_name, dimension))
+        batch = []
+
+        def flush():
+            index.add(embedder.embed([document["text"] for document in batch]), batch)
+            batch.clear()
+
+        def add_chunk(path, chunk):
+            key = os.path.relpath(path, data_dir).replace(os.sep, "/")
+            key = f"{prefix.strip('/')}/{key}" if prefix.strip("/") else key
+            batch.append(faiss_index.make_document(chunk["text"], f"s3://{bucket_name}/{key}", chunk["pages"][0]))
+            if len(batch) >= batch_size:
+                flush()
+
+        reports = chunking.chunk_corpus(
+            data_dir, max_tokens, overlap_percentage, cache=ExtractionCache() if use_cache else None, on_chunk=add_chunk
+        )
+        if batch:
+            flush()
+        index.save(self.local_index_dir)
+        with self._lock:
+            self._clients.pop(FAISS_BACKEND, None)
+
+        logger.info(f"Local index is built in {self.local_index_dir}. Files: {len(reports)}, Chunks: {len(index)}")
+        if use_cache:
+            logger.info(f"Embedding Cache: {embedder.stats()}")
+            if compact_embedding_cache:
+                dropped = embedder.store.compact(document["text"] for document in index.documents)
+                logger.info(f"Embedding Cache compacted, dropped rows: {dropped}")
+        return index.config()
+
+    def upload_document(self, bucket_name, data_dir=DATA_DIR, prefix="", max_workers=8, validate=False):
+        """
+        Method to upload the documents under data_dir to S3, concurrently and resumably.
+        Keys keep the path relative to data_dir and files already in S3 with the same content are skipped.
+        The upload gets its own S3 client with a connection pool sized for all part uploads in flight.
+        With validate, the PDFs are extracted first (through the extraction cache) and unreadable ones
+        are left out of the upload.
+        """
+        exclude = []
+        if validate:
+            reports = self.extract_documents(data_dir)
+            exclude = [os.path.join(data_dir, report["file"]) for report in reports if "error" in report]
+        ## Every worker has up to TRANSFER_MAX_CONCURRENCY parts in flight, botocore's default pool holds 10
+        pool = Config(max_pool_connections=pool_connections(max_workers))
+        config = (self.client_config or retry_config()).merge(pool)
+        uploader = BulkUploader(
+            self.session.client("s3", config=config), bucket_name, data_dir, prefix=prefix, max_workers=max_workers,
+            exclude=exclude,
+        )
+        summary = uploader.upload()
+        logger.info(
+            f"Data Upload operation is done. Uploaded: {summary['uploaded']}, "
+            f"Skipped: {summary['skipped']}, Failed: {summary['failed']}, Bytes: {summary['bytes']}"
+        )
+        return summary
@@ -0,0 +1,207 @@
+"""
+Local PDF text extraction with pypdf.
+
+extract_pages() is a generator of {"page", "text", "error"} dicts in page
+order. Small documents are read in-process. The pages of big documents are
+split into ranges that a process pool extracts in parallel, and only a few
+ranges are in flight at a time, so memory stays bounded however long the
+document is.
+
+A page that pypdf cannot parse comes back with its error and empty text
+instead of aborting the file. Encrypted files are opened with the given (or an
+empty) password. A file that cannot be opened at all raises
+PdfExtractionError, which extract_corpus() records per file before moving on.
+
+    python pdf_extraction.py ../data --workers 4
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import pypdf
+
+logger = logging.getLogger(__name__)
+
+## Part of cache keys of extracted text, bump when the extraction output changes
+EXTRACTOR_VERSION = f"pypdf-{pypdf.__version__}/1"
+
+DEFAULT_PAGES_PER_TASK = 16
+DEFAULT_MIN_PAGES_FOR_POOL = 64
+
+
+class PdfExtractionError(Exception):
+    """
+    Raised when a PDF cannot be opened or decrypted at all.
+    """
+
+
+def open_reader(path, password=None):
+    try:
+        reader = pypdf.PdfReader(path, strict=False)
+        if reader.is_encrypted and not reader.decrypt(password or ""):
+            raise PdfExtractionError(f"{path} is encrypted and the password does not open it")
+        return reader
+    except PdfExtractionError:
+        raise
+    except Exception as ex:
+        raise PdfExtractionError(f"{path} cannot be read: {ex}") from ex
+
+
+def _extract_page(reader, index):
+    try:
+        return dict(page=index + 1, text=reader.pages[index].extract_text() or "", error=None)
+    except Exception as ex:
+        return dict(page=index + 1, text="", error=f"{type(ex).__name__}: {ex}")
+
+
+def iter_pages(path, password=None, start=0, stop=None):
+    """
+    Extract the pages [start, stop) of a document one at a time in this process.
+    """
+    reader = open_reader(path, password)
+    stop = len(reader.pages) if stop is None else min(stop, len(reader.pages))
+    for index in range(start, stop):
+        yield _extract_page(reader, index)
+
+
+def _extract_range(path, password, start, stop):
+    ## Runs in a worker process, so it opens its own reader
+    return list(iter_pages(path, password, start, stop))
+
+
+def extract_pages(path, password=None, workers=None, pages_per_task=DEFAULT_PAGES_PER_TASK,
+                  min_pages_for_pool=DEFAULT_MIN_PAGES_FOR_POOL, executor=None):
+    """
+    Yield the pages of a document in order, using a process pool for documents with at least
+    min_pages_for_pool pages. At most two ranges per worker are extracted ahead of the consumer.
+    """
+    reader = open_reader(path, password)
+    total = len(reader.pages)
+    workers = workers or os.cpu_count() or 1
+    if total < min_pages_for_pool or workers <= 1:
+        for index in range(total):
+            yield _extract_page(reader, index)
+        return
+    del reader
+
+    own_executor = executor is None
+    executor = executor or ProcessPoolExecutor(max_workers=workers)
+    try:
+        ranges = iter(range(0, total, pages_per_task))
+        in_flight = deque()
+        for start in ranges:
+            in_flight.append(executor.submit(_extract_range, path, password, start, start + pages_per_task))
+            if len(in_flight) >= workers * 2:
+                break
+        while in_flight:
+            pages = in_flight.popleft().result()
+            next_start = next(ranges, None)
+            if next_start is not None:
+                in_flight.append(
+                    executor.submit(_extract_range, path, password, next_start, next_start + pages_per_task)
+                )
+            yield from pages
+    finally:
+        if own_executor:
+            executor.shutdown(cancel_futures=True)
+
+
+class ExtractionStats:
+
+    def __init__(self, clock=time.perf_counter):
+        self._clock = clock
+        self.started = clock()
+        self.pages = 0
+        self.failed_pages = 0
+        self.chars = 0
+
+    def add(self, page):
+        self.pages += 1
+        self.chars += len(page["text"])
+        if page["error"]:
+            self.failed_pages += 1
+
+    def to_dict(self):
+        seconds = self._clock() - self.started
+        return dict(
+            pages=self.pages,
+            failedPages=self.failed_pages,
+            chars=self.chars,
+            seconds=round(seconds, 3),
+            pagesPerSecond=round(self.pages / seconds, 1) if seconds > 0 else None,
+        )
+
+
+def iter_pdf_files(data_dir):
+    for root, dirs, files in os.walk(data_dir):
+        dirs.sort()
+        for file in sorted(files):
+            if file.lower().endswith(".pdf"):
+                yield os.path.join(root, file)
+
+
+def document_pages(path, password=None, workers=None, cache=None):
+    """
+    Return (pages, cache_hit) for a document, served from an ExtractionCache when one is given.
+    """
+    if cache is None:
+        return extract_pages(path, password, workers), False
+    return cache.pages(path, lambda p: extract_pages(p, password, workers))
+
+
+def extract_corpus(data_dir, password=None, workers=None, on_page=None, cache=None):
+    """
+    Extract every PDF under data_dir and return one report per file. on_page(path, page) is
+    called for each page, e.g. to chunk or store the text, so no document is held in memory.
+    With an ExtractionCache, unchanged documents are read from the cache instead of parsed.
+    """
+    reports = []
+    for path in iter_pdf_files(data_dir):
+        stats = ExtractionStats()
+        report = dict(file=os.path.relpath(path, data_dir))
+        try:
+            pages, report["cached"] = document_pages(path, password, workers, cache)
+            for page in pages:
+                stats.add(page)
+                if page["error"]:
+                    logger.warning(f"{path} page {page['page']}: {page['error']}")
+                if on_page is not None:
+                    on_page(path, page)
+        except PdfExtractionError as ex:
+            logger.error(ex)
+            report["error"] = str(ex)
+        report.update(stats.to_dict())
+        logger.info(f"Extraction Report: {report}")
+        reports.append(report)
+    return reports
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Extract and validate the text of the PDFs under a folder")
+    parser.add_argument("data_dir")
+    parser.add_argument("--workers", type=int, help="processes for big documents (default: CPU count)")
+    parser.add_argument("--password", help="password of encrypted PDFs")
+    parser.add_argument("--no-cache", action="store_true", help="parse every PDF, ignoring the extraction cache")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    from extraction_cache import ExtractionCache
+
+    cache = None if args.no_cache else ExtractionCache()
+    reports = extract_corpus(args.data_dir, args.password, args.workers, cache=cache)
+    pages = sum(report["pages"] for report in reports)
+    seconds = sum(report["seconds"] for report in reports)
+    logger.info(
+        f"Files: {len(reports)}, Unreadable: {sum('error' in report for report in reports)}, Pages: {pages}, "
+        f"Failed Pages: {sum(report['failedPages'] for report in reports)}, "
+        f"Pages/sec: {round(pages / seconds, 1) if seconds else '-'}"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,218 @@
+"""
+Non-interactive provisioning of a knowledge base from a declarative plan.
+
+The plan is a JSON file with the names of the resources (see
+provisioning-plan.json). Provisioning runs the steps of menu options 1-5 as a
+dependency graph:
+
+    upload ------------------------------------------.
+    create_index --> create_knowledge_base --> create_data_source --> ingest
+
+Steps whose dependencies are done run concurrently (upload and index creation
+start together), and the ids a step creates are handed to the steps after it.
+Every step first looks for what it would create and reuses it, so a rerun
+continues where a failed run stopped and repeats nothing that succeeded.
+--cleanup deletes data source, knowledge base and index in reverse order.
+
+    python provisioning.py provisioning-plan.json
+    python provisioning.py provisioning-plan.json --cleanup
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from operations import DEFAULT_PROFILE_NAME, KnowledgeBaseOperations
+
+logger = logging.getLogger(__name__)
+
+DONE = "done"
+FAILED = "failed"
+SKIPPED = "skipped"
+
+PLAN_DEFAULTS = dict(
+    data_dir="../data",
+    vector_index_name="kb-oss-index",
+    bedrock_execution_role="kb-role-bedrock-execution",
+    embedding_model_name="amazon.titan-embed-text-v1",
+)
+REQUIRED_PLAN_KEYS = ("bucket_name", "collection_name", "kb_name")
+
+
+class Step:
+
+    def __init__(self, name, action, depends_on=()):
+        self.name = name
+        self.action = action
+        self.depends_on = tuple(depends_on)
+
+
+def validate_graph(steps):
+    """
+    Reject unknown dependencies and cycles before anything runs.
+    """
+    names = {step.name for step in steps}
+    for step in steps:
+        unknown = set(step.depends_on) - names
+        if unknown:
+            raise ValueError(f"Step {step.name} depends on unknown steps {sorted(unknown)}")
+    remaining = {step.name: set(step.depends_on) for step in steps}
+    while remaining:
+        ready = [name for name, deps in remaining.items() if not deps]
+        if not ready:
+            raise ValueError(f"Steps {sorted(remaining)} form a dependency cycle")
+        for name in ready:
+            del remaining[name]
+        for deps in remaining.values():
+            deps.difference_update(ready)
+
+
+def run_steps(steps, context, max_workers=4):
+    """
+    Run the steps as soon as their dependencies are done. action(context) gets a copy of
+    the context and returns a dict of outputs (e.g. {"kb_id": ...}) that is merged into it.
+    A failed step skips everything that depends on it, independent steps still run.
+    Returns {step name: "done" | "failed" | "skipped"}.
+    """
+    validate_graph(steps)
+    pending = {step.name: step for step in steps}
+    status = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        running = {}
+        while pending or running:
+            for name, step in list(pending.items()):
+                dependency_status = [status.get(dep) for dep in step.depends_on]
+                if any(s in (FAILED, SKIPPED) for s in dependency_status):
+                    logger.info(f"Step {name} is skipped, a dependency did not finish.")
+                    status[name] = SKIPPED
+                    del pending[name]
+                elif all(s == DONE for s in dependency_status):
+                    logger.info(f"Step {name} is started.")
+                    running[executor.submit(step.action, dict(context))] = name
+                    del pending[name]
+            if not running:
+                continue
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                try:
+                    context.update(future.result() or {})
+                except Exception as ex:
+                    logger.error(f"Step {name} failed: {ex}")
+                    status[name] = FAILED
+                else:
+                    logger.info(f"Step {name} is done.")
+                    status[name] = DONE
+    return status
+
+
+def load_plan(path):
+    with open(path) as f:
+        plan = dict(PLAN_DEFAULTS, **json.load(f))
+    missing = [key for key in REQUIRED_PLAN_KEYS if not plan.get(key)]
+    if missing:
+        raise ValueError(f"Plan {path} is missing {missing}")
+    plan.setdefault("data_source_name", plan["kb_name"])
+    return plan
+
+
+def provisioning_steps(operation):
+    """
+    Steps that stand up the knowledge base of a plan, each one safe to rerun.
+    """
+
+    def upload(plan):
+        summary = operation.upload_document(plan["bucket_name"], plan["data_dir"])
+        if summary["failed"]:
+            raise RuntimeError(f"{summary['failed']} files failed to upload")
+
+    def create_index(plan):
+        operation.create_vector_index(plan["collection_name"], plan["vector_index_name"])
+
+    def create_knowledge_base(plan):
+        kb_id = operation.find_knowledge_base(plan["kb_name"])
+        if kb_id is None:
+            kb_id = operation.create_knowledge_base(
+                plan["kb_name"],
+                plan["bedrock_execution_role"],
+                plan["embedding_model_name"],
+                plan["collection_name"],
+                plan["vector_index_name"],
+            )
+        operation.wait_for_knowledge_base(kb_id)
+        return dict(kb_id=kb_id)
+
+    def create_data_source(plan):
+        kb_ds_id = operation.find_kb_datasource(plan["kb_id"], plan["data_source_name"])
+        if kb_ds_id is None:
+            kb_ds_id = operation.create_kb_datasource(plan["data_source_name"], plan["kb_id"], plan["bucket_name"])
+        return dict(kb_ds_id=kb_ds_id)
+
+    def ingest(plan):
+        job = operation.execute_ingestion_job(plan["kb_id"], plan["kb_ds_id"])
+        if job is not None and job["status"] != "COMPLETE":
+            raise RuntimeError(f"Ingestion job {job['ingestionJobId']} is {job['status']}")
+
+    return [
+        Step("upload", upload),
+        Step("create_index", create_index),
+        Step("create_knowledge_base", create_knowledge_base, ["create_index"]),
+        Step("create_data_source", create_data_source, ["create_knowledge_base"]),
+        Step("ingest", ingest, ["create_data_source", "upload"]),
+    ]
+
+
+def cleanup_steps(operation):
+    """
+    Steps that delete the resources of a plan in reverse order, skipping what is already gone.
+    """
+
+    def find_knowledge_base(plan):
+        return dict(kb_id=operation.find_knowledge_base(plan["kb_name"]))
+
+    def delete_data_source(plan):
+        if plan["kb_id"] is None:
+            return
+        kb_ds_id = operation.find_kb_datasource(plan["kb_id"], plan["data_source_name"])
+        if kb_ds_id is not None:
+            operation.delete_kb_datasource(plan["kb_id"], kb_ds_id)
+
+    def delete_knowledge_base(plan):
+        if plan["kb_id"] is not None:
+            operation.delete_knowledge_base(plan["kb_id"])
+
+    def delete_index(plan):
+        operation.delete_vector_index(plan["collection_name"], plan["vector_index_name"])
+
+    return [
+        Step("find_knowledge_base", find_knowledge_base),
+        Step("delete_data_source", delete_data_source, ["find_knowledge_base"]),
+        Step("delete_knowledge_base", delete_knowledge_base, ["delete_data_source"]),
+        Step("delete_index", delete_index, ["delete_knowledge_base"]),
+    ]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Provision or clean up a knowledge base from a JSON plan")
+    parser.add_argument("plan", help="JSON plan with bucket_name, collection_name, kb_name and optional overrides")
+    parser.add_argument("--cleanup", action="store_true", help="delete the plan's resources instead")
+    parser.add_argument("--profile", help="AWS profile (default: AWS_PROFILE or bedrock-profile)")
+    parser.add_argument("--max-workers", type=int, default=4)
+    args = parser.parse_args(argv)
+
+    operation = KnowledgeBaseOperations(
+        profile_name=args.profile or os.environ.get("AWS_PROFILE", DEFAULT_PROFILE_NAME)
+    )
+    plan = load_plan(args.plan)
+    steps = cleanup_steps(operation) if args.cleanup else provisioning_steps(operation)
+    status = run_steps(steps, plan, args.max_workers)
+
+    logger.info(f"Step Status: {status}")
+    logger.info(f"Knowledge Base Id: {plan.get('kb_id')}, KB Datasource Id: {plan.get('kb_ds_id')}")
+    return 0 if all(s == DONE for s in status.values()) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
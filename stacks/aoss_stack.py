@@ -161,7 +161,12 @@ class AossStack(Stack):
                                      code=_lambda.Code.from_asset('assets/lambda_layer_with_py_deps.zip'),
                                      compatible_runtimes=[_lambda.Runtime.PYTHON_3_12])
         
-        create_index_lambda.add_layers(layer)   
+        # Shared modules, among them the pooled OpenSearch client factory
+        common_layer = _lambda.LayerVersion( self, 'common-lib-layer-for-index',
+                                     code=_lambda.Code.from_asset('assets/lambda-common'),
+                                     compatible_runtimes=[_lambda.Runtime.PYTHON_3_12])
+
+        create_index_lambda.add_layers(layer, common_layer)   
 
         
              # Finally we can create a complete data access policy for the collection that also includes the lambda function that will create the index. The policy must be a string and the resource contains the collections it is applied to.
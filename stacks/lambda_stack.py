@@ -3,9 +3,12 @@ from aws_cdk import (
   
     Duration,
     Stack,
+    Aws,
     CfnOutput,
     aws_lambda as _lambda,
     aws_iam as iam,
+    aws_dynamodb as dynamodb,
+    RemovalPolicy,
     Fn as Fn
 )
 
@@ -24,15 +27,46 @@ class LambdaStack(Stack):
             compatible_runtimes=[_lambda.Runtime.PYTHON_3_12],
         )
 
+        # Modules shared by the chat functions and knowledge_base/operations.py
+        common_layer = _lambda.LayerVersion(
+            self, 'common-lib-layer',
+            code=_lambda.Code.from_asset('assets/lambda-common'),
+            compatible_runtimes=[_lambda.Runtime.PYTHON_3_12],
+        )
+
+        # Maps client session ids to Bedrock RetrieveAndGenerate sessions
+        session_table = dynamodb.Table(
+            self, "ChatSessionTable",
+            partition_key=dynamodb.Attribute(name="sessionId", type=dynamodb.AttributeType.STRING),
+            billing_mode=dynamodb.BillingMode.PAY_PER_REQUEST,
+            time_to_live_attribute="expiresAt",
+            removal_policy=RemovalPolicy.DESTROY,
+        )
+
+        # Corpus generations are published by knowledge_base/operations.py after each ingestion
+        corpus_generation_prefix = "/chat-with-pdf"
+        corpus_generation_ps = iam.PolicyStatement(
+            effect=iam.Effect.ALLOW,
+            actions=["ssm:GetParameter"],
+            resources=[f"arn:aws:ssm:{Aws.REGION}:{Aws.ACCOUNT_ID}:parameter{corpus_generation_prefix}/*"]
+        )
+
         agent_invokation_lambda = _lambda.Function(
             self, "AgentInvocationLambda",
             code=_lambda.Code.from_asset("assets/lambda-bedrock"),
             handler="agent_invocation.handler",
             runtime=_lambda.Runtime.PYTHON_3_12,
-            timeout=Duration.seconds(60)
+            timeout=Duration.seconds(60),
+            environment={
+                # Resolved at deploy time so the handler does not scan ListExports
+                "KB_ID": Fn.import_value("BedrockKbId"),
+                "SESSION_TABLE_NAME": session_table.table_name,
+                "CORPUS_GENERATION_PREFIX": corpus_generation_prefix,
+            }
         )
 
-        agent_invokation_lambda.add_layers(layer)
+        agent_invokation_lambda.add_layers(layer, common_layer)
+        session_table.grant_read_write_data(agent_invokation_lambda)
 
         CfnOutput(self, "AgentInvocationLambdaArn", value=agent_invokation_lambda.function_arn,
                   export_name = "AgentInvocationLambdaArn")
@@ -50,6 +84,52 @@ class LambdaStack(Stack):
         )
 
         agent_invokation_lambda.add_to_role_policy(agent_invokation_lambda_ps)
+        agent_invokation_lambda.add_to_role_policy(corpus_generation_ps)
+
+        # Streaming variant of the chat function. Python handlers cannot stream their
+        # response, so it runs stream_server.py behind the Lambda Web Adapter.
+        web_adapter_layer = _lambda.LayerVersion.from_layer_version_arn(
+            self, 'lambda-web-adapter-layer',
+            f"arn:aws:lambda:{Aws.REGION}:753240598075:layer:LambdaAdapterLayerX86:24"
+        )
+
+        agent_stream_lambda = _lambda.Function(
+            self, "AgentStreamLambda",
+            code=_lambda.Code.from_asset("assets/lambda-bedrock"),
+            handler="run.sh",
+            runtime=_lambda.Runtime.PYTHON_3_12,
+            timeout=Duration.seconds(60),
+            environment={
+                "KB_ID": Fn.import_value("BedrockKbId"),
+                "SESSION_TABLE_NAME": session_table.table_name,
+                "CORPUS_GENERATION_PREFIX": corpus_generation_prefix,
+                "AWS_LAMBDA_EXEC_WRAPPER": "/opt/bootstrap",
+                "AWS_LWA_INVOKE_MODE": "response_stream",
+                "PORT": "8080",
+            }
+        )
+
+        agent_stream_lambda.add_layers(layer, common_layer, web_adapter_layer)
+        session_table.grant_read_write_data(agent_stream_lambda)
+        agent_stream_lambda.add_to_role_policy(corpus_generation_ps)
+
+        agent_stream_lambda_url = agent_stream_lambda.add_function_url(
+            auth_type=_lambda.FunctionUrlAuthType.AWS_IAM,
+            invoke_mode=_lambda.InvokeMode.RESPONSE_STREAM,
+        )
+
+        CfnOutput(self, "AgentStreamLambdaUrl", value=agent_stream_lambda_url.url,
+                  export_name = "AgentStreamLambdaUrl")
+
+        agent_stream_lambda.add_to_role_policy(iam.PolicyStatement(
+            effect=iam.Effect.ALLOW,
+            actions=["bedrock:InvokeModel", "bedrock:InvokeModelWithResponseStream",
+                     "cloudformation:ListExports",
+                     "bedrock:Retrieve",
+                     "bedrock:RetrieveAndGenerate"
+                     ],
+            resources=["*"]
+        ))
 
 
 
@@ -0,0 +1,40 @@
+import os
+import sys
+
+import pytest
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+## Lambda sources are deployed from asset folders, not installed as packages
+sys.path.insert(0, os.path.join(ROOT_DIR, "assets", "lambda-bedrock"))
+sys.path.insert(0, os.path.join(ROOT_DIR, "assets", "lambda-common", "python"))
+## The knowledge base CLI imports its modules from its own folder
+sys.path.insert(0, os.path.join(ROOT_DIR, "knowledge_base"))
+
+import clients  # noqa: E402
+import session_store  # noqa: E402
+from answer_cache import answer_cache  # noqa: E402
+from tests.unit.fakes import FakeCfnClient, FakeRuntimeClient, FakeSession, FakeSsmClient  # noqa: E402
+
+
+@pytest.fixture
+def fake_aws(monkeypatch):
+    """
+    Route the chat Lambda's boto3 session to the fakes and reset its per-container state.
+    """
+    monkeypatch.setenv("AWS_REGION", "us-east-1")
+    monkeypatch.delenv("KB_ID", raising=False)
+    monkeypatch.delenv("SESSION_TABLE_NAME", raising=False)
+    monkeypatch.setattr(clients.boto3, "Session", FakeSession)
+    monkeypatch.setattr(FakeCfnClient, "pages", FakeCfnClient.pages)
+    monkeypatch.setattr(FakeSsmClient, "parameters", {})
+    FakeSession.created = 0
+    FakeSession.clients_created = 0
+    FakeRuntimeClient.calls = 0
+    FakeRuntimeClient.requests = []
+    clients.reset()
+    session_store.reset()
+    answer_cache.invalidate()
+    answer_cache.hits = answer_cache.misses = 0
+    yield
+    clients.reset()
@@ -0,0 +1,138 @@
+"""
+In-memory stand-ins for the boto3 session and clients used by the chat Lambda.
+"""
+import io
+import json
+
+
+class FakeRuntimeClient:
+    calls = 0
+    requests = []
+
+    def retrieve_and_generate(self, **kwargs):
+        FakeRuntimeClient.calls += 1
+        FakeRuntimeClient.requests.append(kwargs)
+        return {
+            "sessionId": kwargs.get("sessionId", f"bedrock-session-{FakeRuntimeClient.calls}"),
+            "output": {"text": "Amazon Q is a generative AI assistant."},
+            "citations": [{"retrievedReferences": [{"content": {"text": "Amazon Q overview"}}]}],
+        }
+
+    def invoke_model(self, **kwargs):
+        FakeRuntimeClient.calls += 1
+        FakeRuntimeClient.requests.append(kwargs)
+        payload = {"content": [{"type": "text", "text": "Hydrogen burns clean."}],
+                   "usage": {"input_tokens": 120, "output_tokens": 5}}
+        return {"body": io.BytesIO(json.dumps(payload).encode())}
+
+
+class FakeCfnClient:
+    pages = [[{"Name": "BedrockKbId", "Value": "KB12345"}]]
+
+    def __init__(self):
+        self.calls = 0
+
+    def get_paginator(self, operation_name):
+        return self
+
+    def paginate(self):
+        for exports in self.pages:
+            self.calls += 1
+            yield {"Exports": exports}
+
+
+class FakeSsmClient:
+    """
+    Parameter Store stand-in, parameters are shared by every instance like the real store.
+    """
+    parameters = {}
+
+    def get_parameter(self, Name):
+        if Name not in self.parameters:
+            from botocore.exceptions import ClientError
+            raise ClientError({"Error": {"Code": "ParameterNotFound", "Message": Name}}, "GetParameter")
+        return {"Parameter": {"Name": Name, "Value": self.parameters[Name]}}
+
+    def put_parameter(self, Name, Value, Type, Overwrite=False):
+        self.parameters[Name] = Value
+
+
+class FakeSession:
+    created = 0
+    clients_created = 0
+    region_name = "us-east-1"
+
+    def __init__(self):
+        FakeSession.created += 1
+        self.cfn = FakeCfnClient()
+
+    def client(self, service_name, region_name=None, config=None):
+        FakeSession.clients_created += 1
+        if service_name == "cloudformation":
+            return self.cfn
+        if service_name == "ssm":
+            return FakeSsmClient()
+        return FakeRuntimeClient()
+
+
+class FakeDynamoDBClient:
+
+    def __init__(self):
+        self.items = {}
+
+    def get_item(self, TableName, Key):
+        item = self.items.get((TableName, Key["sessionId"]["S"]))
+        return {"Item": item} if item else {}
+
+    def put_item(self, TableName, Item):
+        self.items[(TableName, Item["sessionId"]["S"])] = Item
+
+    def delete_item(self, TableName, Key):
+        self.items.pop((TableName, Key["sessionId"]["S"]), None)
+
+
+class FakeS3Client:
+    """
+    Local S3 stand-in keeping objects in memory, with the calls the knowledge base tools use.
+    """
+
+    def __init__(self):
+        self.objects = {}
+        self.calls = []
+
+    def _missing(self, operation_name):
+        from botocore.exceptions import ClientError
+        return ClientError({"Error": {"Code": "404", "Message": "Not Found"}}, operation_name)
+
+    def upload_file(self, Filename, Bucket, Key, ExtraArgs=None, Config=None):
+        self.calls.append(("upload_file", Key))
+        with open(Filename, "rb") as f:
+            body = f.read()
+        self.objects[(Bucket, Key)] = dict(Body=body, Metadata=(ExtraArgs or {}).get("Metadata", {}))
+
+    def head_object(self, Bucket, Key):
+        self.calls.append(("head_object", Key))
+        if (Bucket, Key) not in self.objects:
+            raise self._missing("HeadObject")
+        obj = self.objects[(Bucket, Key)]
+        return dict(ContentLength=len(obj["Body"]), Metadata=obj["Metadata"])
+
+    def put_object(self, Bucket, Key, Body=b"", Metadata=None):
+        self.objects[(Bucket, Key)] = dict(Body=Body, Metadata=Metadata or {})
+
+    def delete_object(self, Bucket, Key):
+        self.objects.pop((Bucket, Key), None)
+
+    def get_paginator(self, operation_name):
+        assert operation_name == "list_objects_v2"
+        return self
+
+    def paginate(self, Bucket, Prefix="", page_size=2):
+        import hashlib
+        contents = [
+            dict(Key=key, ETag=f'"{hashlib.md5(obj["Body"]).hexdigest()}"', Size=len(obj["Body"]))
+            for (bucket, key), obj in sorted(self.objects.items())
+            if bucket == Bucket and key.startswith(Prefix)
+        ]
+        for start in range(0, len(contents), page_size):
+            yield dict(Contents=contents[start:start + page_size])
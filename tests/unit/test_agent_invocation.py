@@ -0,0 +1,123 @@
+import json
+
+import pytest
+
+import agent_invocation
+import clients
+import corpus_generation
+from tests.unit.fakes import FakeCfnClient, FakeRuntimeClient, FakeSession, FakeSsmClient
+
+pytestmark = pytest.mark.usefixtures("fake_aws")
+
+
+def chat_event(prompt="What are capabilites of amazon q?", session_id="session-12345"):
+    return {"body": json.dumps({"userPrompt": prompt, "sessionId": session_id})}
+
+
+def test_second_invocation_builds_no_clients():
+    first = agent_invocation.handler(chat_event(), None)
+    assert first["statusCode"] == 200
+    sessions, built = FakeSession.created, FakeSession.clients_created
+
+    second = agent_invocation.handler(chat_event(), None)
+
+    assert second["statusCode"] == 200
+    assert json.loads(second["body"])["response"] == "Amazon Q is a generative AI assistant."
+    assert (FakeSession.created, FakeSession.clients_created) == (sessions, built)
+    assert clients.get_client("cloudformation").calls == 1
+
+
+def test_warmup_event_initialises_state_only():
+    response = agent_invocation.handler({"warmup": True}, None)
+
+    assert response["statusCode"] == 200
+    assert json.loads(response["body"])["knowledgeBaseId"] == "KB12345"
+    built = FakeSession.clients_created
+
+    agent_invocation.handler(chat_event(), None)
+    assert FakeSession.clients_created == built
+
+
+def test_kb_id_is_refreshed_after_ttl(monkeypatch):
+    clients.get_kb_id()
+    cfn = clients.get_client("cloudformation")
+    monkeypatch.setattr(clients, "KB_ID_TTL_SECONDS", 0)
+
+    clients.get_kb_id()
+
+    assert cfn.calls == 2
+
+
+def test_kb_id_env_var_skips_export_lookup(monkeypatch):
+    monkeypatch.setenv("KB_ID", "KBFROMENV")
+
+    assert clients.get_kb_id() == "KBFROMENV"
+    assert "cloudformation" not in clients._clients
+
+
+def test_export_resolver_follows_pagination(monkeypatch):
+    monkeypatch.setattr(FakeCfnClient, "pages", [
+        [{"Name": "OtherExport", "Value": "x"}],
+        [{"Name": "BedrockKbId", "Value": "KBPAGE2"}],
+        [{"Name": "NeverRead", "Value": "y"}],
+    ])
+
+    assert clients.get_kb_id() == "KBPAGE2"
+    assert clients.get_client("cloudformation").calls == 2
+
+
+def test_missing_export_returns_clear_error(monkeypatch):
+    monkeypatch.setattr(FakeCfnClient, "pages", [[{"Name": "OtherExport", "Value": "x"}]])
+
+    response = agent_invocation.handler(chat_event(), None)
+
+    assert response["statusCode"] == 500
+    assert "BedrockKbId" in json.loads(response["body"])["error"]
+
+
+def test_repeated_question_is_served_from_cache():
+    agent_invocation.handler(chat_event("What are capabilites of Amazon Q?", "session-1"), None)
+    response = agent_invocation.handler(chat_event("  what are capabilites of amazon q ", None), None)
+
+    body = json.loads(response["body"])
+    assert body["cache"] == {"hit": True, "hits": 1, "misses": 0, "size": 1}
+    assert FakeRuntimeClient.calls == 1
+
+
+def test_invalidate_event_clears_cached_answers():
+    agent_invocation.handler(chat_event(session_id="session-1"), None)
+    agent_invocation.handler({"invalidateCache": True}, None)
+    agent_invocation.handler(chat_event(session_id=None), None)
+
+    assert FakeRuntimeClient.calls == 2
+
+
+def test_new_corpus_generation_moves_every_container_off_cached_answers(monkeypatch):
+    monkeypatch.setattr(clients, "CORPUS_GENERATION_PREFIX", corpus_generation.PARAMETER_PREFIX)
+    monkeypatch.setattr(clients, "CORPUS_GENERATION_TTL_SECONDS", 0)
+
+    agent_invocation.handler(chat_event(session_id=None), None)
+    agent_invocation.handler(chat_event(session_id=None), None)
+    corpus_generation.publish(FakeSsmClient(), "KB12345", "job-2")
+    response = agent_invocation.handler(chat_event(session_id=None), None)
+
+    assert FakeRuntimeClient.calls == 2
+    assert json.loads(response["body"])["cache"]["hit"] is False
+
+
+def test_session_opened_on_a_cached_question_keeps_its_context():
+    agent_invocation.handler(chat_event("What is Amazon Q?", "session-a"), None)
+    agent_invocation.handler(chat_event("What is Amazon Q?", "session-b"), None)
+    agent_invocation.handler(chat_event("Which plans does it have?", "session-b"), None)
+
+    assert FakeRuntimeClient.calls == 3
+    assert FakeRuntimeClient.requests[-1]["sessionId"] == "bedrock-session-2"
+
+
+@pytest.mark.parametrize("prompt", [42, None, "", "   ", ["What is Amazon Q?"]])
+def test_prompt_that_is_not_a_non_empty_string_is_a_bad_request(prompt):
+    response = agent_invocation.handler(chat_event(prompt, None), None)
+
+    assert response["statusCode"] == 400
+    assert "userPrompt must be" in json.loads(response["body"])["error"]
+    assert FakeRuntimeClient.calls == 0
@@ -0,0 +1,46 @@
+from answer_cache import AnswerCache, make_key, normalize_prompt
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_normalize_prompt_ignores_case_whitespace_and_punctuation():
+    assert normalize_prompt("  What are   the capabilities of Amazon Q?! ") == normalize_prompt(
+        "what are the capabilities of amazon q"
+    )
+
+
+def test_key_separates_knowledge_bases_and_models():
+    assert make_key("KB1", "model-a", "hello") != make_key("KB2", "model-a", "hello")
+    assert make_key("KB1", "model-a", "hello") != make_key("KB1", "model-b", "hello")
+    assert make_key("KB1", "model-a", "hello", "job-1") != make_key("KB1", "model-a", "hello", "job-2")
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = AnswerCache(max_entries=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")
+    cache.put("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+
+
+def test_entries_expire_after_ttl():
+    clock = FakeClock()
+    cache = AnswerCache(ttl_seconds=10, clock=clock)
+    cache.put("a", 1)
+    clock.now = 9.9
+    assert cache.get("a") == 1
+    clock.now = 10.0
+
+    assert cache.get("a") is None
+    assert cache.stats() == {"hits": 1, "misses": 1, "size": 0}
@@ -0,0 +1,74 @@
+import json
+import threading
+import time
+
+import pytest
+from botocore.exceptions import ClientError
+
+import agent_invocation
+from tests.unit.fakes import FakeRuntimeClient
+
+pytestmark = pytest.mark.usefixtures("fake_aws")
+
+
+def batch_event(prompts, **extra):
+    return {"body": json.dumps(dict(prompts=prompts, **extra))}
+
+
+def test_batch_results_keep_order_and_isolate_errors(monkeypatch):
+    def retrieve_and_generate(self, **kwargs):
+        text = kwargs["input"]["text"]
+        if text == "boom":
+            raise ClientError({"Error": {"Code": "ValidationException", "Message": "bad"}}, "RetrieveAndGenerate")
+        # Later questions finish first, results must still come back in input order
+        time.sleep(0.01 * (5 - int(text[-1])))
+        return {"output": {"text": f"answer to {text}"}}
+
+    monkeypatch.setattr(FakeRuntimeClient, "retrieve_and_generate", retrieve_and_generate)
+
+    response = agent_invocation.handler(batch_event(["q1", "q2", "boom", "q4"]), None)
+
+    assert response["statusCode"] == 200
+    results = json.loads(response["body"])["results"]
+    assert [r["index"] for r in results] == [0, 1, 2, 3]
+    assert [r.get("response") for r in results] == ["answer to q1", "answer to q2", None, "answer to q4"]
+    assert "ValidationException" in results[2]["error"]
+
+
+def test_batch_concurrency_is_capped(monkeypatch):
+    lock = threading.Lock()
+    state = {"running": 0, "peak": 0}
+
+    def retrieve_and_generate(self, **kwargs):
+        with lock:
+            state["running"] += 1
+            state["peak"] = max(state["peak"], state["running"])
+        time.sleep(0.02)
+        with lock:
+            state["running"] -= 1
+        return {"output": {"text": "ok"}}
+
+    monkeypatch.setattr(FakeRuntimeClient, "retrieve_and_generate", retrieve_and_generate)
+    monkeypatch.setattr(agent_invocation, "BATCH_MAX_CONCURRENCY", 3)
+
+    agent_invocation.handler(batch_event([f"question {i}" for i in range(12)], maxConcurrency=10), None)
+
+    assert state["peak"] == 3
+
+
+@pytest.mark.parametrize("prompts", ["What is Amazon Q?", [], ["q1", 2], {"q": "q1"}, ["  "]])
+def test_batch_rejects_prompts_that_are_not_a_list_of_strings(prompts):
+    response = agent_invocation.handler(batch_event(prompts), None)
+
+    assert response["statusCode"] == 400
+    assert "prompts must be" in json.loads(response["body"])["error"]
+    assert FakeRuntimeClient.calls == 0
+
+
+@pytest.mark.parametrize("max_concurrency", ["5", [1], 0, -2, 1.5, True])
+def test_batch_rejects_max_concurrency_that_is_not_a_positive_integer(max_concurrency):
+    response = agent_invocation.handler(batch_event(["q1", "q2"], maxConcurrency=max_concurrency), None)
+
+    assert response["statusCode"] == 400
+    assert "maxConcurrency must be" in json.loads(response["body"])["error"]
+    assert FakeRuntimeClient.calls == 0
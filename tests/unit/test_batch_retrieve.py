@@ -0,0 +1,96 @@
+import io
+import json
+import threading
+
+from botocore.exceptions import ClientError
+
+from batch_retrieve import RateLimiter, iter_queries, run_batch
+
+
+class FakeAgentRuntimeClient:
+
+    def __init__(self):
+        self.requests = []
+        self._lock = threading.Lock()
+
+    def retrieve(self, **kwargs):
+        with self._lock:
+            self.requests.append(kwargs)
+        query = kwargs["retrievalQuery"]["text"]
+        if query == "broken":
+            raise ClientError({"Error": {"Code": "ValidationException", "Message": "bad query"}}, "Retrieve")
+        return dict(retrievalResults=[
+            dict(content=dict(text=f"about {query}"), score=0.9,
+                 location=dict(type="S3", s3Location=dict(uri=f"s3://kb-bucket/{query}.pdf"))),
+        ])
+
+
+class CountingQueries:
+    """
+    Query source that records how far ahead of the finished results it has been read.
+    """
+
+    def __init__(self, count, output):
+        self.count = count
+        self.output = output
+        self.max_read_ahead = 0
+
+    def __iter__(self):
+        for i in range(self.count):
+            written = self.output.getvalue().count("\n")
+            self.max_read_ahead = max(self.max_read_ahead, i - written)
+            yield dict(id=i, query=f"question {i}")
+
+
+class NoLimit:
+
+    def acquire(self):
+        pass
+
+
+def test_queries_are_read_from_text_and_json_lines(tmp_path):
+    path = tmp_path / "queries.txt"
+    path.write_text('What is hydrogen?\n\n{"id": "q-7", "query": "Why fuel cells?"}\n')
+
+    assert list(iter_queries(str(path))) == [
+        dict(id=1, query="What is hydrogen?"), dict(id="q-7", query="Why fuel cells?"),
+    ]
+
+
+def test_results_stream_as_json_lines_with_scores_uris_and_errors():
+    client = FakeAgentRuntimeClient()
+    output = io.StringIO()
+    queries = [dict(id=1, query="hydrogen"), dict(id=2, query="broken")]
+
+    summary = run_batch(client, "kb", queries, output, max_workers=2, number_of_results=7,
+                        search_type="HYBRID", rate_limiter=NoLimit())
+
+    records = {r["id"]: r for r in map(json.loads, output.getvalue().splitlines())}
+    assert records[1]["results"] == [dict(score=0.9, uri="s3://kb-bucket/hydrogen.pdf")]
+    assert "ValidationException" in records[2]["error"]
+    assert records[1]["latencyMs"] >= 0
+    assert (summary["queries"], summary["errors"]) == (2, 1)
+    assert client.requests[0]["retrievalConfiguration"] == dict(
+        vectorSearchConfiguration=dict(numberOfResults=7, overrideSearchType="HYBRID")
+    )
+
+
+def test_only_a_bounded_window_of_queries_is_in_flight():
+    output = io.StringIO()
+    queries = CountingQueries(200, output)
+
+    summary = run_batch(FakeAgentRuntimeClient(), "kb", queries, output, max_workers=4, max_in_flight=8,
+                        rate_limiter=NoLimit())
+
+    assert summary["queries"] == 200
+    assert queries.max_read_ahead <= 8
+
+
+def test_rate_limiter_spaces_out_calls():
+    now = [0.0]
+    limiter = RateLimiter(rate=5, clock=lambda: now[0], sleep=lambda s: now.__setitem__(0, now[0] + s))
+
+    for _ in range(11):
+        limiter.acquire()
+
+    assert abs(now[0] - 2.0) < 1e-9
@@ -0,0 +1,86 @@
+import pytest
+
+from bulk_upload import BulkUploader
+from tests.unit.fakes import FakeS3Client
+
+
+@pytest.fixture
+def data_dir(tmp_path):
+    (tmp_path / "amazonq-docs").mkdir()
+    (tmp_path / "hydrogen").mkdir()
+    (tmp_path / "amazonq-docs" / "guide.pdf").write_bytes(b"%PDF amazon q guide")
+    (tmp_path / "hydrogen" / "guide.pdf").write_bytes(b"%PDF hydrogen guide")
+    (tmp_path / "faq.pdf").write_bytes(b"%PDF faq")
+    return tmp_path
+
+
+def uploads(s3):
+    return sorted(key for call, key in s3.calls if call == "upload_file")
+
+
+def test_keys_are_relative_to_the_data_dir(data_dir):
+    s3 = FakeS3Client()
+
+    summary = BulkUploader(s3, "kb-bucket", str(data_dir), prefix="docs").upload()
+
+    assert summary["uploaded"] == 3
+    assert sorted(key for _, key in s3.objects) == [
+        "docs/amazonq-docs/guide.pdf", "docs/faq.pdf", "docs/hydrogen/guide.pdf",
+    ]
+    assert s3.objects[("kb-bucket", "docs/faq.pdf")]["Metadata"]["sha256"]
+
+
+def test_rerun_skips_recorded_files_after_checking_s3(data_dir, monkeypatch):
+    s3 = FakeS3Client()
+    BulkUploader(s3, "kb-bucket", str(data_dir)).upload()
+    s3.calls.clear()
+    monkeypatch.setattr("bulk_upload.file_sha256", lambda path: pytest.fail(f"{path} was hashed again"))
+
+    summary = BulkUploader(s3, "kb-bucket", str(data_dir)).upload()
+
+    assert summary == dict(uploaded=0, skipped=3, failed=0, bytes=0, errors={})
+    assert sorted(call for call, _ in s3.calls) == ["head_object"] * 3
+
+
+def test_object_removed_from_the_bucket_is_uploaded_again(data_dir):
+    s3 = FakeS3Client()
+    BulkUploader(s3, "kb-bucket", str(data_dir)).upload()
+    s3.calls.clear()
+    s3.delete_object(Bucket="kb-bucket", Key="faq.pdf")
+
+    summary = BulkUploader(s3, "kb-bucket", str(data_dir)).upload()
+
+    assert (summary["uploaded"], summary["skipped"]) == (1, 2)
+    assert uploads(s3) == ["faq.pdf"]
+
+
+def test_unchanged_remote_content_is_not_uploaded_again(data_dir, tmp_path_factory):
+    s3 = FakeS3Client()
+    BulkUploader(s3, "kb-bucket", str(data_dir)).upload()
+    s3.calls.clear()
+    (data_dir / "faq.pdf").write_bytes(b"%PDF faq v2")
+
+    other_manifest = tmp_path_factory.mktemp("elsewhere") / "manifest.jsonl"
+    summary = BulkUploader(s3, "kb-bucket", str(data_dir), manifest_path=str(other_manifest)).upload()
+
+    assert summary["uploaded"] == 1
+    assert uploads(s3) == ["faq.pdf"]
+
+
+def test_interrupted_upload_resumes_where_it_stopped(data_dir):
+    class FlakyS3Client(FakeS3Client):
+        def upload_file(self, Filename, Bucket, Key, ExtraArgs=None, Config=None):
+            if Key == "hydrogen/guide.pdf":
+                raise ConnectionError("connection reset")
+            super().upload_file(Filename, Bucket, Key, ExtraArgs, Config)
+
+    flaky = FlakyS3Client()
+    first = BulkUploader(flaky, "kb-bucket", str(data_dir), max_workers=1).upload()
+    assert (first["uploaded"], first["failed"]) == (2, 1)
+
+    s3 = FakeS3Client()
+    s3.objects = flaky.objects
+    second = BulkUploader(s3, "kb-bucket", str(data_dir)).upload()
+
+    assert (second["uploaded"], second["skipped"]) == (1, 2)
+    assert uploads(s3) == ["hydrogen/guide.pdf"]
@@ -0,0 +1,61 @@
+import pytest
+
+import chunking
+from extraction_cache import ExtractionCache
+from tests.unit.test_pdf_extraction import write_pdf
+
+
+def naive_chunks(text, max_tokens, overlap_percentage):
+    tokens = chunking.TOKEN.findall(text)
+    step = max_tokens - max_tokens * overlap_percentage // 100
+    chunks, start = [], 0
+    while True:
+        chunks.append(tokens[start:start + max_tokens])
+        if start + max_tokens >= len(tokens):
+            return chunks
+        start += step
+
+
+def pages_from(texts):
+    return [dict(page=i, text=text, error=None) for i, text in enumerate(texts, start=1)]
+
+
+@pytest.mark.parametrize("max_tokens,overlap", [(300, 20), (512, 20), (10, 0), (7, 50)])
+def test_chunks_match_fixed_size_windows_across_pages(max_tokens, overlap):
+    texts = [" ".join(f"word{p}_{i}, hydrogen-fuel" for i in range(n)) for p, n in enumerate([5, 400, 0, 90, 1])]
+
+    chunks = list(chunking.chunk_pages(pages_from(texts), max_tokens, overlap))
+
+    expected = naive_chunks("\n".join(texts), max_tokens, overlap)
+    assert [chunking.TOKEN.findall(chunk["text"]) for chunk in chunks] == expected
+    assert [chunk["tokens"] for chunk in chunks] == [len(tokens) for tokens in expected]
+    assert chunks[-1]["startToken"] + chunks[-1]["tokens"] == chunking.count_tokens("\n".join(texts))
+
+
+def test_chunks_record_the_pages_they_span():
+    pages = pages_from(["alpha " * 8, "beta " * 8])
+
+    chunks = list(chunking.chunk_pages(pages, max_tokens=10, overlap_percentage=20))
+
+    assert [chunk["pages"] for chunk in chunks] == [[1, 2], [2, 2]]
+    assert chunks[0]["text"] == "alpha " * 8 + "\nbeta beta"
+
+
+def test_long_words_count_as_several_tokens():
+    assert chunking.count_tokens("electrolysis, H2") == 4
+    assert list(chunking.chunk_pages(pages_from([""]))) == []
+
+
+def test_corpus_report_per_document(tmp_path):
+    data_dir = tmp_path / "data"
+    data_dir.mkdir()
+    write_pdf(data_dir / "a.pdf", ["Hydrogen is considered the fuel of the future " * 10] * 3)
+    chunks = []
+
+    reports = chunking.chunk_corpus(str(data_dir), max_tokens=50, overlap_percentage=20,
+                                    cache=ExtractionCache(str(tmp_path / "cache")),
+                                    on_chunk=lambda path, chunk: chunks.append(chunk))
+
+    assert reports[0]["chunks"] == len(chunks) > 1
+    assert reports[0]["chunkTokens"] == sum(chunk["tokens"] for chunk in chunks)
+    assert reports[0]["documentTokens"] < reports[0]["chunkTokens"]
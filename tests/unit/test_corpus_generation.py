@@ -0,0 +1,42 @@
+from botocore.exceptions import ClientError
+
+import corpus_generation
+from tests.unit.fakes import FakeSsmClient
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_generation_is_re_read_only_after_the_ttl():
+    ssm, clock = FakeSsmClient(), FakeClock()
+    ssm.parameters = {}
+    reader = corpus_generation.CorpusGenerationReader(lambda: ssm, ttl_seconds=30, clock=clock)
+
+    assert reader.get("KB1") is None
+    corpus_generation.publish(ssm, "KB1", "job-1")
+    assert reader.get("KB1") is None
+    clock.now = 30
+    assert reader.get("KB1") == "job-1"
+
+
+def test_ssm_errors_keep_the_last_known_generation():
+    class FailingSsmClient(FakeSsmClient):
+        def get_parameter(self, Name):
+            raise ClientError({"Error": {"Code": "ThrottlingException", "Message": "slow down"}}, "GetParameter")
+
+    ssm, clock = FakeSsmClient(), FakeClock()
+    ssm.parameters = {corpus_generation.parameter_name("KB1"): "job-1"}
+    services = {"ssm": ssm}
+    reader = corpus_generation.CorpusGenerationReader(lambda: services["ssm"], ttl_seconds=30, clock=clock)
+    assert reader.get("KB1") == "job-1"
+
+    services["ssm"] = FailingSsmClient()
+    clock.now = 30
+
+    assert reader.get("KB1") == "job-1"
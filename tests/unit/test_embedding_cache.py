@@ -0,0 +1,84 @@
+import os
+
+import numpy as np
+
+from embedding_cache import CachedEmbedder, EmbeddingStore, model_key
+
+MODEL_ID = "amazon.titan-embed-text-v1"
+
+
+class CountingEmbedder:
+
+    model_id = MODEL_ID
+
+    def __init__(self, dimension=4):
+        self.dimension = dimension
+        self.embedded = []
+
+    def embed(self, texts):
+        self.embedded.extend(texts)
+        return np.array([[len(text)] * self.dimension for text in texts], dtype=np.float32)
+
+
+def test_only_new_chunks_are_embedded_across_rebuilds(tmp_path):
+    first = CountingEmbedder()
+    CachedEmbedder(first, EmbeddingStore(MODEL_ID, 4, str(tmp_path))).embed(["a", "bb", "a"])
+
+    second = CountingEmbedder()
+    embedder = CachedEmbedder(second, EmbeddingStore(MODEL_ID, 4, str(tmp_path)))
+    vectors = embedder.embed(["a", "bb", "ccc"])
+
+    assert first.embedded == ["a", "bb"]
+    assert second.embedded == ["ccc"]
+    assert vectors[:, 0].tolist() == [1.0, 2.0, 3.0]
+    assert embedder.stats() == dict(hits=2, misses=1, rows=3)
+
+
+def test_hits_are_views_of_the_memory_map(tmp_path):
+    store = EmbeddingStore(MODEL_ID, 4, str(tmp_path))
+    texts = [f"chunk {i}" for i in range(10)]
+    store.append(texts, np.arange(40, dtype=np.float32).reshape(10, 4))
+
+    rows, missing = store.lookup(texts[2:6])
+    run = store.vectors(rows)
+
+    assert len(missing) == 0
+    assert not run.flags.owndata and np.shares_memory(run, store.vectors(np.arange(10)))
+    assert run[0].tolist() == [8.0, 9.0, 10.0, 11.0]
+    assert not store.get("chunk 3").flags.owndata
+    assert store.vectors(store.lookup(["chunk 5", "chunk 1"])[0])[:, 0].tolist() == [20.0, 4.0]
+
+
+def test_stores_are_keyed_by_model_and_dimension(tmp_path):
+    EmbeddingStore(MODEL_ID, 4, str(tmp_path)).append(["a"], np.ones((1, 4)))
+
+    assert len(EmbeddingStore(f"arn:aws:bedrock:us-east-1::foundation-model/{MODEL_ID}", 4, str(tmp_path))) == 1
+    assert len(EmbeddingStore("amazon.titan-embed-text-v2:0", 4, str(tmp_path))) == 0
+    assert len(EmbeddingStore(MODEL_ID, 8, str(tmp_path))) == 0
+    assert model_key("amazon.titan-embed-text-v2:0") == "amazon.titan-embed-text-v2_0"
+
+
+def test_compaction_drops_deleted_content(tmp_path):
+    store = EmbeddingStore(MODEL_ID, 4, str(tmp_path))
+    store.append(["a", "bb", "ccc"], np.array([[1] * 4, [2] * 4, [3] * 4], dtype=np.float32))
+    old_matrix_path = store.matrix_path()
+
+    assert store.compact(["ccc", "a"]) == 1
+
+    reopened = EmbeddingStore(MODEL_ID, 4, str(tmp_path))
+    assert len(reopened) == 2
+    assert reopened.get("bb") is None
+    assert reopened.get("ccc").tolist() == [3.0] * 4
+    assert not os.path.exists(old_matrix_path)
+
+
+def test_interrupted_append_is_cut_back_to_complete_rows(tmp_path):
+    store = EmbeddingStore(MODEL_ID, 4, str(tmp_path))
+    store.append(["a", "bb"], np.ones((2, 4)))
+    with open(store.matrix_path(), "ab") as f:
+        f.write(np.ones(6, dtype=np.float32).tobytes())
+
+    reopened = EmbeddingStore(MODEL_ID, 4, str(tmp_path))
+
+    assert len(reopened) == 2
+    assert os.path.getsize(reopened.matrix_path()) == 2 * 4 * 4
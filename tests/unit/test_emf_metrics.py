@@ -0,0 +1,61 @@
+import json
+
+import agent_invocation
+from emf_metrics import MetricsLogger
+from tests.unit.fakes import FakeRuntimeClient
+
+
+def test_flush_writes_one_emf_record():
+    lines = []
+    metrics = MetricsLogger(namespace="Test", dimensions={"ModelId": "m"}, emit=lines.append)
+    metrics.put_metric("ResponseSize", 42, "Bytes")
+    metrics.set_property("Pipeline", "two_stage")
+    with metrics.timer("GenerationLatency"):
+        pass
+
+    metrics.flush()
+    metrics.flush()
+
+    assert len(lines) == 1
+    record = json.loads(lines[0])
+    directive = record["_aws"]["CloudWatchMetrics"][0]
+    assert isinstance(record["_aws"]["Timestamp"], int)
+    assert directive["Namespace"] == "Test"
+    assert directive["Dimensions"] == [["ModelId"]]
+    assert directive["Metrics"] == [
+        {"Name": "ResponseSize", "Unit": "Bytes"},
+        {"Name": "GenerationLatency", "Unit": "Milliseconds"},
+    ]
+    assert record["ModelId"] == "m"
+    assert record["ResponseSize"] == 42
+    assert record["Pipeline"] == "two_stage"
+
+
+def emitted_records(capsys):
+    return [json.loads(line) for line in capsys.readouterr().out.splitlines() if line.startswith('{"_aws"')]
+
+
+def test_handler_emits_phase_timings_and_cold_start(fake_aws, monkeypatch, capsys):
+    def retrieve_and_generate(self, **kwargs):
+        return {"output": {"text": "answer"}, "citations": [
+            {"retrievedReferences": [{"content": {"text": "a"}}, {"content": {"text": "b"}}]}
+        ]}
+
+    monkeypatch.setattr(FakeRuntimeClient, "retrieve_and_generate", retrieve_and_generate)
+    monkeypatch.setattr(agent_invocation, "_cold_start", True)
+    event = {"body": json.dumps({"userPrompt": "What is Amazon Q?", "sessionId": "s1"})}
+
+    response = agent_invocation.handler(event, None)
+    agent_invocation.handler(event, None)
+
+    cold, warm = emitted_records(capsys)
+    names = [m["Name"] for m in cold["_aws"]["CloudWatchMetrics"][0]["Metrics"]]
+    assert set(names) >= {
+        "TotalLatency", "ClientInitLatency", "KbLookupLatency", "GenerationLatency",
+        "SerializationLatency", "ResponseSize", "CitationCount",
+    }
+    assert cold["_aws"]["CloudWatchMetrics"][0]["Dimensions"] == [["ColdStart", "ModelId"]]
+    assert (cold["ColdStart"], warm["ColdStart"]) == ("true", "false")
+    assert cold["ModelId"] == "anthropic.claude-3-haiku-20240307-v1:0"
+    assert cold["CitationCount"] == 2
+    assert cold["ResponseSize"] == len(response["body"])
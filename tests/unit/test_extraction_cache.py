@@ -0,0 +1,76 @@
+import os
+
+import pdf_extraction
+from extraction_cache import ExtractionCache
+from tests.unit.test_pdf_extraction import write_pdf
+
+
+def pages_of(count):
+    return [dict(page=i, text=f"text of page {i} " * 20, error=None) for i in range(1, count + 1)]
+
+
+def test_unchanged_document_is_served_without_extracting(tmp_path):
+    cache = ExtractionCache(str(tmp_path / "cache"))
+    path = write_pdf(tmp_path / "doc.pdf", ["Hydrogen is a fuel", "Fuel cells make water"])
+    calls = []
+
+    def extract(p):
+        calls.append(p)
+        return pdf_extraction.extract_pages(p)
+
+    first, first_hit = cache.pages(path, extract)
+    first = list(first)
+    second, second_hit = cache.pages(path, extract)
+
+    assert (first_hit, second_hit) == (False, True)
+    assert list(second) == first
+    assert len(calls) == 1
+
+
+def test_entries_are_keyed_by_content_and_extractor_version(tmp_path):
+    directory = str(tmp_path / "cache")
+    list(ExtractionCache(directory, extractor_version="v1").store("abc", pages_of(2)))
+
+    assert ExtractionCache(directory, extractor_version="v1").get("abc") is not None
+    assert ExtractionCache(directory, extractor_version="v2").get("abc") is None
+    assert ExtractionCache(directory, extractor_version="v1").get("def") is None
+
+
+def test_partially_consumed_documents_are_not_cached(tmp_path):
+    cache = ExtractionCache(str(tmp_path / "cache"), extractor_version="v1")
+
+    stream = cache.store("abc", pages_of(3))
+    next(stream)
+    stream.close()
+
+    assert cache.get("abc") is None
+    assert os.listdir(cache.directory) == []
+
+
+def test_least_recently_used_entries_are_evicted_first(tmp_path):
+    cache = ExtractionCache(str(tmp_path / "cache"), extractor_version="v1")
+    for age, key in enumerate(["new", "old", "oldest"]):
+        list(cache.store(key, pages_of(50)))
+        os.utime(cache.entry_path(key), (1000 - age * 100, 1000 - age * 100))
+    ## Room for three entries, the gzip header holds the file name so sizes differ by a few bytes
+    cache.max_bytes = os.path.getsize(cache.entry_path("oldest")) * 3 + 16
+
+    list(cache.get("oldest"))
+    list(cache.store("newest", pages_of(50)))
+
+    assert cache.get("old") is None
+    assert all(cache.get(key) is not None for key in ("new", "oldest", "newest"))
+    assert cache.size() <= cache.max_bytes
+
+
+def test_corpus_rerun_reads_from_the_cache(tmp_path):
+    data_dir = tmp_path / "data"
+    data_dir.mkdir()
+    write_pdf(data_dir / "a.pdf", ["one", "two"])
+    cache = ExtractionCache(str(tmp_path / "cache"))
+
+    first = pdf_extraction.extract_corpus(str(data_dir), cache=cache)
+    second = pdf_extraction.extract_corpus(str(data_dir), cache=cache)
+
+    assert (first[0]["cached"], second[0]["cached"]) == (False, True)
+    assert first[0]["chars"] == second[0]["chars"] and second[0]["pages"] == 2
@@ -0,0 +1,155 @@
+import io
+import json
+import os
+from functools import partial
+
+import faiss
+import pytest
+
+import agent_invocation
+import clients
+import embedding_cache
+import extraction_cache
+import faiss_index
+import rag_pipeline
+from operations import FAISS_BACKEND, KnowledgeBaseOperations
+from tests.unit.test_operations import StubSession
+from tests.unit.test_pdf_extraction import write_pdf
+
+TOOLS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "tools")
+
+
+def sample_index():
+    embedder = faiss_index.HashingEmbedder()
+    index = faiss_index.FaissVectorIndex(embedding_model=embedder.model_id)
+    with open(os.path.join(TOOLS_DIR, "sample_corpus.jsonl")) as f:
+        passages = [json.loads(line) for line in f if line.strip()]
+    index.add(
+        embedder.embed([p["text"] for p in passages]),
+        [faiss_index.make_document(p["text"], p["uri"]) for p in passages],
+    )
+    return index
+
+
+def test_index_mirrors_the_aoss_mapping(tmp_path):
+    sample_index().save(str(tmp_path))
+
+    index = faiss.read_index(str(tmp_path / "index.faiss"))
+
+    assert (index.d, index.metric_type) == (1536, faiss.METRIC_INNER_PRODUCT)
+    assert index.hnsw.efConstruction == 256
+    assert index.hnsw.nb_neighbors(1) == 48
+    with open(tmp_path / "config.json") as f:
+        assert json.load(f)["method"] == dict(
+            name="hnsw", space_type="innerproduct", engine="faiss", parameters=dict(m=48, ef_construction=256)
+        )
+
+
+@pytest.mark.parametrize("search_type", ["SEMANTIC", "HYBRID"])
+def test_retrieve_answers_like_the_retrieve_api(tmp_path, search_type):
+    sample_index().save(str(tmp_path))
+    client = faiss_index.FaissRetrieveClient.load(str(tmp_path))
+
+    chunks = rag_pipeline.retrieve_chunks(
+        client, "local", "Which fuel cell combines hydrogen and oxygen?", number_of_results=3, search_type=search_type
+    )
+
+    assert len(chunks) == 3
+    assert chunks[0]["location"] == {"type": "S3", "s3Location": {"uri": "s3://kb-bucket/hydrogen/fuel-cells.pdf"}}
+    assert chunks[0]["metadata"] == {"x-amz-bedrock-kb-source-uri": "s3://kb-bucket/hydrogen/fuel-cells.pdf"}
+    assert [c["score"] for c in chunks] == sorted((c["score"] for c in chunks), reverse=True)
+
+
+def test_scores_follow_opensearch_inner_product_translation():
+    assert faiss_index.opensearch_score(0.5) == 1.5
+    assert faiss_index.opensearch_score(-1.0) == 0.5
+
+
+def test_titan_embedder_invokes_the_model_per_text():
+    class Runtime:
+        def invoke_model(self, **kwargs):
+            text = json.loads(kwargs["body"])["inputText"]
+            return {"body": io.BytesIO(json.dumps({"embedding": [float(len(text))] * 1536}).encode())}
+
+    vectors = faiss_index.TitanEmbedder(Runtime()).embed(["a", "bb", "ccc"])
+
+    assert vectors.shape == (3, 1536)
+    assert list(vectors[:, 0]) == [1.0, 2.0, 3.0]
+
+
+def test_operations_build_and_retrieve_offline(tmp_path):
+    data_dir = tmp_path / "data"
+    data_dir.mkdir()
+    write_pdf(data_dir / "hydrogen.pdf", ["Hydrogen is considered the fuel of the future.", "Steel is made from iron."])
+    session = StubSession({})
+    operation = KnowledgeBaseOperations(
+        session=session, retrieval_backend=FAISS_BACKEND, local_index_dir=str(tmp_path / "index")
+    )
+
+    config = operation.build_local_index(
+        "kb-bucket", str(data_dir), prefix="docs", embedding_model_name="local-hashing", max_tokens=11,
+        overlap_percentage=0, use_cache=False,
+    )
+    chunks = rag_pipeline.retrieve_chunks(operation.bedrock_agent_runtime_client, "local", "How is steel made?", 1)
+
+    assert config["documents"] == 2
+    assert chunks[0]["location"]["s3Location"]["uri"] == "s3://kb-bucket/docs/hydrogen.pdf"
+    assert chunks[0]["metadata"]["x-amz-bedrock-kb-document-page-number"] == 2
+    assert session.created == []
+
+
+def test_embedding_cache_is_compacted_only_on_request(monkeypatch, tmp_path):
+    monkeypatch.setattr(embedding_cache, "EmbeddingStore", partial(embedding_cache.EmbeddingStore,
+                                                                   directory=str(tmp_path / "embeddings")))
+    monkeypatch.setattr(extraction_cache, "ExtractionCache", partial(extraction_cache.ExtractionCache,
+                                                                     directory=str(tmp_path / "pages")))
+    texts = dict(hydrogen="Hydrogen is considered the fuel of the future.", steel="Steel is made from iron.")
+    for name, text in texts.items():
+        (tmp_path / name).mkdir()
+        write_pdf(tmp_path / name / f"{name}.pdf", [text])
+    operation = KnowledgeBaseOperations(session=StubSession({}), local_index_dir=str(tmp_path / "index"))
+
+    def cached_rows():
+        return len(embedding_cache.EmbeddingStore("local-hashing", faiss_index.DIMENSION))
+
+    for name in ("hydrogen", "steel"):
+        operation.build_local_index("kb-bucket", str(tmp_path / name), embedding_model_name="local-hashing")
+    assert cached_rows() == 2
+
+    operation.build_local_index("kb-bucket", str(tmp_path / "steel"), embedding_model_name="local-hashing",
+                                compact_embedding_cache=True)
+    assert cached_rows() == 1
+
+
+def test_titan_v2_index_is_built_at_the_model_dimension(tmp_path):
+    class Runtime:
+        def invoke_model(self, **kwargs):
+            body = json.loads(kwargs["body"])
+            return {"body": io.BytesIO(json.dumps({"embedding": [1.0] * body["dimensions"]}).encode())}
+
+    data_dir = tmp_path / "data"
+    data_dir.mkdir()
+    write_pdf(data_dir / "hydrogen.pdf", ["Hydrogen is considered the fuel of the future."])
+    operation = KnowledgeBaseOperations(
+        session=StubSession({"bedrock-runtime": Runtime()}), local_index_dir=str(tmp_path / "index")
+    )
+
+    config = operation.build_local_index(
+        "kb-bucket", str(data_dir), embedding_model_name="amazon.titan-embed-text-v2:0", use_cache=False
+    )
+
+    assert config["dimension"] == 1024
+
+
+def test_lambda_answers_from_the_local_index(fake_aws, monkeypatch, tmp_path):
+    sample_index().save(str(tmp_path))
+    monkeypatch.setattr(clients, "RETRIEVAL_BACKEND", clients.FAISS_BACKEND)
+    monkeypatch.setattr(clients, "LOCAL_INDEX_DIR", str(tmp_path))
+
+    response = agent_invocation.handler({"body": json.dumps({"userPrompt": "Why is hydrogen a fuel?"})}, None)
+
+    body = json.loads(response["body"])
+    assert response["statusCode"] == 200
+    assert body["response"] == "Hydrogen burns clean."
+    assert body["citations"][0]["location"]["s3Location"]["uri"].startswith("s3://kb-bucket/hydrogen/")
+    assert clients.get_kb_id() == clients.LOCAL_KB_ID
@@ -0,0 +1,43 @@
+from ingestion_manifest import IngestionManifest, diff_snapshots, snapshot_bucket
+from tests.unit.fakes import FakeS3Client
+
+
+def test_snapshot_lists_all_pages_under_the_prefixes():
+    s3 = FakeS3Client()
+    for key in ("docs/a.pdf", "docs/b.pdf", "docs/c.pdf", "other/d.pdf"):
+        s3.put_object(Bucket="kb-bucket", Key=key, Body=key.encode())
+
+    snapshot = snapshot_bucket(s3, "kb-bucket", ["docs/"])
+
+    assert sorted(snapshot) == ["docs/a.pdf", "docs/b.pdf", "docs/c.pdf"]
+    assert snapshot["docs/a.pdf"]["size"] == len(b"docs/a.pdf")
+    assert not snapshot["docs/a.pdf"]["etag"].startswith('"')
+
+
+def test_diff_reports_added_modified_and_deleted_keys():
+    previous = {"a.pdf": dict(etag="1", size=1), "b.pdf": dict(etag="2", size=2), "c.pdf": dict(etag="3", size=3)}
+    current = {"a.pdf": dict(etag="1", size=1), "b.pdf": dict(etag="9", size=2), "d.pdf": dict(etag="4", size=4)}
+
+    changes = diff_snapshots(previous, current)
+
+    assert (changes.added, changes.modified, changes.deleted) == (["d.pdf"], ["b.pdf"], ["c.pdf"])
+    assert not diff_snapshots(current, dict(current)).has_changes
+
+
+def test_upload_rounds_accumulate_until_an_ingestion_completes(tmp_path):
+    s3 = FakeS3Client()
+    path = str(tmp_path / "manifest.json")
+    s3.put_object(Bucket="kb-bucket", Key="a.pdf", Body=b"a")
+    IngestionManifest(path).commit("kb", "ds", snapshot_bucket(s3, "kb-bucket"), "job-1")
+
+    s3.put_object(Bucket="kb-bucket", Key="b.pdf", Body=b"b")
+    s3.put_object(Bucket="kb-bucket", Key="a.pdf", Body=b"a v2")
+    s3.put_object(Bucket="kb-bucket", Key="c.pdf", Body=b"c")
+    snapshot = snapshot_bucket(s3, "kb-bucket")
+    manifest = IngestionManifest(path)
+
+    assert manifest.changes("kb", "ds", snapshot).summary() == dict(added=2, modified=1, deleted=0)
+    assert manifest.changes("kb", "other-ds", snapshot).summary() == dict(added=3, modified=0, deleted=0)
+
+    manifest.commit("kb", "ds", snapshot, "job-2")
+    assert not IngestionManifest(path).changes("kb", "ds", snapshot_bucket(s3, "kb-bucket")).has_changes
@@ -0,0 +1,88 @@
+import pytest
+
+from ingestion_watcher import IngestionJobWatcher, IngestionTimeoutError, poll_intervals, summarize
+
+
+class StubBedrockAgentClient:
+    """
+    Walks each job through a fixed sequence of statuses, one per get_ingestion_job call.
+    """
+
+    def __init__(self, statuses, statistics=None):
+        self.statuses = list(statuses)
+        self.statistics = statistics or {}
+        self.polls = 0
+
+    def _job(self, status):
+        return dict(
+            ingestionJobId="job-1", knowledgeBaseId="kb", dataSourceId="ds",
+            status=status, statistics=self.statistics,
+        )
+
+    def start_ingestion_job(self, knowledgeBaseId, dataSourceId):
+        return dict(ingestionJob=self._job("STARTING"))
+
+    def get_ingestion_job(self, knowledgeBaseId, dataSourceId, ingestionJobId):
+        status = self.statuses[min(self.polls, len(self.statuses) - 1)]
+        self.polls += 1
+        return dict(ingestionJob=self._job(status))
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def watcher_for(client, clock, timeout=3600):
+    return IngestionJobWatcher(client, initial_interval=2, max_interval=10, multiplier=2,
+                               timeout=timeout, clock=clock, sleep=clock.sleep)
+
+
+def test_poll_interval_starts_short_and_backs_off():
+    intervals = poll_intervals(2, 10, 2)
+    assert [next(intervals) for _ in range(5)] == [2, 4, 8, 10, 10]
+
+
+def test_small_job_is_noticed_after_the_first_short_poll():
+    clock = FakeClock()
+    client = StubBedrockAgentClient(["COMPLETE"], statistics=dict(numberOfDocumentsScanned=3,
+                                                                   numberOfNewDocumentsIndexed=3))
+
+    job = watcher_for(client, clock).start_and_watch("kb", "ds")
+
+    assert job["status"] == "COMPLETE"
+    assert clock.sleeps == [2]
+    assert summarize(job)["numberOfNewDocumentsIndexed"] == 3
+    assert summarize(job)["numberOfDocumentsFailed"] == 0
+
+
+@pytest.mark.parametrize("terminal", ["FAILED", "STOPPED"])
+def test_failed_and_stopped_jobs_end_the_watch(terminal):
+    clock = FakeClock()
+    client = StubBedrockAgentClient(["IN_PROGRESS", "IN_PROGRESS", terminal])
+
+    job = watcher_for(client, clock).start_and_watch("kb", "ds")
+
+    assert job["status"] == terminal
+    assert client.polls == 3
+    assert clock.sleeps == [2, 4, 8]
+
+
+def test_job_running_past_the_timeout_raises():
+    clock = FakeClock()
+    client = StubBedrockAgentClient(["IN_PROGRESS"])
+
+    with pytest.raises(IngestionTimeoutError) as error:
+        watcher_for(client, clock, timeout=25).start_and_watch("kb", "ds")
+
+    assert error.value.job["status"] == "IN_PROGRESS"
+    assert clock.now == 25
@@ -0,0 +1,98 @@
+import json
+
+import listing
+from operations import KnowledgeBaseOperations
+
+
+class PagedBedrockAgentClient:
+    """
+    bedrock-agent stand-in that serves the list APIs two items per page.
+    """
+
+    def __init__(self, kb_count=3):
+        self.knowledge_bases = [
+            dict(knowledgeBaseId=f"KB{i}", name=f"kb-{i}", status="ACTIVE", updatedAt=None) for i in range(kb_count)
+        ]
+        self.list_calls = 0
+
+    def get_paginator(self, operation_name):
+        return Paginator(self, operation_name)
+
+    def list_ingestion_jobs(self, knowledgeBaseId, dataSourceId, sortBy, maxResults):
+        assert sortBy == dict(attribute="STARTED_AT", order="DESCENDING")
+        if knowledgeBaseId == "KB0":
+            return dict(ingestionJobSummaries=[])
+        return dict(ingestionJobSummaries=[
+            dict(ingestionJobId=f"job-{dataSourceId}", status="COMPLETE", startedAt=None),
+        ])
+
+
+class Paginator:
+
+    def __init__(self, client, operation_name):
+        self.client = client
+        self.operation_name = operation_name
+
+    def paginate(self, **kwargs):
+        self.client.list_calls += 1
+        if self.operation_name == "list_knowledge_bases":
+            key, items = "knowledgeBaseSummaries", self.client.knowledge_bases
+        else:
+            kb_id = kwargs["knowledgeBaseId"]
+            key = "dataSourceSummaries"
+            items = [dict(dataSourceId=f"{kb_id}-DS", name=f"{kb_id}-source", status="AVAILABLE")]
+        for start in range(0, len(items), 2):
+            yield {key: items[start:start + 2]}
+
+
+class StubSession:
+
+    region_name = "us-east-1"
+
+    def __init__(self, client):
+        self._client = client
+
+    def client(self, service_name, config=None):
+        return self._client
+
+
+def test_generators_walk_every_page():
+    client = PagedBedrockAgentClient(kb_count=5)
+
+    assert [kb["knowledgeBaseId"] for kb in listing.iter_knowledge_bases(client)] == [f"KB{i}" for i in range(5)]
+
+
+def test_describe_expands_data_sources_and_latest_ingestion_job():
+    knowledge_bases = listing.describe(PagedBedrockAgentClient())
+
+    assert [kb["knowledgeBaseId"] for kb in knowledge_bases] == ["KB0", "KB1", "KB2"]
+    assert knowledge_bases[0]["dataSources"][0]["latestIngestionJob"] is None
+    assert knowledge_bases[1]["dataSources"][0]["latestIngestionJob"]["status"] == "COMPLETE"
+    table = listing.format_table(knowledge_bases)
+    assert "never ingested" in table and "last ingestion COMPLETE" in table
+
+
+def test_ttl_cache_expires_entries():
+    now = [0.0]
+    cache = listing.TTLCache(ttl_seconds=30, clock=lambda: now[0])
+    loads = []
+
+    def load():
+        loads.append(1)
+        return len(loads)
+
+    assert cache.get_or_load("key", load) == 1
+    assert cache.get_or_load("key", load) == 1
+    now[0] = 31
+    assert cache.get_or_load("key", load) == 2
+
+
+def test_repeated_listing_is_served_from_the_cache(capsys):
+    client = PagedBedrockAgentClient()
+    operation = KnowledgeBaseOperations(session=StubSession(client))
+
+    operation.list_knowledge_bases(output="json")
+    assert json.loads(capsys.readouterr().out)[0]["knowledgeBaseId"] == "KB0"
+    operation.list_knowledge_bases(output="json")
+
+    assert client.list_calls == 1
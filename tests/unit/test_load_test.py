@@ -0,0 +1,57 @@
+import os
+
+import pytest
+
+from tools import load_test
+from tools.bedrock_stub import LatencyDistribution, StubBehaviour
+
+SAMPLE_EVENTS = os.path.join(load_test.ROOT_DIR, "tools", "sample_events.jsonl")
+
+
+@pytest.fixture(autouse=True)
+def fresh_container(fake_aws):
+    yield
+
+
+def test_percentile_uses_nearest_rank():
+    values = list(range(1, 101))
+
+    assert load_test.percentile(values, 50) == 50
+    assert load_test.percentile(values, 99) == 99
+    assert load_test.percentile([7], 95) == 7
+
+
+def test_latency_distributions_parse():
+    assert LatencyDistribution("constant:12").sample_ms() == 12
+    assert 5 <= LatencyDistribution("uniform:5:10").sample_ms() <= 10
+    with pytest.raises(ValueError):
+        LatencyDistribution("pareto:1")
+
+
+def test_run_reports_latency_throughput_and_errors():
+    behaviour = StubBehaviour("constant:1", error_rate=0.5, error_code="ValidationException", seed=7)
+
+    report = load_test.run(load_test.load_events(SAMPLE_EVENTS), requests=40, concurrency=4,
+                           behaviour=behaviour, seed=7)
+
+    assert report["requests"] == 40
+    assert report["throughput_rps"] > 0
+    assert set(report["latency_ms"]) == {"p50", "p95", "p99", "max", "mean"}
+    assert report["latency_ms"]["p50"] >= 1
+    assert report["status_codes"]["500"] == report["errors"]["ValidationException"] > 0
+    assert sum(report["status_codes"].values()) == 40
+
+
+def test_main_fails_when_overhead_budget_is_exceeded(capsys):
+    assert load_test.main([SAMPLE_EVENTS, "--requests", "5", "--max-p99-overhead-ms", "0"]) == 1
+    assert load_test.main([SAMPLE_EVENTS, "--requests", "5", "--max-p99-overhead-ms", "10000"]) == 0
+
+
+def test_retry_backoff_is_reported_apart_from_overhead():
+    behaviour = StubBehaviour("constant:0", error_rate=0.3, error_code="ThrottlingException", seed=3)
+
+    report = load_test.run(load_test.load_events(SAMPLE_EVENTS), requests=10, concurrency=2,
+                           behaviour=behaviour, seed=3)
+
+    assert report["backoff_ms"]["max"] > 0
+    assert report["overhead_ms"]["max"] < report["backoff_ms"]["max"]
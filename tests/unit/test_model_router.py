@@ -0,0 +1,87 @@
+import json
+
+import pytest
+
+import agent_invocation
+from model_router import HAIKU_MODEL_ID, SONNET_MODEL_ID, ModelRouter, UnknownModelError
+from tests.unit.fakes import FakeRuntimeClient
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("What is Amazon Q?", (HAIKU_MODEL_ID, "short_lookup")),
+    ("Why is hydrogen considered the fuel of the future?", (SONNET_MODEL_ID, "complex_question")),
+    ("Compare Amazon Q Business and Amazon Q Developer", (SONNET_MODEL_ID, "complex_question")),
+    ("What is Amazon Q? Who can use it?", (SONNET_MODEL_ID, "complex_question")),
+    ("a" * 201, (SONNET_MODEL_ID, "long_prompt")),
+])
+def test_router_policy(query, expected):
+    assert ModelRouter().choose(query) == expected
+
+
+def test_override_accepts_aliases_and_rejects_unknown_models():
+    router = ModelRouter()
+
+    assert router.choose("Why?", "haiku") == (HAIKU_MODEL_ID, "override")
+    with pytest.raises(UnknownModelError):
+        router.choose("Why?", "anthropic.claude-v2")
+
+
+def test_fallback_only_for_weak_small_model_answers():
+    router = ModelRouter(min_citations=1)
+    cited = {"response": "answer", "citations": [{"text": "a"}]}
+
+    assert not router.needs_fallback(HAIKU_MODEL_ID, cited)
+    assert router.needs_fallback(HAIKU_MODEL_ID, {"response": "answer", "citations": []})
+    assert router.needs_fallback(HAIKU_MODEL_ID, dict(cited, response=" "))
+    assert not router.needs_fallback(SONNET_MODEL_ID, {"response": "", "citations": []})
+
+
+def ask(prompt, **extra):
+    event = {"body": json.dumps(dict(userPrompt=prompt, sessionId=None, **extra))}
+    return agent_invocation.handler(event, None)
+
+
+def test_uncited_haiku_answer_is_regenerated_with_sonnet(fake_aws, monkeypatch):
+    def retrieve_and_generate(self, **kwargs):
+        FakeRuntimeClient.requests.append(kwargs)
+        model_arn = kwargs["retrieveAndGenerateConfiguration"]["knowledgeBaseConfiguration"]["modelArn"]
+        references = [{"content": {"text": "doc"}}] if SONNET_MODEL_ID in model_arn else []
+        return {"output": {"text": "answer"}, "citations": [{"retrievedReferences": references}]}
+
+    monkeypatch.setattr(FakeRuntimeClient, "retrieve_and_generate", retrieve_and_generate)
+
+    body = json.loads(ask("What is Amazon Q?")["body"])
+
+    assert body["model"] == {"id": SONNET_MODEL_ID, "reason": "short_lookup", "fallback": True}
+    assert len(FakeRuntimeClient.requests) == 2
+
+
+def test_unknown_model_override_is_a_bad_request(fake_aws):
+    response = ask("What is Amazon Q?", model="gpt")
+
+    assert response["statusCode"] == 400
+
+
+def test_follow_up_turn_is_not_asked_twice_in_its_session(fake_aws, monkeypatch):
+    def retrieve_and_generate(self, **kwargs):
+        FakeRuntimeClient.requests.append(kwargs)
+        return {"sessionId": "bedrock-session-1", "output": {"text": "answer"},
+                "citations": [{"retrievedReferences": []}]}
+
+    monkeypatch.setattr(FakeRuntimeClient, "retrieve_and_generate", retrieve_and_generate)
+    agent_invocation.handler({"body": json.dumps({"userPrompt": "What is Amazon Q?", "sessionId": "s1"})}, None)
+    FakeRuntimeClient.requests.clear()
+
+    response = agent_invocation.handler({"body": json.dumps({"userPrompt": "Who uses it?", "sessionId": "s1"})}, None)
+
+    body = json.loads(response["body"])
+    assert body["model"] == {"id": SONNET_MODEL_ID, "reason": "session_follow_up", "fallback": False}
+    assert [r.get("sessionId") for r in FakeRuntimeClient.requests] == ["bedrock-session-1"]
+
+
+@pytest.mark.parametrize("model", [42, ["haiku"], {"id": "haiku"}])
+def test_model_that_is_not_a_string_is_a_bad_request(fake_aws, model):
+    response = ask("What is Amazon Q?", model=model)
+
+    assert response["statusCode"] == 400
+    assert "Model must be" in json.loads(response["body"])["error"]
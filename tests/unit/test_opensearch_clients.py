@@ -0,0 +1,57 @@
+import pytest
+from botocore.credentials import Credentials
+
+import opensearch_clients
+
+
+class RotatingSession:
+
+    region_name = "us-east-1"
+
+    def __init__(self):
+        self.credentials = Credentials("AKIAFIRST", "secret-1", "token-1")
+
+    def get_credentials(self):
+        return self.credentials
+
+
+@pytest.fixture(autouse=True)
+def fresh_clients():
+    opensearch_clients.reset()
+    yield
+    opensearch_clients.reset()
+
+
+def test_clients_are_cached_per_endpoint():
+    session = RotatingSession()
+
+    first = opensearch_clients.get_client("https://abc.us-east-1.aoss.amazonaws.com/", session=session)
+    again = opensearch_clients.get_client("abc.us-east-1.aoss.amazonaws.com", session=session)
+    other = opensearch_clients.get_client(opensearch_clients.collection_host("xyz", "us-east-1"), session=session)
+
+    assert first is again
+    assert other is not first
+
+
+def test_clients_with_another_session_or_pool_are_not_shared():
+    session = RotatingSession()
+    endpoint = "abc.us-east-1.aoss.amazonaws.com"
+
+    first = opensearch_clients.get_client(endpoint, session=session)
+
+    assert opensearch_clients.get_client(endpoint, session=RotatingSession()) is not first
+    assert opensearch_clients.get_client(endpoint, session=session, timeout=30) is not first
+    assert opensearch_clients.get_client(endpoint, session=session, pool_maxsize=4) is not first
+
+
+def test_requests_are_signed_with_the_current_credentials():
+    session = RotatingSession()
+    client = opensearch_clients.get_client("abc.us-east-1.aoss.amazonaws.com", session=session)
+    connection = client.transport.get_connection()
+    signer = connection.session.auth.signer
+
+    url = "https://abc.us-east-1.aoss.amazonaws.com/kb-docs"
+    assert "AKIAFIRST/" in signer.sign("GET", url, None)["Authorization"]
+
+    session.credentials = Credentials("AKIASECOND", "secret-2", "token-2")
+    assert "AKIASECOND/" in signer.sign("GET", url, None)["Authorization"]
@@ -0,0 +1,165 @@
+import os
+import subprocess
+import sys
+import threading
+import time
+
+from botocore.exceptions import ClientError
+
+from operations import KnowledgeBaseOperations
+from tests.unit.fakes import FakeS3Client, FakeSsmClient
+
+KNOWLEDGE_BASE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+                                  "knowledge_base")
+
+## Importing operations must not touch AWS, so the CLI menu shows up at once
+IMPORT_TIME_BUDGET_SECONDS = 1.0
+
+
+class StubBedrockAgentClient:
+
+    def __init__(self):
+        self.started = []
+
+    def get_data_source(self, knowledgeBaseId, dataSourceId):
+        return dict(dataSource=dict(dataSourceConfiguration=dict(
+            s3Configuration=dict(bucketArn=f"arn:aws:s3:::bucket-{dataSourceId}")
+        )))
+
+    def start_ingestion_job(self, knowledgeBaseId, dataSourceId):
+        self.started.append(dataSourceId)
+        return dict(ingestionJob=dict(
+            ingestionJobId=f"job-{dataSourceId}", knowledgeBaseId=knowledgeBaseId, dataSourceId=dataSourceId,
+            status="COMPLETE", statistics=dict(numberOfDocumentsScanned=1),
+        ))
+
+
+class StubSession:
+
+    region_name = "us-east-1"
+
+    def __init__(self, clients):
+        self.clients = clients
+        self.created = []
+        self.configs = {}
+
+    def client(self, service_name, config=None):
+        self.created.append(service_name)
+        self.configs[service_name] = config
+        return self.clients[service_name]
+
+
+def test_import_creates_no_session_within_the_time_budget():
+    env = {k: v for k, v in os.environ.items() if not k.startswith("AWS_")}
+    code = (
+        "import sys, time; started = time.perf_counter(); import operations; "
+        "print(time.perf_counter() - started, 'boto3' in sys.modules)"
+    )
+
+    output = subprocess.run([sys.executable, "-c", code], cwd=KNOWLEDGE_BASE_DIR, env=env,
+                            capture_output=True, text=True, check=True).stdout.split()
+
+    assert float(output[0]) < IMPORT_TIME_BUDGET_SECONDS
+    assert output[1] == "False"
+
+
+def test_clients_are_created_once_on_first_use():
+    session = StubSession({"bedrock-agent": StubBedrockAgentClient()})
+    operation = KnowledgeBaseOperations(session=session)
+    assert session.created == []
+
+    assert operation.bedrock_agent_client is operation.bedrock_agent_client
+    assert session.created == ["bedrock-agent"]
+
+
+def test_ingestion_runs_only_for_changed_data_sources(tmp_path):
+    s3 = FakeS3Client()
+    s3.put_object(Bucket="bucket-ds-1", Key="a.pdf", Body=b"a")
+    s3.put_object(Bucket="bucket-ds-2", Key="b.pdf", Body=b"b")
+    agent = StubBedrockAgentClient()
+    ssm = FakeSsmClient()
+    ssm.parameters = {}
+    operation = KnowledgeBaseOperations(session=StubSession({"bedrock-agent": agent, "s3": s3, "ssm": ssm}))
+    manifest_path = str(tmp_path / "manifest.json")
+
+    first = operation.execute_ingestion_jobs([("kb", "ds-1"), ("kb", "ds-2")], manifest_path=manifest_path)
+    s3.put_object(Bucket="bucket-ds-2", Key="c.pdf", Body=b"c")
+    second = operation.execute_ingestion_jobs([("kb", "ds-1"), ("kb", "ds-2")], manifest_path=manifest_path)
+
+    assert [outcome["job"]["status"] for outcome in first] == ["COMPLETE", "COMPLETE"]
+    assert second[0]["job"] is None and second[1]["job"]["ingestionJobId"] == "job-ds-2"
+    assert sorted(agent.started) == ["ds-1", "ds-2", "ds-2"]
+    assert ssm.parameters == {"/chat-with-pdf/kb/corpus-generation": "job-ds-2"}
+
+
+def test_failing_data_source_does_not_stop_the_others(tmp_path):
+    class FailingAgentClient(StubBedrockAgentClient):
+        def start_ingestion_job(self, knowledgeBaseId, dataSourceId):
+            if dataSourceId == "ds-1":
+                raise RuntimeError("ingestion refused")
+            return super().start_ingestion_job(knowledgeBaseId, dataSourceId)
+
+    s3 = FakeS3Client()
+    s3.put_object(Bucket="bucket-ds-1", Key="a.pdf", Body=b"a")
+    s3.put_object(Bucket="bucket-ds-2", Key="b.pdf", Body=b"b")
+    ssm = FakeSsmClient()
+    ssm.parameters = {}
+    operation = KnowledgeBaseOperations(
+        session=StubSession({"bedrock-agent": FailingAgentClient(), "s3": s3, "ssm": ssm})
+    )
+    manifest_path = str(tmp_path / "manifest.json")
+
+    outcomes = operation.execute_ingestion_jobs([("kb", "ds-1"), ("kb", "ds-2")], manifest_path=manifest_path)
+    retried = operation.execute_ingestion_jobs([("kb", "ds-1"), ("kb", "ds-2")], manifest_path=manifest_path)
+
+    assert str(outcomes[0]["error"]) == "ingestion refused" and outcomes[0]["job"] is None
+    assert outcomes[1]["error"] is None and outcomes[1]["job"]["status"] == "COMPLETE"
+    assert retried[1]["job"] is None
+
+
+def test_upload_pool_holds_every_part_in_flight(tmp_path):
+    (tmp_path / "faq.pdf").write_bytes(b"%PDF faq")
+    session = StubSession({"s3": FakeS3Client()})
+    operation = KnowledgeBaseOperations(session=session)
+
+    summary = operation.upload_document("kb-bucket", str(tmp_path), max_workers=4)
+
+    assert summary["uploaded"] == 1
+    assert session.configs["s3"].max_pool_connections == 32
+    assert session.configs["s3"].retries["mode"] == "adaptive"
+
+
+def test_data_sources_of_one_knowledge_base_are_ingested_one_after_another(tmp_path):
+    class OneJobPerKnowledgeBase(StubBedrockAgentClient):
+        def __init__(self):
+            super().__init__()
+            self.running = set()
+            self.lock = threading.Lock()
+
+        def start_ingestion_job(self, knowledgeBaseId, dataSourceId):
+            with self.lock:
+                if knowledgeBaseId in self.running:
+                    raise ClientError({"Error": {"Code": "ConflictException", "Message": "job running"}},
+                                      "StartIngestionJob")
+                self.running.add(knowledgeBaseId)
+            time.sleep(0.05)
+            with self.lock:
+                self.running.discard(knowledgeBaseId)
+            return super().start_ingestion_job(knowledgeBaseId, dataSourceId)
+
+    s3 = FakeS3Client()
+    for kb_ds_id in ("ds-1", "ds-2", "ds-3"):
+        s3.put_object(Bucket=f"bucket-{kb_ds_id}", Key="a.pdf", Body=b"a")
+    ssm = FakeSsmClient()
+    ssm.parameters = {}
+    agent = OneJobPerKnowledgeBase()
+    operation = KnowledgeBaseOperations(session=StubSession({"bedrock-agent": agent, "s3": s3, "ssm": ssm}))
+
+    outcomes = operation.execute_ingestion_jobs(
+        [("kb-1", "ds-1"), ("kb-1", "ds-2"), ("kb-2", "ds-3")], manifest_path=str(tmp_path / "manifest.json")
+    )
+
+    assert [(o["kb_ds_id"], o["error"]) for o in outcomes] == [("ds-1", None), ("ds-2", None), ("ds-3", None)]
+    assert ssm.parameters == {
+        "/chat-with-pdf/kb-1/corpus-generation": "job-ds-2", "/chat-with-pdf/kb-2/corpus-generation": "job-ds-3",
+    }
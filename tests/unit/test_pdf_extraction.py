@@ -0,0 +1,89 @@
+import pypdf
+import pytest
+from pypdf.generic import DecodedStreamObject, DictionaryObject, NameObject
+
+import pdf_extraction
+
+
+def write_pdf(path, texts, password=None):
+    """
+    Write a PDF with one line of text per page.
+    """
+    writer = pypdf.PdfWriter()
+    font = DictionaryObject({
+        NameObject("/Type"): NameObject("/Font"),
+        NameObject("/Subtype"): NameObject("/Type1"),
+        NameObject("/BaseFont"): NameObject("/Helvetica"),
+    })
+    for text in texts:
+        page = writer.add_blank_page(width=612, height=792)
+        content = DecodedStreamObject()
+        content.set_data(f"BT /F1 12 Tf 72 720 Td ({text}) Tj ET".encode())
+        page[NameObject("/Contents")] = writer._add_object(content)
+        page[NameObject("/Resources")] = DictionaryObject({
+            NameObject("/Font"): DictionaryObject({NameObject("/F1"): font}),
+        })
+    if password:
+        writer.encrypt(password)
+    with open(path, "wb") as f:
+        writer.write(f)
+    return str(path)
+
+
+def test_pages_stream_in_order(tmp_path):
+    path = write_pdf(tmp_path / "doc.pdf", ["Hydrogen is a fuel", "Fuel cells make water"])
+
+    pages = list(pdf_extraction.extract_pages(path))
+
+    assert [page["page"] for page in pages] == [1, 2]
+    assert "Hydrogen" in pages[0]["text"] and "Fuel cells" in pages[1]["text"]
+
+
+def test_big_documents_are_extracted_by_the_process_pool_in_order(tmp_path):
+    path = write_pdf(tmp_path / "big.pdf", [f"Page number {i}" for i in range(1, 41)])
+
+    pages = list(pdf_extraction.extract_pages(path, workers=2, pages_per_task=4, min_pages_for_pool=10))
+
+    assert [page["page"] for page in pages] == list(range(1, 41))
+    assert "Page number 37" in pages[36]["text"]
+
+
+def test_broken_page_is_reported_without_aborting_the_file(tmp_path, monkeypatch):
+    path = write_pdf(tmp_path / "doc.pdf", ["first", "second", "third"])
+    extract_text = pypdf.PageObject.extract_text
+
+    def flaky_extract_text(page, *args, **kwargs):
+        text = extract_text(page, *args, **kwargs)
+        if "second" in text:
+            raise ValueError("bad content stream")
+        return text
+
+    monkeypatch.setattr(pypdf.PageObject, "extract_text", flaky_extract_text)
+    pages = list(pdf_extraction.extract_pages(path, workers=1))
+
+    assert [bool(page["error"]) for page in pages] == [False, True, False]
+    assert "bad content stream" in pages[1]["error"]
+
+
+def test_encrypted_files_need_the_password(tmp_path):
+    path = write_pdf(tmp_path / "secret.pdf", ["classified"], password="s3cret")
+
+    with pytest.raises(pdf_extraction.PdfExtractionError):
+        list(pdf_extraction.extract_pages(path))
+    assert "classified" in next(pdf_extraction.extract_pages(path, password="s3cret"))["text"]
+
+
+def test_corpus_report_counts_pages_and_unreadable_files(tmp_path):
+    write_pdf(tmp_path / "a.pdf", ["one", "two"])
+    (tmp_path / "nested").mkdir()
+    write_pdf(tmp_path / "nested" / "b.pdf", ["three"])
+    (tmp_path / "broken.pdf").write_bytes(b"not a pdf")
+    seen = []
+
+    reports = pdf_extraction.extract_corpus(str(tmp_path), on_page=lambda path, page: seen.append(page["page"]))
+
+    by_file = {report["file"]: report for report in reports}
+    assert (by_file["a.pdf"]["pages"], by_file["nested/b.pdf"]["pages"]) == (2, 1)
+    assert "error" in by_file["broken.pdf"]
+    assert by_file["a.pdf"]["pagesPerSecond"] > 0
+    assert seen == [1, 2, 1]
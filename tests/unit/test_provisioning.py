@@ -0,0 +1,129 @@
+import threading
+
+import pytest
+
+from provisioning import DONE, FAILED, SKIPPED, Step, cleanup_steps, provisioning_steps, run_steps
+
+PLAN = dict(
+    bucket_name="kb-bucket", collection_name="collection", vector_index_name="kb-oss-index",
+    kb_name="arjstack-kb", data_source_name="arjstack-kb", bedrock_execution_role="role",
+    embedding_model_name="amazon.titan-embed-text-v1", data_dir="../data",
+)
+
+
+class FakeOperations:
+    """
+    In-memory stand-in for KnowledgeBaseOperations that keeps the created resources.
+    """
+
+    def __init__(self):
+        self.calls = []
+        self.indexes = set()
+        self.knowledge_bases = {}
+        self.data_sources = {}
+        self.started_together = threading.Barrier(2, timeout=5)
+
+    def upload_document(self, bucket_name, data_dir):
+        self.started_together.wait()
+        self.calls.append("upload")
+        return dict(uploaded=1, skipped=0, failed=0, bytes=1, errors={})
+
+    def create_vector_index(self, collection_name, vector_index_name):
+        self.started_together.wait()
+        if vector_index_name not in self.indexes:
+            self.calls.append("create_index")
+            self.indexes.add(vector_index_name)
+
+    def find_knowledge_base(self, name):
+        return self.knowledge_bases.get(name)
+
+    def create_knowledge_base(self, name, *args):
+        self.calls.append("create_knowledge_base")
+        self.knowledge_bases[name] = f"KB{len(self.knowledge_bases) + 1}"
+        return self.knowledge_bases[name]
+
+    def wait_for_knowledge_base(self, kb_id):
+        pass
+
+    def find_kb_datasource(self, kb_id, name):
+        return self.data_sources.get((kb_id, name))
+
+    def create_kb_datasource(self, name, kb_id, bucket_name):
+        self.calls.append("create_data_source")
+        self.data_sources[(kb_id, name)] = f"DS-{kb_id}"
+        return self.data_sources[(kb_id, name)]
+
+    def execute_ingestion_job(self, kb_id, kb_ds_id):
+        self.calls.append(f"ingest {kb_id}/{kb_ds_id}")
+        return dict(ingestionJobId="job", status="COMPLETE")
+
+    def delete_kb_datasource(self, kb_id, kb_ds_id):
+        self.calls.append(f"delete_data_source {kb_ds_id}")
+        self.data_sources = {k: v for k, v in self.data_sources.items() if v != kb_ds_id}
+
+    def delete_knowledge_base(self, kb_id):
+        self.calls.append(f"delete_knowledge_base {kb_id}")
+        self.knowledge_bases = {k: v for k, v in self.knowledge_bases.items() if v != kb_id}
+
+    def delete_vector_index(self, collection_name, vector_index_name):
+        self.calls.append("delete_index")
+        self.indexes.discard(vector_index_name)
+
+
+def test_plan_runs_independent_steps_together_and_passes_ids():
+    operation = FakeOperations()
+    context = dict(PLAN)
+
+    status = run_steps(provisioning_steps(operation), context)
+
+    assert set(status.values()) == {DONE}
+    assert (context["kb_id"], context["kb_ds_id"]) == ("KB1", "DS-KB1")
+    assert operation.calls[-1] == "ingest KB1/DS-KB1"
+
+
+def test_rerun_reuses_existing_resources():
+    operation = FakeOperations()
+    run_steps(provisioning_steps(operation), dict(PLAN))
+    operation.calls.clear()
+
+    status = run_steps(provisioning_steps(operation), dict(PLAN))
+
+    assert set(status.values()) == {DONE}
+    assert operation.calls == ["upload", "ingest KB1/DS-KB1"]
+
+
+def test_cleanup_deletes_in_reverse_order_and_tolerates_missing_resources():
+    operation = FakeOperations()
+    run_steps(provisioning_steps(operation), dict(PLAN))
+    operation.calls.clear()
+
+    run_steps(cleanup_steps(operation), dict(PLAN))
+    assert operation.calls == ["delete_data_source DS-KB1", "delete_knowledge_base KB1", "delete_index"]
+
+    operation.calls.clear()
+    assert set(run_steps(cleanup_steps(operation), dict(PLAN)).values()) == {DONE}
+    assert operation.calls == ["delete_index"]
+
+
+def test_failed_step_skips_its_dependents_only():
+    ran = []
+
+    def fail(context):
+        raise RuntimeError("boom")
+
+    steps = [
+        Step("a", fail),
+        Step("b", lambda context: ran.append("b")),
+        Step("c", lambda context: ran.append("c"), ["a"]),
+        Step("d", lambda context: ran.append("d"), ["c", "b"]),
+    ]
+
+    assert run_steps(steps, {}) == dict(a=FAILED, b=DONE, c=SKIPPED, d=SKIPPED)
+    assert ran == ["b"]
+
+
+def test_cycles_and_unknown_dependencies_are_rejected():
+    with pytest.raises(ValueError, match="cycle"):
+        run_steps([Step("a", dict, ["b"]), Step("b", dict, ["a"])], {})
+    with pytest.raises(ValueError, match="unknown"):
+        run_steps([Step("a", dict, ["missing"])], {})
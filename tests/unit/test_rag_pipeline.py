@@ -0,0 +1,90 @@
+import io
+import json
+
+import rag_pipeline
+
+DOC = {"type": "S3", "s3Location": {"uri": "s3://bucket/amazonq.pdf"}}
+WORDS = [f"w{i}" for i in range(100)]
+
+
+def chunk(words, score, location=DOC):
+    return {"text": " ".join(words), "score": score, "location": location, "metadata": {}}
+
+
+class FakeAgentRuntime:
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.requests = []
+
+    def retrieve(self, **kwargs):
+        self.requests.append(kwargs)
+        return {"retrievalResults": [
+            {"content": {"text": c["text"]}, "score": c["score"], "location": c["location"]} for c in self.chunks
+        ]}
+
+
+class FakeRuntime:
+
+    def __init__(self):
+        self.bodies = []
+
+    def invoke_model(self, **kwargs):
+        self.bodies.append(json.loads(kwargs["body"]))
+        payload = {"content": [{"type": "text", "text": "Hydrogen burns clean."}],
+                   "usage": {"input_tokens": 120, "output_tokens": 5}}
+        return {"body": io.BytesIO(json.dumps(payload).encode())}
+
+
+def test_dedupe_drops_contained_chunks_and_trims_overlap():
+    first = chunk(WORDS[0:50], 0.9)
+    # 20% overlap with the first chunk, like FIXED_SIZE chunking produces
+    second = chunk(WORDS[40:90], 0.8)
+    duplicate = chunk(WORDS[5:45], 0.7)
+
+    result = rag_pipeline.dedupe_chunks([duplicate, second, first])
+
+    assert [c["text"] for c in result] == [" ".join(WORDS[0:50]), " ".join(WORDS[50:90])]
+
+
+def test_overlap_is_only_trimmed_within_the_same_document():
+    other = {"type": "S3", "s3Location": {"uri": "s3://bucket/other.pdf"}}
+    result = rag_pipeline.dedupe_chunks([chunk(WORDS[0:50], 0.9), chunk(WORDS[40:90], 0.8, other)])
+
+    assert result[1]["text"] == " ".join(WORDS[40:90])
+
+
+def test_rerank_promotes_lexical_matches():
+    chunks = [
+        {"text": "Solar panels convert sunlight.", "score": 0.62, "location": DOC},
+        {"text": "Hydrogen is considered the fuel of the future because hydrogen burns clean.",
+         "score": 0.60, "location": DOC},
+    ]
+
+    ranked = rag_pipeline.rerank("Why is hydrogen considered fuel of future?", chunks)
+
+    assert ranked[0]["text"].startswith("Hydrogen")
+
+
+def test_pack_context_respects_token_budget():
+    chunks = [{"text": "x" * 400}, {"text": "y" * 800}, {"text": "z" * 200}]
+
+    packed, used = rag_pipeline.pack_context(chunks, token_budget=200)
+
+    assert [c["text"][0] for c in packed] == ["x", "z"]
+    assert used == 150
+
+
+def test_answer_sends_only_packed_context_to_the_model():
+    agent_runtime = FakeAgentRuntime([chunk(WORDS[0:50], 0.9), chunk(WORDS[40:90], 0.8), chunk(WORDS[5:45], 0.7)])
+    runtime = FakeRuntime()
+
+    result = rag_pipeline.answer(agent_runtime, runtime, "KB1", "anthropic.claude-3-haiku-20240307-v1:0",
+                                 "hydrogen?", number_of_results=25)
+
+    assert agent_runtime.requests[0]["retrievalConfiguration"]["vectorSearchConfiguration"]["numberOfResults"] == 25
+    assert result["text"] == "Hydrogen burns clean."
+    assert result["stats"]["retrieved"] == 3
+    assert result["stats"]["packed"] == 2
+    prompt = runtime.bodies[0]["messages"][0]["content"]
+    assert prompt.count("w45") == 1
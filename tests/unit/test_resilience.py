@@ -0,0 +1,147 @@
+import json
+
+import pytest
+from botocore.exceptions import ClientError
+
+import agent_invocation
+import resilience
+from resilience import CircuitBreaker, CircuitOpenError, call_with_retry
+from tests.unit.fakes import FakeRuntimeClient
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+def throttling_error():
+    return ClientError({"Error": {"Code": "ThrottlingException", "Message": "Rate exceeded"}}, "RetrieveAndGenerate")
+
+
+class ThrottlingClient:
+    """
+    Throttles the first `throttled` calls, then answers.
+    """
+
+    def __init__(self, throttled):
+        self.throttled = throttled
+        self.calls = 0
+
+    def retrieve_and_generate(self, **kwargs):
+        self.calls += 1
+        if self.calls <= self.throttled:
+            raise throttling_error()
+        return {"output": {"text": "ok"}}
+
+
+def test_throttled_call_is_retried_with_backoff():
+    clock = FakeClock()
+    client = ThrottlingClient(throttled=3)
+
+    response = call_with_retry(client.retrieve_and_generate, clock=clock, sleep=clock.sleep, rng=lambda: 1.0)
+
+    assert response == {"output": {"text": "ok"}}
+    assert client.calls == 4
+    # full jitter with rng=1 sleeps the whole exponential delay: 0.2 + 0.4 + 0.8
+    assert clock.now == pytest.approx(1.4)
+
+
+def test_retries_stop_at_the_deadline():
+    clock = FakeClock()
+    client = ThrottlingClient(throttled=10)
+
+    with pytest.raises(ClientError):
+        call_with_retry(client.retrieve_and_generate, deadline=0.5, max_attempts=10,
+                        clock=clock, sleep=clock.sleep, rng=lambda: 1.0)
+
+    assert client.calls == 2
+    assert clock.now < 0.5
+
+
+def test_non_retryable_errors_are_raised_immediately():
+    def validate(**kwargs):
+        raise ClientError({"Error": {"Code": "ValidationException", "Message": "bad"}}, "RetrieveAndGenerate")
+
+    breaker = CircuitBreaker(failure_threshold=1)
+    with pytest.raises(ClientError):
+        call_with_retry(validate, breaker=breaker, sleep=pytest.fail)
+    assert breaker.state == "closed"
+
+
+def test_breaker_counts_one_failure_per_call_after_its_retries():
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=2, clock=clock)
+
+    with pytest.raises(ClientError):
+        call_with_retry(ThrottlingClient(throttled=10).retrieve_and_generate, breaker=breaker,
+                        clock=clock, sleep=clock.sleep)
+
+    assert breaker.state == "closed"
+
+
+def test_non_retryable_errors_leave_the_breaker_as_it_is():
+    def validate(**kwargs):
+        raise ClientError({"Error": {"Code": "ValidationException", "Message": "bad"}}, "RetrieveAndGenerate")
+
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30, clock=clock)
+    with pytest.raises(ClientError):
+        call_with_retry(ThrottlingClient(throttled=1).retrieve_and_generate, breaker=breaker, max_attempts=1)
+    with pytest.raises(ClientError):
+        call_with_retry(validate, breaker=breaker)
+    with pytest.raises(ClientError):
+        call_with_retry(ThrottlingClient(throttled=1).retrieve_and_generate, breaker=breaker, max_attempts=1)
+    assert breaker.state == "open"
+
+    clock.now = 30
+    with pytest.raises(ClientError):
+        call_with_retry(validate, breaker=breaker)
+    assert breaker.state == "half_open"
+    assert call_with_retry(ThrottlingClient(throttled=0).retrieve_and_generate, breaker=breaker) == {
+        "output": {"text": "ok"}
+    }
+
+
+def test_breaker_opens_fails_fast_and_recovers():
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30, clock=clock)
+    client = ThrottlingClient(throttled=2)
+
+    with pytest.raises(ClientError):
+        call_with_retry(client.retrieve_and_generate, breaker=breaker, max_attempts=1)
+    with pytest.raises(ClientError):
+        call_with_retry(client.retrieve_and_generate, breaker=breaker, max_attempts=1)
+    with pytest.raises(CircuitOpenError) as error:
+        call_with_retry(client.retrieve_and_generate, breaker=breaker)
+
+    assert error.value.retry_after == 30
+    assert client.calls == 2
+    clock.now = 30
+    assert breaker.state == "half_open"
+    assert call_with_retry(client.retrieve_and_generate, breaker=breaker) == {"output": {"text": "ok"}}
+    assert breaker.state == "closed"
+
+
+def test_handler_answers_503_with_retry_after_when_saturated(fake_aws, monkeypatch):
+    def retrieve_and_generate(self, **kwargs):
+        raise throttling_error()
+
+    monkeypatch.setattr(FakeRuntimeClient, "retrieve_and_generate", retrieve_and_generate)
+    monkeypatch.setattr(resilience.time, "sleep", lambda seconds: None)
+    monkeypatch.setattr(agent_invocation, "bedrock_breaker", CircuitBreaker(failure_threshold=1, reset_timeout=20))
+    event = {"body": json.dumps({"userPrompt": "What is Amazon Q?", "sessionId": "s1"})}
+
+    throttled = agent_invocation.handler(event, None)
+    rejected = agent_invocation.handler(event, None)
+
+    assert throttled["statusCode"] == 503
+    assert rejected["statusCode"] == 503
+    assert rejected["headers"]["Retry-After"] == "20"
+    assert "saturated" in json.loads(rejected["body"])["error"]
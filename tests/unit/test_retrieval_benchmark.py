@@ -0,0 +1,73 @@
+import json
+import os
+
+from tools import retrieval_benchmark
+from tools.local_retrieve import LocalRetrieveClient, load_corpus
+
+TOOLS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "tools")
+
+
+class RankedClient:
+    """
+    Returns the same ranked documents for every question.
+    """
+
+    def __init__(self, uris):
+        self.uris = uris
+
+    def retrieve(self, retrievalQuery, knowledgeBaseId, retrievalConfiguration):
+        number_of_results = retrievalConfiguration["vectorSearchConfiguration"]["numberOfResults"]
+        return dict(retrievalResults=[
+            dict(content=dict(text="x" * 40), score=1 - i / 10, location=dict(s3Location=dict(uri=uri)))
+            for i, uri in enumerate(self.uris[:number_of_results])
+        ])
+
+
+def test_recall_and_mrr_follow_the_rank_of_the_expected_source():
+    client = RankedClient(["s3://b/a.pdf", "s3://b/b.pdf", "s3://b/c.pdf"])
+    golden = [dict(question="q1", source="b.pdf"), dict(question="q2", source="c.pdf")]
+
+    at_1 = retrieval_benchmark.evaluate(client, "kb", golden, 1)
+    at_3 = retrieval_benchmark.evaluate(client, "kb", golden, 3)
+
+    assert (at_1["recall_at_k"], at_1["mrr"]) == (0.0, 0.0)
+    assert at_3["recall_at_k"] == 1.0
+    assert at_3["mrr"] == round((1 / 2 + 1 / 3) / 2, 4)
+    assert at_3["context_tokens_per_query"] == 30
+
+
+def test_expected_passage_matches_ignoring_case_and_whitespace():
+    chunk = dict(text="Green hydrogen is produced by\nelectrolysis", location=None)
+
+    assert retrieval_benchmark.is_relevant(chunk, dict(passage="produced by   Electrolysis"))
+    assert not retrieval_benchmark.is_relevant(chunk, dict(passage="steam reforming"))
+
+
+def test_local_backend_honours_depth_and_search_type():
+    client = LocalRetrieveClient(load_corpus(os.path.join(TOOLS_DIR, "sample_corpus.jsonl")))
+
+    for search_type in ("SEMANTIC", "HYBRID"):
+        response = client.retrieve(
+            retrievalQuery=dict(text="Is hydrogen compressed or liquefied?"),
+            knowledgeBaseId="local",
+            retrievalConfiguration=dict(vectorSearchConfiguration=dict(numberOfResults=2,
+                                                                        overrideSearchType=search_type)),
+        )
+        results = response["retrievalResults"]
+        assert len(results) == 2
+        assert results[0]["location"]["s3Location"]["uri"].endswith("storage.pdf")
+
+
+def test_sweep_runs_offline_on_the_samples(capsys):
+    exit_code = retrieval_benchmark.main([
+        os.path.join(TOOLS_DIR, "sample_golden.jsonl"),
+        "--corpus", os.path.join(TOOLS_DIR, "sample_corpus.jsonl"),
+        "--depths", "1", "3", "--json",
+    ])
+
+    rows = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert exit_code == 0
+    assert [(r["searchType"], r["numberOfResults"]) for r in rows] == [
+        ("SEMANTIC", 1), ("SEMANTIC", 3), ("HYBRID", 1), ("HYBRID", 3),
+    ]
+    assert all(0 <= r["recall_at_k"] <= 1 for r in rows)
@@ -0,0 +1,55 @@
+import json
+
+import pytest
+
+import agent_invocation
+from session_store import DynamoDBSessionStore, InMemorySessionStore, get_session_store
+from tests.unit.fakes import FakeDynamoDBClient, FakeRuntimeClient
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.mark.parametrize("make_store", [
+    lambda clock: InMemorySessionStore(ttl_seconds=60, clock=clock),
+    lambda clock: DynamoDBSessionStore("sessions", ttl_seconds=60, client=FakeDynamoDBClient(), clock=clock),
+])
+def test_mapping_expires_after_ttl(make_store):
+    clock = FakeClock()
+    store = make_store(clock)
+    store.put("client-1", "bedrock-1")
+    clock.now += 59
+
+    assert store.get("client-1") == "bedrock-1"
+    clock.now += 1
+    assert store.get("client-1") is None
+    assert store.get("unknown") is None
+
+
+def test_store_is_dynamodb_backed_when_table_is_configured(fake_aws, monkeypatch):
+    monkeypatch.setenv("SESSION_TABLE_NAME", "chat-sessions")
+
+    assert isinstance(get_session_store(), DynamoDBSessionStore)
+
+
+def test_follow_up_turn_reuses_bedrock_session(fake_aws):
+    def turn(prompt):
+        event = {"body": json.dumps({"userPrompt": prompt, "sessionId": "session-12345"})}
+        return json.loads(agent_invocation.handler(event, None)["body"])
+
+    turn("What are capabilites of amazon q?")
+    turn("And how much does it cost?")
+    turn("What are capabilites of amazon q?")
+
+    first, second, third = FakeRuntimeClient.requests
+    assert "sessionId" not in first
+    assert second["sessionId"] == "bedrock-session-1"
+    assert second["input"] == {"text": "And how much does it cost?"}
+    # Follow-ups depend on the conversation, so they bypass the answer cache
+    assert third["sessionId"] == "bedrock-session-1"
@@ -0,0 +1,136 @@
+import http.client
+import json
+import threading
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+import agent_invocation
+import stream_server
+import streaming
+from session_store import get_session_store
+from tests.unit.fakes import FakeRuntimeClient
+
+pytestmark = pytest.mark.usefixtures("fake_aws")
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def stubbed_stream(clock, delays_and_events):
+    """
+    Yield Bedrock stream events, advancing the fake clock by each delay first.
+    """
+    def retrieve_and_generate_stream(self, **kwargs):
+        def events():
+            for delay, event in delays_and_events:
+                clock.now += delay
+                yield event
+        return {"sessionId": "bedrock-session-1", "stream": events()}
+    return retrieve_and_generate_stream
+
+
+def test_stream_reports_time_to_first_token(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(FakeRuntimeClient, "retrieve_and_generate_stream", stubbed_stream(clock, [
+        (0.25, {"output": {"text": "Amazon Q "}}),
+        (1.0, {"output": {"text": "is an assistant."}}),
+        (0.5, {"citation": {"retrievedReferences": [
+            {"content": {"text": "Amazon Q docs"}, "location": {"type": "S3"}}
+        ]}}),
+    ]), raising=False)
+
+    events = list(streaming.stream_answer("What is Amazon Q?", clock=clock))
+
+    assert [e["type"] for e in events] == ["text", "text", "citation", "done"]
+    assert events[2]["references"] == [{"text": "Amazon Q docs", "location": {"type": "S3"}}]
+    assert events[-1]["timeToFirstTokenMs"] == 250.0
+    assert events[-1]["totalMs"] == 1750.0
+    assert events[-1]["sessionId"] == "bedrock-session-1"
+
+
+def test_cached_answer_is_streamed_without_bedrock_call(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(FakeRuntimeClient, "retrieve_and_generate_stream", stubbed_stream(clock, [
+        (0.1, {"output": {"text": "cached answer"}}),
+    ]), raising=False)
+    list(streaming.stream_answer("What is Amazon Q?", clock=clock))
+    monkeypatch.delattr(FakeRuntimeClient, "retrieve_and_generate_stream")
+
+    events = list(streaming.stream_answer("what is amazon q", clock=clock))
+
+    assert events[0] == {"type": "text", "text": "cached answer"}
+    assert events[-1]["cacheHit"] is True
+
+
+def test_session_turn_opens_a_bedrock_session_despite_cached_answer(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(FakeRuntimeClient, "retrieve_and_generate_stream", stubbed_stream(clock, [
+        (0.1, {"output": {"text": "fresh answer"}}),
+    ]), raising=False)
+    list(streaming.stream_answer("What is Amazon Q?", clock=clock))
+
+    events = list(streaming.stream_answer("What is Amazon Q?", session_id="session-b", clock=clock))
+
+    assert events[-1]["cacheHit"] is False
+    assert events[-1]["sessionId"] == "bedrock-session-1"
+
+
+def test_follow_up_request_matches_the_buffered_handler(monkeypatch):
+    streamed = []
+
+    def retrieve_and_generate_stream(self, **kwargs):
+        streamed.append(kwargs)
+        return {"sessionId": kwargs["sessionId"], "stream": iter([])}
+
+    monkeypatch.setattr(FakeRuntimeClient, "retrieve_and_generate_stream", retrieve_and_generate_stream, raising=False)
+    get_session_store().put("session-a", "bedrock-session-9")
+
+    list(streaming.stream_answer("Which plans does it have?", session_id="session-a"))
+    agent_invocation.handler(
+        {"body": json.dumps({"userPrompt": "Which plans does it have?", "sessionId": "session-a"})}, None
+    )
+
+    assert streamed == FakeRuntimeClient.requests
+    assert streamed[0]["sessionId"] == "bedrock-session-9"
+
+
+def test_server_writes_ndjson_chunks(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(FakeRuntimeClient, "retrieve_and_generate_stream", stubbed_stream(clock, [
+        (0.1, {"output": {"text": "Hello"}}),
+    ]), raising=False)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), stream_server.StreamHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        connection = http.client.HTTPConnection("127.0.0.1", server.server_port)
+        connection.request("POST", "/", body=json.dumps({"userPrompt": "Hi", "sessionId": "s1"}))
+        response = connection.getresponse()
+        lines = [json.loads(line) for line in response.read().decode().splitlines()]
+    finally:
+        server.shutdown()
+
+    assert response.getheader("Content-Type") == "application/x-ndjson"
+    assert [line["type"] for line in lines] == ["text", "done"]
+
+
+@pytest.mark.parametrize("body", [b"not json", json.dumps({"sessionId": "s1"}).encode(), b"[]"])
+def test_server_rejects_invalid_bodies_with_400(body):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), stream_server.StreamHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        connection = http.client.HTTPConnection("127.0.0.1", server.server_port)
+        connection.request("POST", "/", body=body)
+        response = connection.getresponse()
+        error = json.loads(response.read())
+    finally:
+        server.shutdown()
+
+    assert response.status == 400
+    assert "Invalid request body" in error["error"]
@@ -0,0 +1,139 @@
+"""
+Latency injecting stand-ins for the AWS clients used by the chat Lambda.
+
+StubSession replaces boto3.Session in the Lambda's clients module. Its clients
+answer RetrieveAndGenerate, Retrieve, InvokeModel and ListExports after a
+latency drawn from a configurable distribution and fail a configurable share of
+calls with a ClientError, so the handler's own overhead can be measured
+without AWS.
+"""
+import io
+import json
+import random
+import threading
+import time
+
+from botocore.exceptions import ClientError
+
+KB_ID = "STUBKB0001"
+
+
+class LatencyDistribution:
+    """
+    Parsed from "constant:ms", "uniform:low_ms:high_ms", "normal:mean_ms:stddev_ms"
+    or "lognormal:median_ms:sigma".
+    """
+
+    def __init__(self, spec="constant:0", rng=None):
+        kind, *params = spec.split(":")
+        self.kind = kind
+        self.params = [float(p) for p in params]
+        self.rng = rng or random.Random()
+        if kind not in ("constant", "uniform", "normal", "lognormal"):
+            raise ValueError(f"Unknown latency distribution '{spec}'")
+
+    def sample_ms(self):
+        if self.kind == "constant":
+            return self.params[0]
+        if self.kind == "uniform":
+            return self.rng.uniform(*self.params)
+        if self.kind == "normal":
+            return max(0.0, self.rng.gauss(*self.params))
+        median, sigma = self.params
+        return self.rng.lognormvariate(0, sigma) * median
+
+
+class StubBehaviour:
+    """
+    Latency and failure settings shared by all stub clients of a run. Also tracks how
+    long the current thread spent inside stub calls and in retry backoff, to separate
+    both from handler overhead.
+    """
+
+    def __init__(self, latency="constant:0", error_rate=0.0, error_code="ThrottlingException", seed=None):
+        self.rng = random.Random(seed)
+        self.latency = LatencyDistribution(latency, self.rng)
+        self.error_rate = error_rate
+        self.error_code = error_code
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    @property
+    def thread_stub_seconds(self):
+        return getattr(self._local, "stub_seconds", 0.0)
+
+    @property
+    def thread_backoff_seconds(self):
+        return getattr(self._local, "backoff_seconds", 0.0)
+
+    def reset_thread(self):
+        self._local.stub_seconds = 0.0
+        self._local.backoff_seconds = 0.0
+
+    def backoff_sleep(self, seconds):
+        ## Stands in for time.sleep between retries of call_with_retry
+        time.sleep(seconds)
+        self._local.backoff_seconds = self.thread_backoff_seconds + seconds
+
+    def call(self, operation_name):
+        with self._lock:
+            delay = self.latency.sample_ms() / 1000
+            failed = self.rng.random() < self.error_rate
+        time.sleep(delay)
+        self._local.stub_seconds = self.thread_stub_seconds + delay
+        if failed:
+            raise ClientError({"Error": {"Code": self.error_code, "Message": "Injected by the stub"}}, operation_name)
+
+
+class StubRuntimeClient:
+
+    def __init__(self, behaviour):
+        self.behaviour = behaviour
+
+    def retrieve_and_generate(self, **kwargs):
+        self.behaviour.call("RetrieveAndGenerate")
+        return {
+            "sessionId": kwargs.get("sessionId", "stub-session"),
+            "output": {"text": f"Stub answer to: {kwargs['input']['text']}"},
+            "citations": [{"retrievedReferences": [
+                {"content": {"text": "Stub passage"}, "location": {"type": "S3"}}
+            ]}],
+        }
+
+    def retrieve(self, **kwargs):
+        self.behaviour.call("Retrieve")
+        count = kwargs["retrievalConfiguration"]["vectorSearchConfiguration"]["numberOfResults"]
+        return {"retrievalResults": [
+            {"content": {"text": f"Stub passage {i} " * 20}, "score": 1 - i / count, "location": {"type": "S3"}}
+            for i in range(count)
+        ]}
+
+    def invoke_model(self, **kwargs):
+        self.behaviour.call("InvokeModel")
+        payload = {"content": [{"type": "text", "text": "Stub answer"}],
+                   "usage": {"input_tokens": 0, "output_tokens": 0}}
+        return {"body": io.BytesIO(json.dumps(payload).encode("utf-8"))}
+
+
+class StubCloudFormationClient:
+
+    def get_paginator(self, operation_name):
+        return self
+
+    def paginate(self):
+        yield {"Exports": [{"Name": "BedrockKbId", "Value": KB_ID}]}
+
+
+class StubSession:
+    """
+    Stands in for boto3.Session(); all sessions share the behaviour set on the class.
+    """
+    behaviour = StubBehaviour()
+    region_name = "us-east-1"
+
+    def client(self, service_name, region_name=None, config=None):
+        if service_name == "cloudformation":
+            return StubCloudFormationClient()
+        if service_name in ("bedrock-agent-runtime", "bedrock-runtime"):
+            return StubRuntimeClient(self.behaviour)
+        raise ValueError(f"The stub session has no '{service_name}' client")
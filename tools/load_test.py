@@ -0,0 +1,225 @@
+"""
+Offline load test for the chat Lambda handler.
+
+Replays a JSONL file of API Gateway style events (one {"body": "..."} per line,
+like the sample in the README) against agent_invocation.handler in-process, with
+the AWS clients replaced by the latency injecting stubs of tools/bedrock_stub.py.
+
+    python -m tools.load_test tools/sample_events.jsonl --requests 500 --concurrency 8 \\
+        --rate 50 --latency lognormal:800:0.4 --error-rate 0.02
+
+Reports latency percentiles, the handler's own overhead (latency minus the time
+spent inside stub calls and retry backoff), the backoff itself, throughput and an
+error breakdown. With
+--max-p99-overhead-ms the command exits non-zero when the overhead regresses, so
+it can gate CI.
+"""
+import argparse
+import contextlib
+import json
+import logging
+import math
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in (
+    os.path.join(ROOT_DIR, "assets", "lambda-bedrock"),
+    os.path.join(ROOT_DIR, "assets", "lambda-common", "python"),
+):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+import agent_invocation  # noqa: E402
+import clients  # noqa: E402
+import resilience  # noqa: E402
+import session_store  # noqa: E402
+from answer_cache import answer_cache  # noqa: E402
+from tools.bedrock_stub import StubBehaviour, StubSession  # noqa: E402
+
+_ERROR_CODE = re.compile(r"\((\w+)\)")
+
+
+def load_events(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def percentile(sorted_values, p):
+    """
+    Nearest-rank percentile of an already sorted list.
+    """
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(p / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def summarize(values_ms):
+    values = sorted(round(v, 3) for v in values_ms)
+    return {
+        "p50": percentile(values, 50),
+        "p95": percentile(values, 95),
+        "p99": percentile(values, 99),
+        "max": values[-1] if values else None,
+        "mean": round(sum(values) / len(values), 3) if values else None,
+    }
+
+
+def _error_kind(response):
+    try:
+        error = json.loads(response["body"]).get("error", "")
+    except (KeyError, TypeError, ValueError):
+        return "unparseable"
+    match = _ERROR_CODE.search(error)
+    return match.group(1) if match else error.split(":")[0][:60]
+
+
+@contextlib.contextmanager
+def stubbed_handler(behaviour, cache=False):
+    """
+    Point the handler at the stubs and start from a cold container state.
+    """
+    original_session = clients.boto3.Session
+    original_max_entries = answer_cache.max_entries
+    StubSession.behaviour = behaviour
+    clients.boto3.Session = StubSession
+    ## Backoff between retries is timed apart from the handler's own work
+    agent_invocation.call_with_retry = partial(resilience.call_with_retry, sleep=behaviour.backoff_sleep)
+    clients.reset()
+    session_store.reset()
+    answer_cache.invalidate()
+    agent_invocation.bedrock_breaker.reset()
+    if not cache:
+        answer_cache.max_entries = 0
+    ## The handler logs every injected error, the report counts them instead
+    logging.disable(logging.ERROR)
+    try:
+        yield
+    finally:
+        logging.disable(logging.NOTSET)
+        clients.boto3.Session = original_session
+        agent_invocation.call_with_retry = resilience.call_with_retry
+        answer_cache.max_entries = original_max_entries
+        clients.reset()
+
+
+def run(events, requests=None, concurrency=4, rate=None, poisson=False, behaviour=None, cache=False, seed=None):
+    """
+    Replay the events and return the report. Without a rate all requests are queued at
+    once (closed loop), with a rate they arrive at that many requests per second.
+    """
+    behaviour = behaviour or StubBehaviour(seed=seed)
+    requests = requests or len(events)
+    rng = random.Random(seed)
+    lock = threading.Lock()
+    samples = []
+
+    def invoke(event, scheduled_at):
+        behaviour.reset_thread()
+        started = time.perf_counter()
+        try:
+            response = agent_invocation.handler(event, None)
+            status = response["statusCode"]
+            kind = _error_kind(response) if status >= 400 else None
+        except Exception as e:
+            status, kind = "exception", type(e).__name__
+        finished = time.perf_counter()
+        waited = behaviour.thread_stub_seconds + behaviour.thread_backoff_seconds
+        with lock:
+            samples.append(dict(
+                status=status,
+                error=kind,
+                latency_ms=(finished - started) * 1000,
+                overhead_ms=(finished - started - waited) * 1000,
+                backoff_ms=behaviour.thread_backoff_seconds * 1000,
+                queue_ms=(started - scheduled_at) * 1000,
+            ))
+
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull), \
+            stubbed_handler(behaviour, cache), ThreadPoolExecutor(max_workers=concurrency) as executor:
+        start = time.perf_counter()
+        arrival = start
+        for i in range(requests):
+            if rate:
+                arrival += rng.expovariate(rate) if poisson else 1 / rate
+                delay = arrival - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            executor.submit(invoke, events[i % len(events)], arrival if rate else start)
+        executor.shutdown(wait=True)
+        duration = time.perf_counter() - start
+
+    ok = [s for s in samples if s["status"] == 200]
+    return {
+        "requests": len(samples),
+        "concurrency": concurrency,
+        "target_rate_rps": rate,
+        "duration_s": round(duration, 3),
+        "throughput_rps": round(len(samples) / duration, 2) if duration else None,
+        "latency_ms": summarize([s["latency_ms"] for s in samples]),
+        "overhead_ms": summarize([s["overhead_ms"] for s in ok]),
+        "backoff_ms": summarize([s["backoff_ms"] for s in samples]),
+        "queue_ms": summarize([s["queue_ms"] for s in samples]),
+        "status_codes": dict(Counter(str(s["status"]) for s in samples)),
+        "errors": dict(Counter(s["error"] for s in samples if s["error"])),
+    }
+
+
+def format_report(report):
+    lines = [
+        f"requests: {report['requests']}  concurrency: {report['concurrency']}  "
+        f"target rate: {report['target_rate_rps'] or 'unbounded'} rps",
+        f"duration: {report['duration_s']} s  throughput: {report['throughput_rps']} rps",
+    ]
+    for name in ("latency_ms", "overhead_ms", "backoff_ms", "queue_ms"):
+        stats = report[name]
+        lines.append(
+            f"{name:<12} " + "  ".join(f"{k}={v:.1f}" if v is not None else f"{k}=-" for k, v in stats.items())
+        )
+    lines.append(f"status codes: {report['status_codes']}")
+    lines.append(f"errors: {report['errors'] or 'none'}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay chat events against the Lambda handler with stubbed AWS clients")
+    parser.add_argument("events", help="JSONL file with one API Gateway style event per line")
+    parser.add_argument("--requests", type=int, help="number of requests, events are replayed round robin")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--rate", type=float, help="arrival rate in requests per second (default: closed loop)")
+    parser.add_argument("--poisson", action="store_true", help="exponential inter-arrival times instead of constant")
+    parser.add_argument("--latency", default="constant:0", help="stub latency distribution, e.g. lognormal:800:0.4")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-code", default="ThrottlingException")
+    parser.add_argument("--cache", action="store_true", help="keep the answer cache enabled")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    parser.add_argument("--max-p99-overhead-ms", type=float, help="fail when the p99 handler overhead exceeds this")
+    args = parser.parse_args(argv)
+
+    ## Only the command line run needs a region for the stubbed clients, importers keep their environment
+    os.environ.setdefault("AWS_REGION", StubSession.region_name)
+    behaviour = StubBehaviour(args.latency, args.error_rate, args.error_code, args.seed)
+    report = run(
+        load_events(args.events), args.requests, args.concurrency, args.rate, args.poisson,
+        behaviour, args.cache, args.seed,
+    )
+    print(json.dumps(report, indent=2) if args.json else format_report(report))
+
+    p99 = report["overhead_ms"]["p99"]
+    if args.max_p99_overhead_ms is not None and p99 is not None and p99 > args.max_p99_overhead_ms:
+        print(f"p99 handler overhead {p99:.1f} ms exceeds {args.max_p99_overhead_ms} ms", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
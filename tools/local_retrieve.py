@@ -0,0 +1,77 @@
+"""
+Local stand-in for the bedrock-agent-runtime Retrieve API.
+
+Answers retrieve() calls from an in-memory list of passages, so retrieval
+tooling (tools/retrieval_benchmark.py, knowledge_base/batch_retrieve.py) can run
+in CI without Bedrock. The scores only mimic the real search types:
+
+- SEMANTIC: cosine similarity of term frequency vectors
+- HYBRID: the semantic candidates reranked with BM25, like rag_pipeline.rerank
+
+Passages are {"text", "uri"} dicts, loaded from JSON lines with load_corpus().
+"""
+import json
+import math
+import os
+import re
+import sys
+import time
+from collections import Counter
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+COMMON_DIR = os.path.join(ROOT_DIR, "assets", "lambda-common", "python")
+if COMMON_DIR not in sys.path:
+    sys.path.insert(0, COMMON_DIR)
+
+import rag_pipeline  # noqa: E402
+
+_WORD = re.compile(r"\w+")
+
+
+def load_corpus(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def _vector(text):
+    counts = Counter(_WORD.findall(text.lower()))
+    norm = math.sqrt(sum(v * v for v in counts.values())) or 1.0
+    return {term: v / norm for term, v in counts.items()}
+
+
+class LocalRetrieveClient:
+
+    def __init__(self, passages, latency_ms=0.0, sleep=time.sleep):
+        self.passages = passages
+        self.latency_ms = latency_ms
+        self._sleep = sleep
+        self._vectors = [_vector(p["text"]) for p in passages]
+
+    def _semantic(self, query):
+        query_vector = _vector(query)
+        scored = []
+        for passage, vector in zip(self.passages, self._vectors):
+            score = sum(weight * vector.get(term, 0.0) for term, weight in query_vector.items())
+            scored.append(dict(
+                text=passage["text"],
+                score=round(score, 6),
+                location=dict(type="S3", s3Location=dict(uri=passage["uri"])),
+            ))
+        return sorted(scored, key=lambda chunk: chunk["score"], reverse=True)
+
+    def retrieve(self, retrievalQuery, knowledgeBaseId, retrievalConfiguration=None):
+        configuration = (retrievalConfiguration or {}).get("vectorSearchConfiguration", {})
+        number_of_results = configuration.get("numberOfResults", 5)
+        search_type = configuration.get("overrideSearchType", "SEMANTIC")
+        if self.latency_ms:
+            self._sleep(self.latency_ms / 1000)
+
+        candidates = self._semantic(retrievalQuery["text"])
+        if search_type == "HYBRID":
+            reranked = rag_pipeline.rerank(retrievalQuery["text"], candidates[:max(number_of_results * 4, 20)])
+            candidates = [dict(chunk, score=chunk.pop("rerank_score")) for chunk in reranked]
+
+        return dict(retrievalResults=[
+            dict(content=dict(text=chunk["text"]), score=chunk["score"], location=chunk["location"])
+            for chunk in candidates[:number_of_results]
+        ])
@@ -0,0 +1,159 @@
+"""
+Retrieval tuning benchmark against a golden question set.
+
+Each golden case is a JSON line with a "question" and the expected
+"source" (a substring of the source URI, e.g. the PDF file name) and/or an
+expected "passage" (text the retrieved chunk must contain). For every
+combination of numberOfResults and search type the questions are retrieved and
+the benchmark reports
+
+- recall@k: share of questions with a relevant chunk in the top k
+- MRR: mean reciprocal rank of the first relevant chunk
+- latency percentiles per Retrieve call
+- context tokens: estimated tokens of the retrieved chunks per question, the
+  prompt cost the depth adds when they are passed on to the model
+
+    python -m tools.retrieval_benchmark tools/sample_golden.jsonl --corpus tools/sample_corpus.jsonl
+    python -m tools.retrieval_benchmark golden.jsonl --kb-id ABCDEFGHIJ --depths 3 5 10 --search-types SEMANTIC HYBRID
+
+Without --kb-id the sweep runs against an offline FAISS index (--index-dir)
+or the local stand-in of tools/local_retrieve.py over the --corpus passages. Chunking settings
+(maxTokens, overlapPercentage) are compared by running the sweep against
+knowledge bases ingested with each setting.
+"""
+import argparse
+import json
+import math
+import os
+import sys
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+COMMON_DIR = os.path.join(ROOT_DIR, "assets", "lambda-common", "python")
+if COMMON_DIR not in sys.path:
+    sys.path.insert(0, COMMON_DIR)
+
+import rag_pipeline  # noqa: E402
+from tools.local_retrieve import LocalRetrieveClient, load_corpus  # noqa: E402
+
+DEFAULT_DEPTHS = (3, 5, 10)
+DEFAULT_SEARCH_TYPES = ("SEMANTIC", "HYBRID")
+
+
+def load_golden_set(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def is_relevant(chunk, case):
+    location = json.dumps(chunk.get("location") or {})
+    if case.get("source") and case["source"] in location:
+        return True
+    if case.get("passage"):
+        return " ".join(case["passage"].lower().split()) in " ".join(chunk["text"].lower().split())
+    return False
+
+
+def first_relevant_rank(chunks, case):
+    for rank, chunk in enumerate(chunks, start=1):
+        if is_relevant(chunk, case):
+            return rank
+    return None
+
+
+def _percentile(sorted_values, p):
+    if not sorted_values:
+        return None
+    return sorted_values[max(1, math.ceil(p / 100 * len(sorted_values))) - 1]
+
+
+def evaluate(agent_runtime_client, kb_id, golden_set, number_of_results, search_type=None,
+             clock=time.perf_counter):
+    """
+    Retrieve every golden question with one setting and return its metrics row.
+    """
+    hits, reciprocal_ranks, latencies, tokens = 0, 0.0, [], 0
+    for case in golden_set:
+        started = clock()
+        chunks = rag_pipeline.retrieve_chunks(
+            agent_runtime_client, kb_id, case["question"], number_of_results, search_type=search_type
+        )
+        latencies.append((clock() - started) * 1000)
+        tokens += sum(rag_pipeline.estimate_tokens(chunk["text"]) for chunk in chunks)
+        rank = first_relevant_rank(chunks, case)
+        if rank is not None:
+            hits += 1
+            reciprocal_ranks += 1 / rank
+
+    latencies.sort()
+    cases = len(golden_set) or 1
+    return {
+        "numberOfResults": number_of_results,
+        "searchType": search_type or "DEFAULT",
+        "recall_at_k": round(hits / cases, 4),
+        "mrr": round(reciprocal_ranks / cases, 4),
+        "latency_p50_ms": round(_percentile(latencies, 50) or 0, 1),
+        "latency_p95_ms": round(_percentile(latencies, 95) or 0, 1),
+        "context_tokens_per_query": round(tokens / cases, 1),
+    }
+
+
+def sweep(agent_runtime_client, kb_id, golden_set, depths=DEFAULT_DEPTHS, search_types=DEFAULT_SEARCH_TYPES):
+    return [
+        evaluate(agent_runtime_client, kb_id, golden_set, depth, search_type)
+        for search_type in search_types
+        for depth in depths
+    ]
+
+
+def format_report(rows):
+    header = f"{'searchType':<10} {'k':>3} {'recall@k':>9} {'MRR':>7} {'p50 ms':>8} {'p95 ms':>8} {'tokens/q':>9}"
+    lines = [header, "-" * len(header)]
+    for row in rows:
+        lines.append(
+            f"{row['searchType']:<10} {row['numberOfResults']:>3} {row['recall_at_k']:>9.3f} {row['mrr']:>7.3f} "
+            f"{row['latency_p50_ms']:>8.1f} {row['latency_p95_ms']:>8.1f} {row['context_tokens_per_query']:>9.1f}"
+        )
+    return "\n".join(lines)
+
+
+def bedrock_client(profile_name, service_name="bedrock-agent-runtime"):
+    import boto3
+    from resilience import retry_config
+
+    return boto3.Session(profile_name=profile_name).client(service_name, config=retry_config())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sweep Retrieve settings against a golden question set")
+    parser.add_argument("golden", help="JSONL file with question and expected source and/or passage per line")
+    parser.add_argument("--kb-id", help="knowledge base to benchmark (default: local stand-in backend)")
+    parser.add_argument("--profile", default="bedrock-profile", help="AWS profile used with --kb-id")
+    parser.add_argument("--corpus", help="JSONL passages with text and uri for the local backend")
+    parser.add_argument("--index-dir", help="offline FAISS index (knowledge_base option 15) to benchmark")
+    parser.add_argument("--depths", type=int, nargs="+", default=list(DEFAULT_DEPTHS))
+    parser.add_argument("--search-types", nargs="+", default=list(DEFAULT_SEARCH_TYPES), choices=DEFAULT_SEARCH_TYPES)
+    parser.add_argument("--json", action="store_true", help="print the rows as JSON lines")
+    args = parser.parse_args(argv)
+
+    if args.kb_id:
+        client, kb_id = bedrock_client(args.profile), args.kb_id
+    elif args.index_dir:
+        from faiss_index import FaissRetrieveClient
+
+        client = FaissRetrieveClient.load(
+            args.index_dir, get_runtime_client=lambda: bedrock_client(args.profile, "bedrock-runtime")
+        )
+        kb_id = "local"
+    elif args.corpus:
+        client, kb_id = LocalRetrieveClient(load_corpus(args.corpus)), "local"
+    else:
+        parser.error("one of --kb-id, --index-dir or --corpus is required")
+
+    rows = sweep(client, kb_id, load_golden_set(args.golden), args.depths, args.search_types)
+    print("\n".join(json.dumps(row) for row in rows) if args.json else format_report(rows))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())